@@ -0,0 +1,160 @@
+"""
+Generador de carga HTTP en proceso para los servicios FastAPI.
+
+Llama directamente a la aplicación ASGI (sin sockets ni dependencias
+externas), de modo que mide el coste del framework, la validación, el
+clasificador y el logging en una sola máquina y sin red.
+"""
+
+import asyncio
+import importlib
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+SERVICES = {
+    "medical": ROOT / "medical-service",
+    "fraud": ROOT / "fraud-service",
+}
+
+MEDICAL_NOTES = [
+    "Paciente con dolor pecho irradiación brazo y sudoración, sospecha de infarto",
+    "Control de diabetes con glucosa elevada, poliuria y polidipsia",
+    "Tos crónica con expectoración en paciente fumador, sibilancias",
+    "Cefalea pulsátil con fotofobia y náuseas desde ayer",
+    "Revisión general sin hallazgos relevantes en la exploración",
+]
+
+FRAUD_TEXTS = [
+    "Transferencia urgente a cuenta extranjera para liberar fondos bloqueados",
+    "Pago mensual de servicios de electricidad",
+    "Ganaste la lotería, verificar cuenta para recibir el premio",
+    "Compra en supermercado del barrio",
+    "Inversión segura con ganancias garantizadas y retorno alto",
+]
+
+
+def load_service(name: str):
+    """Importa app.py del servicio indicado (y service_common desde la raíz)"""
+    sys.path[:0] = [str(SERVICES[name]), str(ROOT)]
+    return importlib.import_module("app")
+
+
+def make_payload(service: str, i: int) -> Dict[str, Any]:
+    """Petición sintética distinta para cada i (evita medir solo la caché)"""
+    if service == "medical":
+        return {
+            "text": f"{MEDICAL_NOTES[i % len(MEDICAL_NOTES)]} (registro {i})",
+            "patient_age": 20 + i % 70,
+            "symptoms": ["fatiga"] if i % 3 == 0 else []
+        }
+    return {
+        "text": f"{FRAUD_TEXTS[i % len(FRAUD_TEXTS)]} ref {i}",
+        "amount": float((i * 7919) % 80000),
+        "merchant": "unknown" if i % 10 == 0 else "comercio local",
+        "timestamp": "2024-01-01T12:00:00"
+    }
+
+
+async def asgi_request(app, method: str, path: str, body: bytes = b"") -> Tuple[int, bytes]:
+    """Ejecuta una petición HTTP completa contra la aplicación ASGI"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"benchmark"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("benchmark", 80),
+    }
+    request_sent = False
+    disconnected = asyncio.Event()
+    status = 0
+    chunks: List[bytes] = []
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                disconnected.set()
+
+    await app(scope, receive, send)
+    return status, b"".join(chunks)
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def summarize(latencies_ms: List[float], errors: int, elapsed_s: float) -> Dict[str, Any]:
+    ordered = sorted(latencies_ms)
+    return {
+        "requests": len(latencies_ms),
+        "errors": errors,
+        "elapsed_s": round(elapsed_s, 3),
+        "rps": round(len(latencies_ms) / elapsed_s, 1) if elapsed_s else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered), 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 50), 3),
+        "p95_ms": round(percentile(ordered, 95), 3),
+        "p99_ms": round(percentile(ordered, 99), 3),
+    }
+
+
+async def run_load(app, path: str, payload_factory: Callable[[int], Dict[str, Any]],
+                   total: int, concurrency: int) -> Dict[str, Any]:
+    """Lanza `total` peticiones POST con `concurrency` clientes simultáneos"""
+    bodies = [json.dumps(payload_factory(i)).encode() for i in range(total)]
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def client():
+        nonlocal next_index, errors
+        while next_index < total:
+            body = bodies[next_index]
+            next_index += 1
+            start = time.perf_counter()
+            status, _ = await asgi_request(app, "POST", path, body)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if status != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def run_service_load(app, service: str, total: int, concurrency: int, warmup: int = 200) -> Dict[str, Any]:
+    """Arranca la aplicación, calienta y mide /predict"""
+    await app.router.startup()
+    try:
+        await run_load(app, "/predict", lambda i: make_payload(service, total + i), warmup, concurrency)
+        return await run_load(app, "/predict", lambda i: make_payload(service, i), total, concurrency)
+    finally:
+        await app.router.shutdown()
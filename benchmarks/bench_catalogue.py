@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Escalado de classify_medical_enhanced con el tamaño del catálogo.
+
+Mide la latencia por nota con bases de conocimiento sintéticas de tamaño
+creciente (la real más códigos sintéticos) y la misma nota y síntomas en
+todas. Solo se puntúan los códigos candidatos, así que el coste debe crecer
+muy por debajo del tamaño del catálogo: el exponente de escalado (pendiente
+log-log del p50 frente al número de códigos) se imprime al final; 1.0
+equivale a recorrer el catálogo entero.
+
+Uso:
+    python benchmarks/bench_catalogue.py --sizes 1000 5000 20000 50000 --iterations 300
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--note-length", type=int, default=500)
+    parser.add_argument("--age", type=int, default=70, help="Edad del paciente (> 60 activa la bonificación)")
+    args = parser.parse_args()
+
+    sys.path.insert(0, BENCH_DIR)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    from asgi_load import load_service
+    from bench_classifiers import knowledge_base, synthetic_knowledge_base, synthetic_text, timed
+
+    app_module = load_service("medical")
+    base = app_module.MEDICAL_KNOWLEDGE_BASE
+    rng = random.Random(42)
+    phrases = [p for k in base.values() for p in k["keywords"] + k["symptoms"]]
+    text = synthetic_text(phrases, args.note_length, rng)
+    symptoms = [rng.choice(phrases) for _ in range(5)]
+
+    print(f"Nota de {len(text)} caracteres, {len(symptoms)} síntomas, edad {args.age}")
+    print(f"{'códigos':>10}{'media µs':>12}{'p50 µs':>12}{'p99 µs':>12}")
+    points = []
+    for size in args.sizes:
+        with knowledge_base(app_module, synthetic_knowledge_base(base, size)):
+            classify = app_module.classify_medical_enhanced
+            classify(text, args.age, symptoms)  # Tablas por índice fuera de la medición
+            result = timed(lambda: classify(text, args.age, symptoms), args.iterations)
+        points.append((size, result["p50_us"]))
+        print(f"{size:>10}{result['mean_us']:>12}{result['p50_us']:>12}{result['p99_us']:>12}")
+
+    if len(points) >= 2:
+        (first_size, first_p50), (last_size, last_p50) = points[0], points[-1]
+        exponent = math.log(last_p50 / first_p50) / math.log(last_size / first_size)
+        print(f"\nExponente de escalado: {exponent:.2f} "
+              f"(x{last_size / first_size:.0f} códigos -> x{last_p50 / first_p50:.2f} latencia)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Micro-benchmarks de los clasificadores.
+
+Mide classify_medical_enhanced y predict_fraud_enhanced en proceso con
+entradas sintéticas deterministas: longitud de nota (10–2000 caracteres),
+número de síntomas (0–20) y tamaño de la base de conocimiento.
+"""
+
+import random
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List
+
+NOTE_LENGTHS = (10, 100, 500, 1000, 2000)
+SYMPTOM_COUNTS = (0, 5, 10, 20)
+KB_SIZES = (100, 1000, 5000)
+FRAUD_TEXT_LENGTHS = (10, 100, 500, 1000)
+
+FILLER_WORDS = ("paciente", "refiere", "desde", "hace", "días", "con", "sin", "antecedentes",
+                "exploración", "normal", "leve", "moderado", "control", "tratamiento", "de", "el")
+CATEGORIES = ("cardiovascular", "endocrino", "respiratorio", "digestivo", "neurológico", "musculoesquelético")
+
+
+def timed(func: Callable[[], Any], iterations: int) -> Dict[str, float]:
+    """Ejecuta func `iterations` veces y resume la latencia por llamada en µs"""
+    samples: List[float] = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "mean_us": round(sum(samples) / len(samples), 2),
+        "p50_us": round(samples[len(samples) // 2], 2),
+        "p99_us": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 2),
+    }
+
+
+def synthetic_text(phrases: List[str], length: int, rng: random.Random) -> str:
+    """Texto de `length` caracteres mezclando frases clínicas y relleno"""
+    words: List[str] = []
+    size = 0
+    while size < length:
+        word = rng.choice(phrases) if rng.random() < 0.2 else rng.choice(FILLER_WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)[:length]
+
+
+def synthetic_word(rng: random.Random) -> str:
+    syllables = ("ca", "lo", "ri", "te", "mi", "na", "so", "pu", "ver", "tal", "ges", "dro")
+    return "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+
+
+def synthetic_knowledge_base(base: Dict[str, Dict[str, Any]], size: int, seed: int = 7) -> Dict[str, Dict[str, Any]]:
+    """Base de conocimiento de `size` códigos: la real más códigos sintéticos"""
+    rng = random.Random(seed)
+    knowledge_base = dict(base)
+    for i in range(max(0, size - len(base))):
+        knowledge_base[f"S{i:05d}"] = {
+            "keywords": [f"{synthetic_word(rng)} {synthetic_word(rng)}" for _ in range(6)],
+            "symptoms": [f"{synthetic_word(rng)} {synthetic_word(rng)}" for _ in range(4)],
+            "description": f"Código sintético {i}",
+            "confidence": 0.8,
+            "category": CATEGORIES[i % len(CATEGORIES)],
+        }
+    return knowledge_base
+
+
+@contextmanager
+def knowledge_base(app_module, kb: Dict[str, Dict[str, Any]]):
+    """Sustituye temporalmente la base de conocimiento del servicio médico"""
+    original_kb, original_index = app_module.MEDICAL_KNOWLEDGE_BASE, app_module.KNOWLEDGE_INDEX
+    app_module.MEDICAL_KNOWLEDGE_BASE = kb
+    app_module.KNOWLEDGE_INDEX = app_module.KnowledgeIndex(kb)
+    try:
+        yield
+    finally:
+        app_module.MEDICAL_KNOWLEDGE_BASE, app_module.KNOWLEDGE_INDEX = original_kb, original_index
+
+
+def medical_micro(app_module, iterations: int = 200, kb_sizes=KB_SIZES) -> Dict[str, Dict[str, float]]:
+    rng = random.Random(42)
+    kb = app_module.MEDICAL_KNOWLEDGE_BASE
+    phrases = [p for k in kb.values() for p in k["keywords"] + k["symptoms"]]
+    classify = app_module.classify_medical_enhanced
+    results: Dict[str, Dict[str, float]] = {}
+
+    for length in NOTE_LENGTHS:
+        text = synthetic_text(phrases, length, rng)
+        results[f"medical.note_length={length}"] = timed(lambda: classify(text, 55, []), iterations)
+
+    text = synthetic_text(phrases, 500, rng)
+    for count in SYMPTOM_COUNTS:
+        symptoms = [rng.choice(phrases) for _ in range(count)]
+        results[f"medical.symptoms={count}"] = timed(lambda: classify(text, 55, symptoms), iterations)
+
+    symptoms = [rng.choice(phrases) for _ in range(5)]
+    for size in kb_sizes:
+        with knowledge_base(app_module, synthetic_knowledge_base(kb, size)):
+            classify = app_module.classify_medical_enhanced
+            results[f"medical.kb_size={size}"] = timed(lambda: classify(text, 55, symptoms), iterations)
+
+    return results
+
+
+def fraud_micro(app_module, iterations: int = 200) -> Dict[str, Dict[str, float]]:
+    rng = random.Random(42)
+    phrases = [k for keywords in app_module.FRAUD_PATTERNS.values() for k in keywords]
+    predict = app_module.predict_fraud_enhanced
+    results: Dict[str, Dict[str, float]] = {}
+
+    for length in FRAUD_TEXT_LENGTHS:
+        text = synthetic_text(phrases, length, rng)
+        results[f"fraud.text_length={length}"] = timed(lambda: predict(text, 12000.0, "comercio local"), iterations)
+
+    return results
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Arranque en frío de los servicios: tiempo hasta la primera predicción correcta.
+
+Lanza cada servicio como en el contenedor (`python -m app`, puerto en PORT)
+y sondea cada pocos milisegundos hasta que POST /predict responde 200. Mide
+desde el lanzamiento del proceso:
+
+- primera predicción: primera respuesta 200 de /predict
+- listo: primera respuesta 200 de /ready (el pod entra en el Service)
+- latencia de la primera predicción tras /ready frente a la mediana de las
+  siguientes (coste de la inicialización perezosa que queda)
+
+Repite `--runs` arranques por servicio y guarda los resultados en JSON para
+seguir la evolución del arranque en frío entre versiones.
+
+Uso:
+    python benchmarks/bench_cold_start.py --services medical fraud --runs 5
+    python benchmarks/bench_cold_start.py --output benchmarks/results/cold_start.json
+    SERVING_MODE=pool python benchmarks/bench_cold_start.py --services medical
+"""
+
+import argparse
+import json
+import os
+import platform
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+from asgi_load import ROOT, SERVICES, make_payload  # noqa: E402
+
+POLL_INTERVAL_SECONDS = 0.005
+WARM_REQUESTS = 20
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def request(url: str, body: Optional[Dict[str, Any]] = None) -> Optional[int]:
+    """Código HTTP de la petición; None si el servidor aún no acepta conexiones"""
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=5) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (ConnectionError, urllib.error.URLError, socket.timeout):
+        return None
+
+
+def cold_start(service: str, timeout: float) -> Dict[str, Any]:
+    """Un arranque: tiempos desde el lanzamiento del proceso en segundos"""
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    # Como en el contenedor, service_common queda al lado de app.py en el path
+    pythonpath = os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH", "")]))
+    env = {**os.environ, "PORT": str(port), "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"), "PYTHONPATH": pythonpath}
+    launched = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "app"], cwd=str(SERVICES[service]), env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    result: Dict[str, Any] = {"first_prediction_s": None, "ready_s": None}
+    try:
+        ready_supported = True
+        while time.perf_counter() - launched < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"{service}: el proceso terminó con código {process.returncode}")
+            if result["first_prediction_s"] is None and request(f"{base}/predict", make_payload(service, 0)) == 200:
+                result["first_prediction_s"] = time.perf_counter() - launched
+            if ready_supported and result["ready_s"] is None:
+                status = request(f"{base}/ready")
+                if status == 200:
+                    result["ready_s"] = time.perf_counter() - launched
+                ready_supported = status != 404
+            if result["first_prediction_s"] is not None and (result["ready_s"] is not None or not ready_supported):
+                break
+            time.sleep(POLL_INTERVAL_SECONDS)
+        else:
+            raise RuntimeError(f"{service}: sin predicción correcta en {timeout:.0f}s")
+
+        # Primera predicción con una nota nueva tras estar listo, frente a las siguientes
+        latencies = []
+        for i in range(1, WARM_REQUESTS + 2):
+            start = time.perf_counter()
+            request(f"{base}/predict", make_payload(service, i))
+            latencies.append((time.perf_counter() - start) * 1000)
+        result["first_request_ms"] = latencies[0]
+        result["warm_request_ms"] = sorted(latencies[1:])[WARM_REQUESTS // 2]
+        return result
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def summarize(runs, field: str) -> Optional[Dict[str, float]]:
+    values = sorted(run[field] for run in runs if run[field] is not None)
+    if not values:
+        return None
+    return {"median": round(values[len(values) // 2], 4), "min": round(values[0], 4), "max": round(values[-1], 4)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--services", nargs="+", choices=sorted(SERVICES), default=["medical", "fraud"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Segundos máximos por arranque")
+    parser.add_argument("--output", help="Fichero JSON con los resultados")
+    args = parser.parse_args()
+
+    report: Dict[str, Any] = {
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "serving_mode": os.getenv("SERVING_MODE", "inline"),
+        "results": {}
+    }
+    print(f"{'servicio':>9} {'1ª predicción':>14} {'listo':>8} {'1ª petición':>12} {'en caliente':>12}")
+    for service in args.services:
+        runs = [cold_start(service, args.timeout) for _ in range(args.runs)]
+        summary = {field: summarize(runs, field)
+                   for field in ("first_prediction_s", "ready_s", "first_request_ms", "warm_request_ms")}
+        report["results"][service] = {"runs": runs, "summary": summary}
+
+        def median(field: str, scale: float, unit: str) -> str:
+            return f"{summary[field]['median'] * scale:.1f} {unit}" if summary[field] else "-"
+
+        print(f"{service:>9} {median('first_prediction_s', 1000, 'ms'):>14} {median('ready_s', 1000, 'ms'):>8} "
+              f"{median('first_request_ms', 1, 'ms'):>12} {median('warm_request_ms', 1, 'ms'):>12}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
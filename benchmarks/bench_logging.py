@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark de carga de /predict con distintos modos de logging.
+
+Cada modo se ejecuta en un subproceso con su propia configuración de
+entorno (el logging se configura al importar app.py) y la salida de logs se
+escribe en un fichero temporal real. Muestra req/s y latencias p50/p99.
+
+Uso:
+    python benchmarks/bench_logging.py --service medical --requests 5000 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+MODES = {
+    "off": {"LOG_LEVEL": "WARNING"},
+    "sync": {"LOG_LEVEL": "INFO", "LOG_ASYNC": "false"},
+    "async": {"LOG_LEVEL": "INFO", "LOG_ASYNC": "true"},
+    "async-json-sampled": {"LOG_LEVEL": "INFO", "LOG_ASYNC": "true", "LOG_FORMAT": "json",
+                           "LOG_SAMPLE_RATE_PREDICT": "0.1"},
+}
+
+
+def run_worker(service: str, requests: int, concurrency: int) -> None:
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from asgi_load import load_service, run_service_load
+
+    app_module = load_service(service)
+    result = asyncio.run(run_service_load(app_module.app, service, requests, concurrency))
+    print(json.dumps(result))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--service", choices=["medical", "fraud"], default="medical")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.service, args.requests, args.concurrency)
+        return
+
+    print(f"Servicio: {args.service} - {args.requests} peticiones, concurrencia {args.concurrency}")
+    print(f"{'modo':<22}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errores':>10}")
+    for mode in args.modes:
+        # Sin caché de resultados: se mide el coste completo de cada petición
+        env = {**os.environ, "RESULT_CACHE_MAX_SIZE": "0", **MODES[mode]}
+        with tempfile.TemporaryFile() as log_file:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--worker", "--service", args.service,
+                 "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+                env=env, stdout=subprocess.PIPE, stderr=log_file, check=True, text=True
+            ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:<22}{result['rps']:>10}{result['p50_ms']:>10}{result['p99_ms']:>10}{result['errors']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Recuperación aproximada de códigos (IVF) frente a fuerza bruta al crecer el catálogo.
+
+Genera catálogos sintéticos agrupados por familias (como los capítulos de la
+CIE-10: los códigos de una familia comparten raíces) y consultas que usan
+algunas palabras de un código con variaciones de sufijo ("torácico"/"tórax")
+y relleno. Para cada tamaño mide la construcción del índice, la latencia
+p50/p99 de search (IVF, nprobe listas) y search_exact (matriz completa), el
+recall@k del IVF respecto a la fuerza bruta (vecinos por encima de la
+similitud mínima) y la tasa con la que el código de origen aparece en el top-k.
+
+Uso:
+    python benchmarks/bench_retrieval.py --sizes 1000 10000 50000 --queries 500
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICE_DIR = os.path.join(os.path.dirname(BENCH_DIR), "medical-service")
+
+SYLLABLES = ("ca", "lo", "ri", "te", "mi", "na", "so", "pu", "ver", "tal", "ges", "dro", "bra", "cu", "fen",
+             "gli", "ho", "jar", "ke", "lum", "mos", "nei", "plo", "qui", "ran", "sil", "tor", "ux", "vi", "zo",
+             "al", "em", "in", "ob", "ur", "que", "gue", "cri", "pla", "tre")
+SUFFIXES = ("ico", "ica", "itis", "osis", "al", "ar", "ia", "oso", "ante", "ción")
+FILLER_WORDS = ("paciente", "refiere", "desde", "hace", "días", "con", "sin", "antecedentes", "leve", "de", "el")
+
+
+def stem(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+
+
+def clustered_catalogue(size: int, family_size: int = 40, seed: int = 7):
+    """Catálogo de `size` códigos en familias de ~family_size que comparten raíces"""
+    rng = random.Random(seed)
+    shared = [stem(rng) for _ in range(200)]
+    catalogue, families = {}, []
+    for code_number in range(size):
+        if code_number % family_size == 0:
+            families.append([stem(rng) for _ in range(12)])
+        roots = families[-1]
+        words = [rng.choice(roots) + rng.choice(SUFFIXES) for _ in range(3)]
+        words += [stem(rng) + rng.choice(SUFFIXES) for _ in range(2)]
+        words += [rng.choice(shared)]
+        catalogue[f"S{code_number:06d}"] = {
+            "keywords": [f"{words[0]} {words[3]}", f"{words[1]} {words[4]}", words[5]],
+            "symptoms": [f"{words[2]} {words[4]}"],
+            "description": f"{words[0]} {words[1]} de {words[5]}",
+            "confidence": 0.8,
+            "category": f"familia {len(families)}",
+        }
+    return catalogue
+
+
+def synthetic_query(entry, rng: random.Random) -> str:
+    """Consulta con palabras del código, sufijos cambiados en algunas y relleno"""
+    words = " ".join([entry["description"], *entry["keywords"], *entry["symptoms"]]).split()
+    words = [word for word in words if word != "de"]
+    picked = rng.sample(words, min(3, len(words)))
+    varied = [word[:-2] + rng.choice(SUFFIXES) if rng.random() < 0.5 and len(word) > 5 else word for word in picked]
+    filler = rng.sample(FILLER_WORDS, 3)
+    return " ".join(varied + filler)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000, 50000])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--min-similarity", type=float, default=0.1)
+    args = parser.parse_args()
+
+    sys.path.insert(0, SERVICE_DIR)
+    from matcher import KnowledgeIndex
+    from retrieval import RetrievalIndex
+
+    print(f"{'códigos':>8} {'listas':>6} {'build':>7} {'método':>10} {'p50 µs':>8} {'p99 µs':>8} "
+          f"{'recall@k':>8} {'aciertos':>8}")
+    for size in args.sizes:
+        catalogue = clustered_catalogue(size)
+        index = KnowledgeIndex(catalogue)
+        t0 = time.perf_counter()
+        retrieval = RetrievalIndex.build(index)
+        build_seconds = time.perf_counter() - t0
+
+        rng = random.Random(42)
+        targets = [rng.randrange(size) for _ in range(args.queries)]
+        queries = [retrieval.encode(synthetic_query(catalogue[index.codes[target]], rng)) for target in targets]
+
+        def run(search):
+            samples, results = [], []
+            for query in queries:
+                start = time.perf_counter_ns()
+                results.append([(code_idx, similarity) for code_idx, similarity in search(query)
+                                if similarity >= args.min_similarity])
+                samples.append(time.perf_counter_ns() - start)
+            samples.sort()
+            return samples, results
+
+        exact_ns, exact = run(lambda query: retrieval.search_exact(query, args.k))
+        rows = [("exacta", exact_ns, exact)]
+        for nprobe in args.nprobe:
+            ivf_ns, ivf = run(lambda query: retrieval.search(query, args.k, nprobe))
+            rows.append((f"ivf/{nprobe}", ivf_ns, ivf))
+
+        for method, samples, results in rows:
+            expected = sum(len(reference) for reference in exact)
+            found = sum(len({c for c, _ in got} & {c for c, _ in reference}) for got, reference in zip(results, exact))
+            hits = sum(target in {c for c, _ in got} for target, got in zip(targets, results))
+            print(f"{size:>8} {retrieval.nlist:>6} {build_seconds:>6.1f}s {method:>10} "
+                  f"{samples[len(samples) // 2] / 1000:>8.1f} {samples[int(len(samples) * 0.99)] / 1000:>8.1f} "
+                  f"{found / max(expected, 1):>8.3f} {hits / len(targets):>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Coste del framework en /predict: validación de la petición y serialización.
+
+Repite la misma petición para que el resultado salga de la caché y quede
+solo el camino HTTP (parseo y validación del cuerpo, construcción y
+serialización de la respuesta). Se ejecuta en un único event loop (un
+núcleo) contra la aplicación ASGI en proceso; cada servicio va en su propio
+subproceso. Muestra req/s y latencias p50/p99 por servicio.
+
+Uso:
+    python benchmarks/bench_serialization.py --requests 20000 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PAYLOADS = {
+    "medical": {"text": "Paciente con dolor pecho irradiación brazo y sudoración, sospecha de infarto",
+                "patient_age": 64, "symptoms": ["disnea", "náuseas"]},
+    "fraud": {"text": "Transferencia urgente a cuenta extranjera para liberar fondos bloqueados",
+              "amount": 25000.0, "merchant": "unknown", "timestamp": "2024-01-01T12:00:00"},
+}
+
+
+def run_worker(service: str, requests: int, concurrency: int) -> None:
+    sys.path.insert(0, BENCH_DIR)
+    from asgi_load import load_service, run_load
+
+    app_module = load_service(service)
+    app = app_module.app
+
+    async def measure():
+        await app.router.startup()
+        try:
+            await run_load(app, "/predict", lambda i: PAYLOADS[service], 500, concurrency)
+            return await run_load(app, "/predict", lambda i: PAYLOADS[service], requests, concurrency)
+        finally:
+            await app.router.shutdown()
+
+    print(json.dumps(asyncio.run(measure())))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--services", nargs="+", choices=list(PAYLOADS), default=list(PAYLOADS))
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--worker", choices=list(PAYLOADS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.requests, args.concurrency)
+        return
+
+    print(f"{args.requests} peticiones idénticas (caché), concurrencia {args.concurrency}")
+    print(f"{'servicio':<10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errores':>10}")
+    for service in args.services:
+        env = {**os.environ, "LOG_LEVEL": "WARNING", "SERVING_MODE": "inline"}
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", service,
+             "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+            env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True, text=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{service:<10}{result['rps']:>10}{result['p50_ms']:>10}{result['p99_ms']:>10}{result['errors']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Reclasificación incremental de notas en edición frente a reenviar la nota.
+
+Simula el dictado de una nota (fragmentos de unas pocas palabras añadidos al
+final) con correcciones ocasionales en mitad del texto, hasta la longitud
+máxima. Para cada actualización mide classify_medical_enhanced sobre la nota
+completa (lo que hace /predict) y el camino de /sessions/delta: aplicar el
+cambio a la sesión y puntuar sus coincidencias. Comprueba además que ambos
+devuelven el mismo código y las mismas alternativas.
+
+Uso:
+    python benchmarks/bench_sessions.py --note-length 2000 --notes 20
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def edit_script(text: str, rng: random.Random, chunk_words: int, correction_rate: float):
+    """Cambios (start, end, texto) que construyen `text` por fragmentos con correcciones"""
+    words = text.split(" ")
+    current = ""
+    edits = []
+    for position in range(0, len(words), chunk_words):
+        chunk = " ".join(words[position:position + chunk_words])
+        chunk = chunk if not current else " " + chunk
+        edits.append((len(current), len(current), chunk))
+        current += chunk
+        if len(current) > 40 and rng.random() < correction_rate:
+            # Corrección: se borra una palabra en mitad del texto y se vuelve a escribir
+            start = current.index(" ", rng.randrange(len(current) // 2)) + 1
+            end = current.find(" ", start)
+            end = len(current) if end < 0 else end
+            word = current[start:end]
+            edits.append((start, end, ""))
+            edits.append((start, start, word))
+    return edits
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--note-length", type=int, default=2000)
+    parser.add_argument("--notes", type=int, default=20)
+    parser.add_argument("--chunk-words", type=int, default=3, help="Palabras por fragmento dictado")
+    parser.add_argument("--correction-rate", type=float, default=0.2)
+    args = parser.parse_args()
+
+    sys.path.insert(0, BENCH_DIR)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    from asgi_load import load_service
+    from bench_classifiers import synthetic_text
+
+    app_module = load_service("medical")
+    from sessions import NoteSession
+
+    base = app_module.MEDICAL_KNOWLEDGE_BASE
+    rng = random.Random(42)
+    phrases = [p for k in base.values() for p in k["keywords"] + k["symptoms"]]
+    symptoms = ["disnea", "fatiga"]
+    age = 64
+
+    full_ns, delta_ns, rescanned, tokens_total, updates, mismatches = [], [], 0, 0, 0, 0
+    for _ in range(args.notes):
+        edits = edit_script(synthetic_text(phrases, args.note_length, rng), rng,
+                            args.chunk_words, args.correction_rate)
+        session = NoteSession(app_module.KNOWLEDGE_INDEX, "")
+        app_module.set_session_patient(session, age, symptoms)
+        for start, end, chunk in edits:
+            text = session.text[:start] + chunk + session.text[end:]
+
+            t0 = time.perf_counter_ns()
+            expected = app_module.classify_medical_enhanced(text, age, symptoms)
+            t1 = time.perf_counter_ns()
+            rescanned += session.apply(start, end, chunk)
+            result = app_module.score_matches(session.index, session.text_hits(), session.user_hits,
+                                              len(session.text), age, False, "session")
+            t2 = time.perf_counter_ns()
+
+            full_ns.append(t1 - t0)
+            delta_ns.append(t2 - t1)
+            tokens_total += len(session.index.tokenize(text))
+            updates += 1
+            mismatches += (result["icd10_code"], result["alternative_codes"]) != (
+                expected["icd10_code"], expected["alternative_codes"])
+
+    full_ns.sort()
+    delta_ns.sort()
+
+    def percentiles(samples):
+        return (f"media {sum(samples) / len(samples) / 1000:8.1f} µs   p50 {samples[len(samples) // 2] / 1000:8.1f} µs"
+                f"   p99 {samples[int(len(samples) * 0.99)] / 1000:8.1f} µs")
+
+    print(f"{args.notes} notas de {args.note_length} caracteres, {updates} actualizaciones "
+          f"({args.chunk_words} palabras por fragmento, {args.correction_rate:.0%} con corrección)")
+    print(f"Nota completa:  {percentiles(full_ns)}")
+    print(f"Sesión (delta): {percentiles(delta_ns)}")
+    print(f"Aceleración:    x{sum(full_ns) / sum(delta_ns):.1f} en tiempo total")
+    print(f"Reescaneo:      {rescanned / updates:.1f} tokens por actualización "
+          f"(frente a {tokens_total / updates:.1f} de media en la nota completa)")
+    print(f"Diferencias:    {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Rendimiento del almacén de velocidad del servicio de fraude.
+
+Reproduce un flujo sintético de transacciones (cuentas con popularidad tipo
+Zipf, comercios aleatorios, importes log-normales y un 5% de sospechosas)
+con marcas de tiempo a la tasa objetivo, de modo que la ventana, la
+expulsión de claves inactivas y el límite de claves trabajan como en pico.
+Mide el throughput de VelocityStore.observe en un núcleo, su latencia
+p50/p99 en una pasada muestreada y la memoria por clave (tracemalloc).
+
+Uso:
+    python benchmarks/bench_velocity.py --transactions 1000000 --accounts 200000 --target-tps 10000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FRAUD_DIR = os.path.join(os.path.dirname(BENCH_DIR), "fraud-service")
+
+
+def synthetic_stream(transactions: int, accounts: int, merchants: int, tps: float, seed: int = 42):
+    """Lista de (cuenta, comercio, importe, sospechosa, instante) a la tasa tps"""
+    rng = random.Random(seed)
+    # Popularidad de cuentas tipo Zipf: pocas cuentas muy activas, cola larga
+    weights = [1 / (rank + 1) ** 0.8 for rank in range(accounts)]
+    account_ids = rng.choices(range(accounts), weights=weights, k=transactions)
+    start = 1_700_000_000.0
+    return [
+        (f"acc-{account}", f"merchant-{rng.randrange(merchants)}", rng.lognormvariate(4, 1.2),
+         rng.random() < 0.05, start + i / tps)
+        for i, account in enumerate(account_ids)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=1000000)
+    parser.add_argument("--accounts", type=int, default=200000)
+    parser.add_argument("--merchants", type=int, default=2000)
+    parser.add_argument("--target-tps", type=float, default=10000, help="Tasa de pico (marcas de tiempo del flujo)")
+    parser.add_argument("--window", type=float, default=300)
+    parser.add_argument("--max-keys", type=int, default=100000)
+    args = parser.parse_args()
+
+    sys.path.insert(0, FRAUD_DIR)
+    from velocity import VelocityStore
+
+    stream = synthetic_stream(args.transactions, args.accounts, args.merchants, args.target_tps)
+    print(f"{len(stream)} transacciones, {args.accounts} cuentas, {args.merchants} comercios, "
+          f"{args.target_tps:g} TPS simulados ({len(stream) / args.target_tps:.0f} s de tráfico), "
+          f"ventana {args.window:g} s, máximo {args.max_keys} claves")
+
+    # Throughput: una pasada completa sin instrumentar
+    store = VelocityStore(window_seconds=args.window, max_keys=args.max_keys)
+    observe = store.observe
+    flagged_signals = 0
+    started = time.perf_counter()
+    for account, merchant, amount, suspicious, now in stream:
+        flagged_signals += observe(account, merchant, amount, suspicious, now).risk > 0
+    elapsed = time.perf_counter() - started
+    throughput = len(stream) / elapsed
+
+    # Latencia por transacción en una pasada muestreada sobre un almacén nuevo
+    store = VelocityStore(window_seconds=args.window, max_keys=args.max_keys)
+    samples = []
+    for position, (account, merchant, amount, suspicious, now) in enumerate(stream):
+        if position % 10 == 0:
+            t0 = time.perf_counter_ns()
+            store.observe(account, merchant, amount, suspicious, now)
+            samples.append(time.perf_counter_ns() - t0)
+        else:
+            store.observe(account, merchant, amount, suspicious, now)
+    samples.sort()
+
+    # Memoria por clave con el almacén en régimen estable
+    tracemalloc.start()
+    store = VelocityStore(window_seconds=args.window, max_keys=args.max_keys)
+    for account, merchant, amount, suspicious, now in stream:
+        store.observe(account, merchant, amount, suspicious, now)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    stats = store.stats()
+    keys = stats["accounts"] + stats["account_merchant_pairs"]
+
+    print(f"\nThroughput:     {throughput:,.0f} transacciones/s en un núcleo "
+          f"({throughput / args.target_tps:.1f}x el objetivo de {args.target_tps:g} TPS)")
+    print(f"Latencia:       p50 {samples[len(samples) // 2] / 1000:.2f} µs, "
+          f"p99 {samples[int(len(samples) * 0.99)] / 1000:.2f} µs")
+    print(f"Con señales:    {flagged_signals / len(stream):.1%} de las transacciones")
+    print(f"Claves finales: {stats['accounts']} cuentas, {stats['account_merchant_pairs']} pares "
+          f"cuenta-comercio, {stats['evictions']} expulsiones")
+    print(f"Memoria:        {memory / 2 ** 20:.1f} MiB ({memory / max(1, keys):.0f} bytes por clave)")
+    if throughput < args.target_tps:
+        print("\nAVISO: el almacén no alcanza la tasa objetivo en un núcleo")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
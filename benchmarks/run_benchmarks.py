@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Suite de benchmarks de rendimiento (offline, una sola máquina).
+
+Ejecuta los micro-benchmarks de los clasificadores y la carga HTTP en
+proceso sobre /predict de cada servicio, guarda los resultados en JSON y,
+opcionalmente, los compara con una línea base para detectar regresiones.
+
+Uso:
+    python benchmarks/run_benchmarks.py --output benchmarks/results/baseline.json
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/baseline.json --tolerance 0.25
+    python benchmarks/run_benchmarks.py --quick
+
+Cada servicio se mide en un subproceso propio (ambos tienen un app.py y
+módulos con el mismo nombre). Código de salida 1 si hay regresiones.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import warnings
+from typing import Any, Dict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Entorno reproducible: sin logs por petición, sin caché y con reloj fijo
+WORKER_ENV = {
+    "LOG_LEVEL": "WARNING",
+    "RESULT_CACHE_MAX_SIZE": "0",
+    "FRAUD_FIXED_CLOCK": "2024-01-01T12:00:00",
+}
+
+
+def run_worker(service: str, quick: bool, requests: int, concurrency: int) -> Dict[str, Any]:
+    sys.path.insert(0, BENCH_DIR)
+    from asgi_load import load_service, run_service_load
+    import bench_classifiers
+
+    app_module = load_service(service)
+    iterations = 50 if quick else 200
+    if service == "medical":
+        kb_sizes = (100, 1000) if quick else bench_classifiers.KB_SIZES
+        results = bench_classifiers.medical_micro(app_module, iterations, kb_sizes)
+    else:
+        results = bench_classifiers.fraud_micro(app_module, iterations)
+
+    results[f"http.{service}.predict"] = asyncio.run(
+        run_service_load(app_module.app, service, requests, concurrency)
+    )
+    return results
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> int:
+    """Compara p50 (micro) y req/s (HTTP) con la línea base; devuelve nº de regresiones"""
+    regressions = 0
+    print(f"\n{'benchmark':<36}{'base':>12}{'actual':>12}{'cambio':>10}  unidad")
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        if "rps" in result:
+            before, after = base["rps"], result["rps"]
+            change = (before - after) / before if before else 0.0
+            unit = "req/s"
+        else:
+            before, after = base["p50_us"], result["p50_us"]
+            change = (after - before) / before if before else 0.0
+            unit = "p50 µs"
+        flag = "  REGRESIÓN" if change > tolerance else ""
+        regressions += bool(flag)
+        print(f"{name:<36}{before:>12.1f}{after:>12.1f}{change:>+10.0%}  {unit}{flag}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--services", nargs="+", choices=["medical", "fraud"], default=["medical", "fraud"])
+    parser.add_argument("--requests", type=int, default=3000, help="Peticiones por servicio en la carga HTTP")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--quick", action="store_true", help="Menos iteraciones y bases de conocimiento pequeñas")
+    parser.add_argument("--output", help="Fichero JSON donde guardar los resultados")
+    parser.add_argument("--compare", help="Fichero JSON de línea base con el que comparar")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Empeoramiento relativo tolerado")
+    parser.add_argument("--worker", choices=["medical", "fraud"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        warnings.simplefilter("ignore")
+        print(json.dumps(run_worker(args.worker, args.quick, args.requests, args.concurrency)))
+        return
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "params": {"requests": args.requests, "concurrency": args.concurrency, "quick": args.quick},
+        "results": {},
+    }
+    for service in args.services:
+        command = [sys.executable, os.path.abspath(__file__), "--worker", service,
+                   "--requests", str(args.requests), "--concurrency", str(args.concurrency)]
+        if args.quick:
+            command.append("--quick")
+        output = subprocess.run(command, env={**os.environ, **WORKER_ENV}, stdout=subprocess.PIPE,
+                                check=True, text=True).stdout
+        report["results"].update(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'benchmark':<36}{'p50':>12}{'p99':>12}{'req/s':>10}")
+    for name, result in report["results"].items():
+        if "rps" in result:
+            print(f"{name:<36}{result['p50_ms'] * 1000:>10.1f}µs{result['p99_ms'] * 1000:>10.1f}µs{result['rps']:>10}")
+        else:
+            print(f"{name:<36}{result['p50_us']:>10.1f}µs{result['p99_us']:>10.1f}µs{'':>10}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{regressions} regresiones por encima del {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,49 @@
 import os
+import sys
+import json
 import time
+# Inicio de la importación del servicio (fases del arranque en /ready y /metrics)
+IMPORT_STARTED = time.perf_counter()
+import asyncio
 import logging
-from typing import Dict, Any
+import math
+from datetime import datetime
+from typing import Dict, Any, AsyncIterator, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
 import numpy as np
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import uvicorn
-import re
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
 import traceback
 
-# Configurar logging mejorado
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+from service_common.admission import (BATCH, INTERACTIVE, LANES, AdmissionController, AdmissionRejected,
+                                     TenantRateLimiter, parse_deadline, parse_lane, tenant_id)
+from service_common.fast_json import FastJSONResponse, dumps, parse_body, request_body_schema
+from service_common.hot_reload import RuleSetWatcher
+from service_common.metrics import MetricsMiddleware, Registry
+from service_common.structured_logging import endpoint_logger, setup_logging, shutdown_logging
+from service_common.worker_pool import ClassifierPool, PoolSaturated, default_workers
+
+from cache import ResponseCache, make_cache_key
+from matcher import FraudPatternIndex
+from velocity import VelocitySignals, VelocityStore
+
+# Configurar logging no bloqueante (cola + hilo de escritura)
+setup_logging()
 logger = logging.getLogger(__name__)
+predict_logger = endpoint_logger("predict")
 
 class TransactionRequest(BaseModel):
     text: str
     amount: float = 0.0
     merchant: str = ""
+    timestamp: Optional[datetime] = None
+    # Identificador de la cuenta de origen; activa las señales de velocidad
+    account_id: str = ""
+    # Identificador de la transacción: sus reintentos no cuentan de nuevo en la
+    # velocidad (sin él cada petición cuenta como una transacción nueva)
+    transaction_id: str = ""
 
 class FraudResponse(BaseModel):
     fraud: bool
@@ -29,6 +52,24 @@ class FraudResponse(BaseModel):
     model_version: str
     processing_time_ms: float
 
+class FraudExplainedResponse(FraudResponse):
+    # Solo con explain=true: fraud_indicators, confidence_level, pattern_matches
+    explanation: Optional[Dict[str, Any]] = None
+
+class FraudBatchRequest(BaseModel):
+    texts: List[str]
+    amounts: List[float] = []
+    merchants: List[str] = []
+    timestamps: List[Optional[datetime]] = []
+
+class FraudBatchResponse(BaseModel):
+    fraud: List[Optional[bool]]
+    confidence: List[Optional[float]]
+    risk_score: List[Optional[float]]
+    errors: List[Optional[str]]
+    model_version: str
+    processing_time_ms: float
+
 class HealthResponse(BaseModel):
     status: str
     model_loaded: bool
@@ -49,9 +90,44 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métricas Prometheus expuestas en /metrics
+METRICS = Registry()
+REQUESTS_TOTAL = METRICS.counter("http_requests_total", "Peticiones HTTP atendidas", ("endpoint", "status"))
+REQUEST_LATENCY = METRICS.histogram("http_request_duration_seconds", "Latencia de las peticiones HTTP", ("endpoint",))
+REQUESTS_IN_FLIGHT = METRICS.gauge("http_requests_in_flight", "Peticiones HTTP en curso", ("endpoint",))
+VALIDATION_ERRORS = METRICS.counter("validation_errors_total", "Peticiones rechazadas por validación", ("endpoint", "reason"))
+STAGE_LATENCY = METRICS.histogram("classifier_stage_duration_seconds", "Duración de cada etapa del clasificador", ("classifier", "stage"))
+POOL_PENDING = METRICS.gauge("classifier_pool_pending", "Tareas en el pool de clasificación",
+                             callback=lambda: CLASSIFIER_POOL.pending if CLASSIFIER_POOL else 0)
+POOL_REJECTED = METRICS.counter("classifier_pool_rejected_total", "Peticiones rechazadas por saturación del pool", ("endpoint",))
+ADMISSION_QUEUE_DEPTH = METRICS.gauge("admission_queue_depth", "Peticiones esperando un slot de clasificación", ("lane",),
+                                      callback=lambda: {(lane,): ADMISSION.queued(lane) for lane in LANES})
+ADMISSION_ACTIVE = METRICS.gauge("admission_active_slots", "Slots de clasificación ocupados",
+                                 callback=lambda: ADMISSION.active)
+ADMISSION_SHED = METRICS.counter("admission_shed_total", "Peticiones rechazadas por el control de admisión",
+                                 ("endpoint", "lane", "reason"))
+VELOCITY_SIGNALS = METRICS.counter("velocity_signals_total", "Señales de velocidad sumadas al risk_score", ("signal",))
+VELOCITY_KEYS = METRICS.gauge("velocity_store_keys", "Claves en el almacén de velocidad", ("table",),
+                              callback=lambda: {(table,): VELOCITY_STORE.stats()[table] for table in ("accounts", "account_merchant_pairs")}
+                              if VELOCITY_STORE is not None else {})
+RULES_RELOADS = METRICS.counter("rules_reloads_total", "Recargas del conjunto de reglas de fraude publicadas")
+# Duración de cada fase del arranque: import, warmup y pool (en modo pool)
+STARTUP_PHASES: Dict[str, float] = {}
+STARTUP_DURATION = METRICS.gauge("startup_phase_seconds", "Duración de cada fase del arranque del servicio", ("phase",),
+                                 callback=lambda: {(phase,): seconds for phase, seconds in STARTUP_PHASES.items()})
+
+app.add_middleware(
+    MetricsMiddleware,
+    requests_total=REQUESTS_TOTAL,
+    latency=REQUEST_LATENCY,
+    in_flight=REQUESTS_IN_FLIGHT,
+    routes=("/", "/health", "/ready", "/metrics", "/predict", "/predict/batch", "/predict/stream", "/cache/stats", "/admission/stats", "/velocity/stats", "/rules"),
+)
+
 # Variables globales
 model_version = "Enhanced Transformer v2.0"
-model_loaded = True
+model_loaded = False  # True tras el calentamiento del arranque (/ready)
+WARMUP_TASK: Optional[asyncio.Task] = None
 
 # Patrones de fraude modernos basados en análisis semántico
 FRAUD_PATTERNS = {
@@ -87,107 +163,595 @@ PATTERN_WEIGHTS = {
     'phishing_indicators': 15
 }
 
-def predict_fraud_enhanced(text: str, amount: float, merchant: str) -> Dict[str, Any]:
-    """Predicción de fraude usando modelo mejorado con análisis semántico"""
+# Comercios considerados sospechosos (se reporta el primero que coincida)
+SUSPICIOUS_MERCHANTS = ['unknown', 'desconocido', 'temp', 'test', 'provisional']
+
+# Límite de transacciones por petición del endpoint por lotes
+BATCH_MAX_ITEMS = 10000
+
+# Ingesta NDJSON en streaming: tamaño de bloque y longitud máxima de línea
+STREAM_CHUNK_SIZE = 1000
+STREAM_MAX_LINE_BYTES = 64 * 1024
+
+# Franja horaria inusual (hora local de la transacción, [inicio, fin))
+UNUSUAL_HOUR_START = 0
+UNUSUAL_HOUR_END = 6
+
+# Reloj fijo opcional (ISO 8601) para pruebas y benchmarks reproducibles
+FIXED_CLOCK = datetime.fromisoformat(os.environ["FRAUD_FIXED_CLOCK"]) if os.getenv("FRAUD_FIXED_CLOCK") else None
+
+def load_fraud_rules(path: str) -> FraudPatternIndex:
+    """Compila un conjunto de reglas JSON: fraud_patterns, pattern_weights y suspicious_merchants"""
+    with open(path, encoding="utf-8") as f:
+        rules = json.load(f)
+    return FraudPatternIndex(rules["fraud_patterns"], rules["pattern_weights"],
+                             rules.get("suspicious_merchants", SUSPICIOUS_MERCHANTS))
+
+# Índice multi-patrón: reglas de FRAUD_RULES_PATH (fichero o montaje de ConfigMap) o
+# las integradas. Es un puntero copy-on-write: se sustituye entero al recargar y
+# cada predicción lee la referencia una sola vez.
+FRAUD_RULES_PATH = os.getenv("FRAUD_RULES_PATH", "")
+FRAUD_INDEX = (load_fraud_rules(FRAUD_RULES_PATH) if FRAUD_RULES_PATH
+               else FraudPatternIndex(FRAUD_PATTERNS, PATTERN_WEIGHTS, SUSPICIOUS_MERCHANTS))
+RULES_RELOAD_INTERVAL_SECONDS = float(os.getenv("RULES_RELOAD_INTERVAL_SECONDS", "5"))
+RULES_WATCHER: Optional[RuleSetWatcher] = None
+
+def versioned_model(rules_version: str) -> str:
+    """Versión del modelo expuesta en las respuestas, con la del conjunto de reglas"""
+    return f"{model_version} (reglas {rules_version})"
+
+# Caché de respuestas para transacciones duplicadas (reintentos de la pasarela)
+RESPONSE_CACHE = ResponseCache(
+    max_size=int(os.getenv("RESULT_CACHE_MAX_SIZE", "10000")),
+    ttl_seconds=float(os.getenv("RESULT_CACHE_TTL_SECONDS", "60"))
+)
+
+# Señales de velocidad por cuenta (opcional). El score base no tiene estado y se
+# cachea; la velocidad se suma después, en el proceso del event loop, porque el
+# almacén no puede vivir en los procesos del pool. Solo para una instancia: el
+# almacén es del proceso y no se comparte entre réplicas
+VELOCITY_STORE = VelocityStore(
+    window_seconds=float(os.getenv("VELOCITY_WINDOW_SECONDS", "300")),
+    buckets=int(os.getenv("VELOCITY_BUCKETS", "10")),
+    max_keys=int(os.getenv("VELOCITY_MAX_KEYS", "100000"))
+) if os.getenv("VELOCITY_ENABLED", "false").lower() == "true" else None
+
+# Modo de servicio: "inline" puntúa en el event loop; "pool" en procesos pre-forkeados
+SERVING_MODE = os.getenv("SERVING_MODE", "inline")
+SERVER_WORKERS = int(os.getenv("UVICORN_WORKERS", "1"))
+POOL_WORKERS = int(os.getenv("CLASSIFIER_POOL_WORKERS", "0")) or default_workers(SERVER_WORKERS)
+POOL_QUEUE_SIZE = int(os.getenv("CLASSIFIER_QUEUE_SIZE", "0")) or 4 * POOL_WORKERS
+DRAIN_TIMEOUT_SECONDS = float(os.getenv("DRAIN_TIMEOUT_SECONDS", "20"))
+RETRY_AFTER_SECONDS = "1"
+CLASSIFIER_POOL: Optional[ClassifierPool] = None
+EVENT_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+# Control de admisión: límite de tasa por tenant y slots de clasificación con
+# carriles interactive/batch. En modo pool hay un slot por proceso, de modo que
+# la espera ocurre en la cola con prioridad y no en la FIFO del pool.
+RATE_LIMITER = TenantRateLimiter(
+    rate=float(os.getenv("RATE_LIMIT_RPS", "0")),
+    burst=float(os.getenv("RATE_LIMIT_BURST", "0")) or 2 * float(os.getenv("RATE_LIMIT_RPS", "0"))
+)
+ADMISSION = AdmissionController(
+    slots=int(os.getenv("ADMISSION_SLOTS", "0")) or (POOL_WORKERS if SERVING_MODE == "pool" else 1),
+    max_queue=int(os.getenv("ADMISSION_QUEUE_SIZE", "0")) or POOL_QUEUE_SIZE
+)
+
+def transaction_time(timestamp: Optional[datetime]) -> datetime:
+    """Momento de la transacción; sin timestamp se usa el reloj actual (o FRAUD_FIXED_CLOCK)"""
+    if timestamp is not None:
+        return timestamp
+    return FIXED_CLOCK if FIXED_CLOCK is not None else datetime.now()
+
+def is_unusual_hour(timestamp: Optional[datetime]) -> bool:
+    """Indica si la transacción ocurre dentro de la franja horaria inusual"""
+    return UNUSUAL_HOUR_START <= transaction_time(timestamp).hour < UNUSUAL_HOUR_END
+
+# Tramos de monto: (umbral, puntos, indicador); se aplica el primero superado
+AMOUNT_TIERS = (
+    (50000, 30, "Transacción de alto valor (>50K)"),
+    (20000, 20, "Transacción de valor moderado-alto (>20K)"),
+    (10000, 15, "Transacción de valor moderado (>10K)"),
+    (5000, 10, "Transacción de valor medio (>5K)")
+)
+
+def fraud_decision(risk_score: float) -> Tuple[bool, str, float]:
+    """Fraude, nivel y confianza para un risk_score ya limitado a 100 (umbral adaptativo)"""
+    if risk_score > 60:
+        is_fraud = True
+        confidence_level = "Alta"
+    elif risk_score > 40:
+        is_fraud = True
+        confidence_level = "Media"
+    elif risk_score > 25:
+        is_fraud = False
+        confidence_level = "Sospechoso"
+    else:
+        is_fraud = False
+        confidence_level = "Bajo riesgo"
+    
+    # Calcular confianza mejorada
+    if is_fraud:
+        confidence = min(0.70 + (risk_score / 200), 0.98)
+    else:
+        confidence = min(0.60 + ((100 - risk_score) / 150), 0.95)
+    return is_fraud, confidence_level, confidence
+
+def predict_fraud_enhanced(text: str, amount: float, merchant: str,
+                           timestamp: Optional[datetime] = None, explain: bool = False) -> Dict[str, Any]:
+    """Predicción de fraude usando modelo mejorado con análisis semántico.
+    
+    El riesgo se calcula solo con pesos y conteos; con explain=True se añade
+    "explanation" con los indicadores y las frases encontradas por categoría.
+    """
+    
+    stage_start = time.perf_counter()
+    index = FRAUD_INDEX
     
     # Convertir a minúsculas para búsqueda
     text_lower = text.lower()
     merchant_lower = merchant.lower()
     
-    # Calcular score de riesgo basado en patrones semánticos
-    risk_score = 0
-    fraud_indicators = []
-    pattern_matches = {}
-    
-    # Analizar patrones por categoría
-    for pattern_type, keywords in FRAUD_PATTERNS.items():
-        matches = []
-        for keyword in keywords:
-            if keyword in text_lower or keyword in merchant_lower:
-                matches.append(keyword)
-                weight = PATTERN_WEIGHTS[pattern_type]
-                risk_score += weight
-                
-        if matches:
-            pattern_matches[pattern_type] = matches
-            fraud_indicators.append(f"{pattern_type.replace('_', ' ').title()}: {', '.join(matches)}")
+    # Una pasada del índice sobre texto y comercio para todas las categorías;
+    # las frases encontradas solo se listan con explain
+    fraud_indicators: Optional[List[str]] = [] if explain else None
+    if explain:
+        pattern_matches, risk_score = index.scan(text_lower, merchant_lower)
+        fraud_indicators.extend(
+            f"{pattern_type.replace('_', ' ').title()}: {', '.join(matches)}"
+            for pattern_type, matches in pattern_matches.items()
+        )
+    else:
+        risk_score = index.risk(text_lower, merchant_lower)
+    suspect = index.suspicious_merchant(merchant_lower)
+    matched_at = time.perf_counter()
     
     # Análisis de contexto financiero
-    if amount > 50000:
-        risk_score += 30
-        fraud_indicators.append("Transacción de alto valor (>50K)")
-    elif amount > 20000:
-        risk_score += 20
-        fraud_indicators.append("Transacción de valor moderado-alto (>20K)")
-    elif amount > 10000:
-        risk_score += 15
-        fraud_indicators.append("Transacción de valor moderado (>10K)")
-    elif amount > 5000:
-        risk_score += 10
-        fraud_indicators.append("Transacción de valor medio (>5K)")
+    for threshold, points, indicator in AMOUNT_TIERS:
+        if amount > threshold:
+            risk_score += points
+            if fraud_indicators is not None:
+                fraud_indicators.append(indicator)
+            break
     
     # Análisis de comercio sospechoso
-    suspicious_merchants = ['unknown', 'desconocido', 'temp', 'test', 'provisional']
-    for suspect in suspicious_merchants:
-        if suspect in merchant_lower:
-            risk_score += 25
+    if suspect is not None:
+        risk_score += 25
+        if fraud_indicators is not None:
             fraud_indicators.append(f"Comercio sospechoso: {suspect}")
-            break
     
-    # Análisis de contexto temporal (horarios inusuales simulados)
-    import random
-    if random.random() < 0.3:  # 30% de probabilidad de horario sospechoso
+    # Análisis de contexto temporal (horario de madrugada)
+    if is_unusual_hour(timestamp):
         risk_score += 10
-        fraud_indicators.append("Horario de transacción inusual")
+        if fraud_indicators is not None:
+            fraud_indicators.append("Horario de transacción inusual")
     
     # Análisis de longitud y complejidad del texto
     if len(text) > 200:
         risk_score += 5
-        fraud_indicators.append("Descripción excesivamente larga")
+        if fraud_indicators is not None:
+            fraud_indicators.append("Descripción excesivamente larga")
     elif len(text) < 20:
         risk_score += 8
-        fraud_indicators.append("Descripción sospechosamente corta")
+        if fraud_indicators is not None:
+            fraud_indicators.append("Descripción sospechosamente corta")
     
     # Limitar el score a 100
     risk_score = min(risk_score, 100)
+    is_fraud, confidence_level, confidence = fraud_decision(risk_score)
     
-    # Determinar si es fraude con threshold adaptativo
-    if risk_score > 60:
-        is_fraud = True
-        confidence_level = "Alta"
-    elif risk_score > 40:
-        is_fraud = True  
-        confidence_level = "Media"
-    elif risk_score > 25:
-        is_fraud = False
-        confidence_level = "Sospechoso"
-    else:
-        is_fraud = False
-        confidence_level = "Bajo riesgo"
+    observe_stage(matched_at - stage_start, "single", "pattern_matching")
+    observe_stage(time.perf_counter() - matched_at, "single", "scoring")
     
-    # Calcular confianza mejorada
-    if is_fraud:
-        confidence = min(0.70 + (risk_score / 200), 0.98)
-    else:
-        confidence = min(0.60 + ((100 - risk_score) / 150), 0.95)
+    result = {
+        "fraud": is_fraud,
+        "confidence": confidence,
+        "risk_score": risk_score,
+        "rules_version": index.version
+    }
+    if explain:
+        result["explanation"] = {
+            "fraud_indicators": fraud_indicators,
+            "confidence_level": confidence_level,
+            "pattern_matches": pattern_matches,
+            "algorithm_version": "Enhanced Semantic Analysis v2.0"
+        }
+    return result
+
+def apply_velocity(result: Dict[str, Any], signals: VelocitySignals) -> Dict[str, Any]:
+    """Suma las señales de velocidad al score base sin modificar el resultado (puede estar en caché).
+    
+    Los indicadores de las señales solo se formatean si hay explicación.
+    """
+    risk_score = min(result["risk_score"] + signals.risk, 100)
+    is_fraud, confidence_level, confidence = fraud_decision(risk_score)
+    adjusted = {**result, "fraud": is_fraud, "confidence": confidence, "risk_score": risk_score}
+    explanation = result.get("explanation")
+    if explanation is not None:
+        adjusted["explanation"] = {**explanation, "confidence_level": confidence_level,
+                                   "fraud_indicators": explanation["fraud_indicators"] + VELOCITY_STORE.indicators(signals)}
+    return adjusted
+
+def predict_fraud_batch(texts: Sequence[str], amounts: Sequence[float], merchants: Sequence[str],
+                        timestamps: Optional[Sequence[Optional[datetime]]] = None) -> Dict[str, np.ndarray]:
+    """Predicción de fraude vectorizada para un lote de transacciones.
+    
+    El texto y el comercio de cada transacción se recorren una vez con el
+    índice de patrones; tramos de monto, suma de PATTERN_WEIGHTS, límite de
+    100, umbrales y confianza se calculan como operaciones sobre arrays.
+    """
+    n = len(texts)
+    index = FRAUD_INDEX
+    stage_start = time.perf_counter()
+    
+    # Matriz transacción × categoría con el número de frases encontradas
+    counts = np.zeros((n, len(index.categories)), dtype=np.int64)
+    suspicious = np.zeros(n, dtype=bool)
+    text_lengths = np.empty(n, dtype=np.int64)
+    for row, (text, merchant) in enumerate(zip(texts, merchants)):
+        merchant_lower = merchant.lower()
+        for category_idx, count in index.category_counts(text.lower(), merchant_lower).items():
+            counts[row, category_idx] = count
+        suspicious[row] = index.suspicious_merchant(merchant_lower) is not None
+        text_lengths[row] = len(text)
+    matched_at = time.perf_counter()
+    
+    amounts = np.asarray(amounts, dtype=float)
+    hours = np.array([transaction_time(t).hour for t in (timestamps or [None] * n)], dtype=np.int64)
+    risk_score = counts @ np.asarray(index.weights, dtype=np.int64)
+    
+    # Análisis de contexto financiero por tramos de monto
+    risk_score += np.select(
+        [amounts > threshold for threshold, _, _ in AMOUNT_TIERS],
+        [points for _, points, _ in AMOUNT_TIERS],
+        0
+    )
+    
+    # Comercio sospechoso
+    risk_score += np.where(suspicious, 25, 0)
+    
+    # Análisis de contexto temporal (horario de madrugada)
+    risk_score += np.where((hours >= UNUSUAL_HOUR_START) & (hours < UNUSUAL_HOUR_END), 10, 0)
+    
+    # Análisis de longitud del texto
+    risk_score += np.select([text_lengths > 200, text_lengths < 20], [5, 8], 0)
+    
+    # Limitar el score a 100 y aplicar umbrales
+    risk_score = np.minimum(risk_score, 100)
+    is_fraud = risk_score > 40
+    confidence_level = np.select(
+        [risk_score > 60, risk_score > 40, risk_score > 25],
+        ["Alta", "Media", "Sospechoso"],
+        "Bajo riesgo"
+    )
+    confidence = np.where(
+        is_fraud,
+        np.minimum(0.70 + (risk_score / 200), 0.98),
+        np.minimum(0.60 + ((100 - risk_score) / 150), 0.95)
+    )
+    
+    observe_stage(matched_at - stage_start, "batch", "pattern_matching")
+    observe_stage(time.perf_counter() - matched_at, "batch", "scoring")
     
     return {
         "fraud": is_fraud,
         "confidence": confidence,
         "risk_score": risk_score,
-        "fraud_indicators": fraud_indicators,
         "confidence_level": confidence_level,
-        "pattern_matches": pattern_matches,
-        "algorithm_version": "Enhanced Semantic Analysis v2.0"
+        "rules_version": index.version
     }
 
+# Motivos de rechazo de la validación: clave (etiqueta de métrica) → mensaje
+VALIDATION_MESSAGES = {
+    "invalid_request": "Registro inválido",
+    "line_too_long": f"Línea demasiado larga (máximo {STREAM_MAX_LINE_BYTES} bytes)",
+    "text_required": "Texto de transacción requerido",
+    "text_too_short": "Texto de transacción demasiado corto (mínimo 5 caracteres)",
+    "text_too_long": "Texto de transacción demasiado largo (máximo 1000 caracteres)",
+    "amount_negative": "El monto no puede ser negativo",
+    "amount_too_high": "El monto excede el límite máximo"
+}
+
+def validate_transaction_request(text: str, amount: float) -> Optional[str]:
+    """Valida una transacción; devuelve el motivo del rechazo o None"""
+    stripped = text.strip() if text else ""
+    
+    if not stripped:
+        return "text_required"
+    
+    if len(stripped) < 5:
+        return "text_too_short"
+    
+    if len(stripped) > 1000:
+        return "text_too_long"
+    
+    # Validar monto
+    if amount < 0:
+        return "amount_negative"
+    
+    if amount > 1000000:
+        return "amount_too_high"
+    
+    return None
+
+def _score_ndjson_chunk(lines: List[Tuple[int, Optional[bytes]]]) -> str:
+    """Puntúa un bloque de líneas NDJSON y devuelve las líneas de respuesta.
+    
+    Se emite una línea por cada registro de entrada y en el mismo orden: un
+    FraudResponse si el registro es válido o {"line", "error"} si no lo es.
+    """
+    start_time = time.perf_counter()
+    outputs: List[Optional[str]] = [None] * len(lines)
+    valid: List[Tuple[int, TransactionRequest]] = []
+    
+    for position, (line_number, raw) in enumerate(lines):
+        detail = ""
+        if raw is None:
+            reason = "line_too_long"
+        else:
+            try:
+                transaction = TransactionRequest.model_validate_json(raw)
+            except ValidationError as e:
+                reason = "invalid_request"
+                detail = " - " + "; ".join(err["msg"] for err in e.errors())
+            else:
+                reason = validate_transaction_request(transaction.text, transaction.amount)
+                if reason is None:
+                    valid.append((position, transaction))
+                    continue
+        VALIDATION_ERRORS.inc("/predict/stream", reason)
+        outputs[position] = json.dumps({"line": line_number, "error": VALIDATION_MESSAGES[reason] + detail}, ensure_ascii=False)
+    
+    if valid:
+        result = predict_fraud_batch(
+            [t.text for _, t in valid],
+            [t.amount for _, t in valid],
+            [t.merchant for _, t in valid],
+            [t.timestamp for _, t in valid]
+        )
+        # Tiempo de procesamiento amortizado por registro del bloque
+        per_item_time = (time.perf_counter() - start_time) * 1000 / len(lines)
+        for k, (position, _) in enumerate(valid):
+            outputs[position] = FraudResponse(
+                fraud=bool(result["fraud"][k]),
+                confidence=float(result["confidence"][k]),
+                risk_score=float(result["risk_score"][k]),
+                model_version=versioned_model(result["rules_version"]),
+                processing_time_ms=per_item_time
+            ).model_dump_json()
+    
+    return "".join(output + "\n" for output in outputs)
+
+def score_ndjson_stream(lines: Iterable[bytes], chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[str]:
+    """Puntúa registros NDJSON en bloques acotados; memoria constante respecto a la entrada"""
+    chunk: List[Tuple[int, Optional[bytes]]] = []
+    for line_number, raw in enumerate(lines, start=1):
+        if not raw.strip():
+            continue
+        chunk.append((line_number, raw if len(raw) <= STREAM_MAX_LINE_BYTES else None))
+        if len(chunk) >= chunk_size:
+            yield _score_ndjson_chunk(chunk)
+            chunk = []
+    if chunk:
+        yield _score_ndjson_chunk(chunk)
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """StreamingResponse que no compite por receive() con la lectura del cuerpo.
+    
+    StreamingResponse escucha desconexiones consumiendo receive(), lo que impide
+    leer request.stream() mientras se responde. Aquí la desconexión del cliente
+    se detecta al leer el cuerpo (ClientDisconnect).
+    """
+    media_type = "application/x-ndjson"
+    
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+async def _iter_request_lines(request: Request) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """Divide el cuerpo de la petición en líneas sin cargarlo completo en memoria.
+    
+    Las líneas que superan STREAM_MAX_LINE_BYTES se descartan y se entregan
+    como None para reportarlas como error.
+    """
+    buffer = b""
+    line_number = 0
+    overflow = False
+    async for data in request.stream():
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if overflow or len(line) > STREAM_MAX_LINE_BYTES:
+                overflow = False
+                yield line_number, None
+            elif line.strip():
+                yield line_number, line
+        if len(buffer) > STREAM_MAX_LINE_BYTES:
+            overflow = True
+            buffer = b""
+    if overflow:
+        yield line_number + 1, None
+    elif buffer.strip():
+        yield line_number + 1, buffer
+
+# Motivos de rechazo del control de admisión: clave (etiqueta de métrica) → mensaje
+ADMISSION_MESSAGES = {
+    "rate_limited": "Límite de peticiones del tenant excedido",
+    "queue_full": "Servicio saturado, reintente más tarde",
+    "deadline": "La petición no puede completarse antes de su deadline"
+}
+
+class RequestAdmission(NamedTuple):
+    lane: str
+    deadline: Optional[float]
+
+def admission_error(endpoint: str, lane: str, error: AdmissionRejected) -> HTTPException:
+    """429 por límite de tasa, 503 por cola llena o deadline inalcanzable"""
+    ADMISSION_SHED.inc(endpoint, lane, error.reason)
+    return HTTPException(status_code=429 if error.reason == "rate_limited" else 503,
+                         detail=ADMISSION_MESSAGES[error.reason],
+                         headers={"Retry-After": str(math.ceil(error.retry_after))})
+
+def admit_request(http_request: Request, endpoint: str, default_lane: str, cost: float = 1) -> RequestAdmission:
+    """Aplica el límite de tasa del tenant y lee el carril (X-Priority) y X-Request-Deadline"""
+    headers = http_request.headers
+    lane = parse_lane(headers.get("x-priority"), default_lane)
+    tenant = tenant_id(headers.get("x-tenant-id"), headers.get("x-api-key"),
+                       http_request.client.host if http_request.client else None)
+    try:
+        RATE_LIMITER.check(tenant, cost)
+    except AdmissionRejected as e:
+        raise admission_error(endpoint, lane, e)
+    return RequestAdmission(lane, parse_deadline(headers.get("x-request-deadline"), time.monotonic()))
+
+# Duraciones de etapa pendientes de enviar al proceso padre (solo en los procesos del pool)
+_STAGE_BUFFER: Optional[List[Tuple[float, str, str]]] = None
+
+def observe_stage(seconds: float, classifier: str, stage: str) -> None:
+    """Duración de una etapa del clasificador; en el pool se acumula y la registra el padre"""
+    if _STAGE_BUFFER is not None:
+        _STAGE_BUFFER.append((seconds, classifier, stage))
+    else:
+        STAGE_LATENCY.observe(seconds, classifier, stage)
+
+def call_with_stages(func, *args) -> Tuple[Any, List[Tuple[float, str, str]]]:
+    """Ejecuta el clasificador en un proceso del pool: (resultado, duraciones de etapa)"""
+    global _STAGE_BUFFER
+    _STAGE_BUFFER = []
+    try:
+        return func(*args), _STAGE_BUFFER
+    finally:
+        _STAGE_BUFFER = None
+
+async def run_classifier(endpoint: str, admission: RequestAdmission, func, *args):
+    """Ejecuta el clasificador en un slot de admisión, en el pool de procesos (modo pool) o en línea"""
+    try:
+        async with ADMISSION.slot(admission.lane, admission.deadline):
+            if CLASSIFIER_POOL is None:
+                return func(*args)
+            # Las métricas del proceso hijo no llegan a /metrics: las etapas vuelven con el resultado
+            result, stages = await CLASSIFIER_POOL.submit(call_with_stages, func, *args)
+            for seconds, classifier, stage in stages:
+                STAGE_LATENCY.observe(seconds, classifier, stage)
+            return result
+    except AdmissionRejected as e:
+        raise admission_error(endpoint, admission.lane, e)
+    except PoolSaturated:
+        POOL_REJECTED.inc(endpoint)
+        raise HTTPException(status_code=503, detail="Servicio saturado, reintente más tarde",
+                            headers={"Retry-After": RETRY_AFTER_SECONDS})
+
+def publish_fraud_rules(index: FraudPatternIndex) -> None:
+    """Publica un conjunto de reglas recién compilado (se llama desde el hilo del watcher).
+    
+    En modo pool el event loop forkea un pool nuevo que hereda las reglas
+    publicadas y drena el anterior con las tareas que ya tenía. El watcher solo
+    compila; nunca forkea desde su hilo.
+    """
+    global FRAUD_INDEX
+    FRAUD_INDEX = index
+    RULES_RELOADS.inc()
+    if CLASSIFIER_POOL is not None:
+        asyncio.run_coroutine_threadsafe(replace_pool(), EVENT_LOOP)
+
+async def replace_pool() -> None:
+    """Sustituye el pool por uno forkeado desde el event loop y drena el anterior"""
+    global CLASSIFIER_POOL
+    if CLASSIFIER_POOL is None:
+        return
+    pool = ClassifierPool(POOL_WORKERS, POOL_QUEUE_SIZE)
+    await pool.start()
+    previous, CLASSIFIER_POOL = CLASSIFIER_POOL, pool
+    await previous.drain(DRAIN_TIMEOUT_SECONDS)
+
+# Transacción de calentamiento: indicadores de varias categorías y comercio sospechoso
+WARMUP_TRANSACTION = {"text": "Transferencia urgente a cuenta extranjera, verificar cuenta para recibir el premio",
+                      "amount": 15000.0, "merchant": "desconocido", "timestamp": "2024-01-01T03:00:00"}
+
+def warm_up() -> None:
+    """Recorre una vez cada camino de predicción antes de recibir tráfico.
+    
+    Hace la primera validación y serialización de los modelos de petición y
+    respuesta (individual, lote y NDJSON), que de otro modo pagarían las
+    primeras peticiones del pod. No toca el almacén de velocidad.
+    """
+    body = dumps(WARMUP_TRANSACTION)
+    request = TransactionRequest.model_validate_json(body)
+    FastJSONResponse(predict_fraud_enhanced(request.text, request.amount, request.merchant, request.timestamp,
+                                            explain=True))
+    amounts = [50.0, 1500.0, 15000.0, 60000.0]  # Un importe por tramo
+    batch = FraudBatchRequest(texts=[request.text] * len(amounts), amounts=amounts,
+                              merchants=[request.merchant] * len(amounts), timestamps=[request.timestamp] * len(amounts))
+    result = predict_fraud_batch(batch.texts, batch.amounts, batch.merchants, batch.timestamps)
+    FraudBatchResponse(
+        fraud=[bool(value) for value in result["fraud"]],
+        confidence=[float(value) for value in result["confidence"]],
+        risk_score=[float(value) for value in result["risk_score"]],
+        errors=[None] * len(amounts),
+        model_version=versioned_model(result["rules_version"]),
+        processing_time_ms=0.0
+    ).model_dump()
+    _score_ndjson_chunk([(1, body)])
+
+async def warm_start() -> None:
+    """Calienta el servicio fuera del event loop y arranca el pool; después /ready responde 200.
+    
+    Mientras tanto /health (liveness) ya responde. En modo pool los procesos
+    se forkean tras el calentamiento.
+    """
+    global model_loaded, CLASSIFIER_POOL
+    loop = asyncio.get_running_loop()
+    try:
+        phase_start = time.perf_counter()
+        await loop.run_in_executor(None, warm_up)
+        STARTUP_PHASES["warmup"] = time.perf_counter() - phase_start
+        if SERVING_MODE == "pool":
+            phase_start = time.perf_counter()
+            pool = ClassifierPool(POOL_WORKERS, POOL_QUEUE_SIZE)
+            await pool.start()
+            CLASSIFIER_POOL = pool
+            STARTUP_PHASES["pool"] = time.perf_counter() - phase_start
+    except Exception as e:
+        # Sin calentamiento completo el pod no se declara listo
+        logger.error(f"Error en el calentamiento del servicio: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return
+    model_loaded = True
+    logger.info("Servicio listo para recibir peticiones - "
+                + ", ".join(f"{phase}: {seconds * 1000:.0f}ms" for phase, seconds in STARTUP_PHASES.items()))
+
 @app.on_event("startup")
 async def startup_event():
-    """Evento de inicio de la aplicación"""
+    """Evento de inicio de la aplicación: el calentamiento sigue en segundo plano (ver /ready)"""
     logger.info("Iniciando servicio de detección de fraude...")
-    global model_loaded
-    model_loaded = True
-    logger.info("Servicio listo para recibir peticiones")
+    global RULES_WATCHER, EVENT_LOOP, WARMUP_TASK
+    EVENT_LOOP = asyncio.get_running_loop()
+    if FRAUD_RULES_PATH and RULES_RELOAD_INTERVAL_SECONDS > 0:
+        RULES_WATCHER = RuleSetWatcher(FRAUD_RULES_PATH, load_fraud_rules, publish_fraud_rules,
+                                       FRAUD_INDEX.version, RULES_RELOAD_INTERVAL_SECONDS)
+        RULES_WATCHER.start()
+    logger.info(f"Reglas de fraude - Versión: {FRAUD_INDEX.version}, Patrones: {FRAUD_INDEX.pattern_count}, "
+                f"Origen: {FRAUD_RULES_PATH or 'integradas'}")
+    WARMUP_TASK = asyncio.create_task(warm_start())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Evento de parada: detener la recarga de reglas, drenar el pool y vaciar la cola de logs"""
+    logger.info("Deteniendo servicio de detección de fraude...")
+    global model_loaded, CLASSIFIER_POOL
+    model_loaded = False
+    if WARMUP_TASK is not None:
+        # Un pool a medio arrancar también se drena
+        await WARMUP_TASK
+    if RULES_WATCHER is not None:
+        RULES_WATCHER.stop()
+    if CLASSIFIER_POOL is not None:
+        await CLASSIFIER_POOL.drain(DRAIN_TIMEOUT_SECONDS)
+        CLASSIFIER_POOL = None
+    shutdown_logging()
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
@@ -195,58 +759,225 @@ async def health_check():
     return HealthResponse(
         status="healthy",
         model_loaded=model_loaded,
-        model_version=model_version
+        model_version=versioned_model(FRAUD_INDEX.version)
     )
 
-@app.post("/predict", response_model=FraudResponse)
-async def predict_fraud_endpoint(request: TransactionRequest):
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 200 solo cuando el calentamiento ha terminado; 503 mientras tanto y al parar"""
+    return FastJSONResponse({
+        "ready": model_loaded,
+        "rules_version": FRAUD_INDEX.version,
+        "startup_seconds": STARTUP_PHASES
+    }, status_code=200 if model_loaded else 503)
+
+@app.post("/predict", response_model=FraudExplainedResponse, openapi_extra=request_body_schema(TransactionRequest))
+async def predict_fraud_endpoint(http_request: Request,
+                                 explain: bool = Query(False, description="Incluir la explicación para auditoría")):
     """Endpoint principal para predicción de fraude"""
-    start_time = time.time()
+    start_time = time.perf_counter()
+    admission = admit_request(http_request, "/predict", INTERACTIVE)
+    request = await parse_body(http_request, TransactionRequest)
     
     try:
         # Validar entrada con más detalle
-        if not request.text or not request.text.strip():
-            raise HTTPException(status_code=400, detail="Texto de transacción requerido")
+        reason = validate_transaction_request(request.text, request.amount)
+        if reason is not None:
+            VALIDATION_ERRORS.inc("/predict", reason)
+            raise HTTPException(status_code=400, detail=VALIDATION_MESSAGES[reason])
+        
+        # Realizar predicción (o reutilizar la de una transacción idéntica)
+        when = transaction_time(request.timestamp)
+        rules_version = FRAUD_INDEX.version
+        cache_key = make_cache_key(request.text, request.amount, request.merchant, is_unusual_hour(when), rules_version)
+        # La caché no guarda explicaciones: con explain se puntúa siempre
+        result = RESPONSE_CACHE.get(cache_key) if not explain else None
+        cache_hit = result is not None
+        if not cache_hit:
+            result = await run_classifier("/predict", admission, predict_fraud_enhanced,
+                                          request.text, request.amount, request.merchant, when, explain)
+            # Durante una recarga el resultado puede venir de la versión anterior
+            if result["rules_version"] == rules_version:
+                RESPONSE_CACHE.set(cache_key, {field: result[field] for field in ("fraud", "confidence", "risk_score", "rules_version")})
         
-        if len(request.text.strip()) < 5:
-            raise HTTPException(status_code=400, detail="Texto de transacción demasiado corto (mínimo 5 caracteres)")
+        # Velocidad de la cuenta en el momento de la transacción. Con transaction_id
+        # cada una se registra una vez (los reintentos, con o sin acierto de caché,
+        # devuelven las señales de la primera); sin él, transacciones idénticas son
+        # justo la repetición que deben detectar las señales
+        velocity_signals: List[str] = []
+        if VELOCITY_STORE is not None and request.account_id:
+            signals = VELOCITY_STORE.observe(request.account_id, request.merchant.lower(), request.amount,
+                                             result["risk_score"] > 25, when.timestamp(),
+                                             request.transaction_id or None)
+            if signals.risk:
+                result = apply_velocity(result, signals)
+                velocity_signals = signals.signals
+                for signal in signals.signals:
+                    VELOCITY_SIGNALS.inc(signal)
+        
+        # Calcular tiempo de procesamiento
+        processing_time = (time.perf_counter() - start_time) * 1000
         
-        if len(request.text.strip()) > 1000:
-            raise HTTPException(status_code=400, detail="Texto de transacción demasiado largo (máximo 1000 caracteres)")
+        # Un único registro por petición, sin el texto ni el comercio de la transacción
+        if predict_logger.isEnabledFor(logging.INFO):
+            predict_logger.info("Predicción completada", extra={"fields": {
+                "processing_time_ms": round(processing_time, 3),
+                "fraud": result["fraud"],
+                "confidence": round(result["confidence"], 3),
+                "risk_score": result["risk_score"],
+                "text_length": len(request.text),
+                "cache_hit": cache_hit,
+                "velocity_signals": velocity_signals
+            }})
         
-        # Validar monto
-        if request.amount < 0:
-            raise HTTPException(status_code=400, detail="El monto no puede ser negativo")
+        # Respuesta ya serializada, sin revalidar FraudResponse
+        response = {
+            "fraud": bool(result["fraud"]),
+            "confidence": float(result["confidence"]),
+            "risk_score": float(result["risk_score"]),
+            "model_version": versioned_model(result["rules_version"]),
+            "processing_time_ms": processing_time
+        }
+        if explain:
+            response["explanation"] = result["explanation"]
+        return FastJSONResponse(response)
         
-        if request.amount > 1000000:
-            raise HTTPException(status_code=400, detail="El monto excede el límite máximo")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error inesperado en predicción: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
+@app.post("/predict/batch", response_model=FraudBatchResponse)
+async def predict_fraud_batch_endpoint(request: FraudBatchRequest, http_request: Request):
+    """Predicción de fraude por lotes en formato columnar; errores por transacción"""
+    start_time = time.perf_counter()
+    n = len(request.texts)
+    
+    if n == 0:
+        raise HTTPException(status_code=400, detail="El lote no contiene transacciones")
+    
+    if n > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Lote demasiado grande (máximo {BATCH_MAX_ITEMS} transacciones)")
+    
+    amounts = request.amounts or [0.0] * n
+    merchants = request.merchants or [""] * n
+    timestamps = request.timestamps or [None] * n
+    if len(amounts) != n or len(merchants) != n or len(timestamps) != n:
+        raise HTTPException(status_code=400, detail="texts, amounts, merchants y timestamps deben tener la misma longitud")
+    
+    # Cada transacción del lote consume un token del tenant
+    admission = admit_request(http_request, "/predict/batch", BATCH, cost=n)
+    
+    try:
+        reasons = [validate_transaction_request(text, amount) for text, amount in zip(request.texts, amounts)]
+        valid = [row for row, reason in enumerate(reasons) if reason is None]
+        errors: List[Optional[str]] = []
+        for reason in reasons:
+            if reason is not None:
+                VALIDATION_ERRORS.inc("/predict/batch", reason)
+            errors.append(VALIDATION_MESSAGES[reason] if reason is not None else None)
         
-        # Log de la petición
-        logger.info(f"Predicción solicitada - Texto: {request.text[:50]}..., Monto: {request.amount}, Comercio: {request.merchant}")
+        result = await run_classifier(
+            "/predict/batch",
+            admission,
+            predict_fraud_batch,
+            [request.texts[row] for row in valid],
+            [amounts[row] for row in valid],
+            [merchants[row] for row in valid],
+            [timestamps[row] for row in valid]
+        )
         
-        # Realizar predicción
-        result = predict_fraud_enhanced(request.text, request.amount, request.merchant)
+        fraud: List[Optional[bool]] = [None] * n
+        confidence: List[Optional[float]] = [None] * n
+        risk_score: List[Optional[float]] = [None] * n
+        for position, row in enumerate(valid):
+            fraud[row] = bool(result["fraud"][position])
+            confidence[row] = float(result["confidence"][position])
+            risk_score[row] = float(result["risk_score"][position])
         
-        # Calcular tiempo de procesamiento
-        processing_time = (time.time() - start_time) * 1000
+        processing_time = (time.perf_counter() - start_time) * 1000
         
-        logger.info(f"Predicción completada en {processing_time:.2f}ms - Fraude: {result['fraud']}, Confianza: {result['confidence']:.3f}")
+        logger.info(f"Lote evaluado en {processing_time:.2f}ms - Transacciones: {n}, Válidas: {len(valid)}, Fraude: {int(result['fraud'].sum())}")
         
-        return FraudResponse(
-            fraud=result["fraud"],
-            confidence=result["confidence"],
-            risk_score=result["risk_score"],
-            model_version=model_version,
+        return FraudBatchResponse(
+            fraud=fraud,
+            confidence=confidence,
+            risk_score=risk_score,
+            errors=errors,
+            model_version=versioned_model(result["rules_version"]),
             processing_time_ms=processing_time
         )
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error inesperado en predicción: {str(e)}")
+        logger.error(f"Error inesperado en predicción por lotes: {str(e)}")
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
+@app.post("/predict/stream")
+async def predict_fraud_stream_endpoint(request: Request):
+    """Predicción de fraude en streaming: NDJSON de TransactionRequest → NDJSON de FraudResponse"""
+    admission = admit_request(request, "/predict/stream", BATCH)
+    
+    async def score_chunk(chunk: List[Tuple[int, Optional[bytes]]]) -> str:
+        # Cada trozo compite por un slot en su carril; si la cola está llena el
+        # stream espera (contrapresión sobre el cliente) en lugar de fallar
+        while True:
+            try:
+                async with ADMISSION.slot(admission.lane):
+                    return await run_in_threadpool(_score_ndjson_chunk, chunk)
+            except AdmissionRejected as e:
+                await asyncio.sleep(e.retry_after)
+    
+    async def generate() -> AsyncIterator[str]:
+        chunk: List[Tuple[int, Optional[bytes]]] = []
+        scored = 0
+        async for line in _iter_request_lines(request):
+            chunk.append(line)
+            if len(chunk) >= STREAM_CHUNK_SIZE:
+                yield await score_chunk(chunk)
+                scored += len(chunk)
+                chunk = []
+        if chunk:
+            yield await score_chunk(chunk)
+            scored += len(chunk)
+        logger.info(f"Streaming completado - Registros: {scored}")
+    
+    return NDJSONStreamingResponse(generate())
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Métricas en formato de exposición de Prometheus"""
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/velocity/stats")
+async def velocity_stats():
+    """Tamaño y configuración del almacén de velocidad por cuenta"""
+    return {"enabled": VELOCITY_STORE is not None, **(VELOCITY_STORE.stats() if VELOCITY_STORE is not None else {})}
+
+@app.get("/admission/stats")
+async def admission_stats():
+    """Estado del control de admisión: slots, colas por carril y límite por tenant"""
+    return {"admission": ADMISSION.stats(), "rate_limit": RATE_LIMITER.stats()}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Estadísticas de la caché de respuestas"""
+    return RESPONSE_CACHE.stats()
+
+@app.get("/rules")
+async def rules_status():
+    """Versión activa del conjunto de reglas y estado de la recarga en caliente"""
+    return {
+        "version": FRAUD_INDEX.version,
+        "patterns": FRAUD_INDEX.pattern_count,
+        "source": FRAUD_RULES_PATH or "integradas",
+        "watcher": RULES_WATCHER.stats() if RULES_WATCHER is not None else None
+    }
+
 @app.get("/")
 async def root():
     """Endpoint raíz"""
@@ -255,15 +986,48 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "health": "/health",
-            "predict": "/predict"
+            "ready": "/ready",
+            "predict": "/predict",
+            "predict_batch": "/predict/batch",
+            "predict_stream": "/predict/stream",
+            "cache_stats": "/cache/stats",
+            "admission_stats": "/admission/stats",
+            "velocity_stats": "/velocity/stats",
+            "rules": "/rules",
+            "metrics": "/metrics"
         }
     }
 
+# Fin de la importación (sin contar la del servidor ASGI al lanzar con python app.py)
+STARTUP_PHASES["import"] = time.perf_counter() - IMPORT_STARTED
+
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Fraud Detection Service")
+    parser.add_argument("--ndjson", action="store_true",
+                        help="Puntuar TransactionRequest NDJSON desde stdin y escribir FraudResponse NDJSON en stdout")
+    parser.add_argument("--chunk-size", type=int, default=STREAM_CHUNK_SIZE,
+                        help="Registros por bloque de puntuación en modo --ndjson")
+    args = parser.parse_args()
+    
+    if args.ndjson:
+        for output in score_ndjson_stream(sys.stdin.buffer, args.chunk_size):
+            sys.stdout.write(output)
+            sys.stdout.flush()
+        sys.exit(0)
+    
+    import uvicorn
+    
+    # uvicorn importa "app:app": con este módulo registrado como "app" no se
+    # vuelve a ejecutar (ni a compilar el índice de reglas) en el mismo proceso
+    sys.modules.setdefault("app", sys.modules[__name__])
     uvicorn.run(
         "app:app",
         host="0.0.0.0",
-        port=8000,
+        port=int(os.getenv("PORT", "8000")),
         reload=False,
-        log_level="info"
+        log_level="info",
+        workers=SERVER_WORKERS,
+        timeout_graceful_shutdown=DRAIN_TIMEOUT_SECONDS
     ) 
\ No newline at end of file
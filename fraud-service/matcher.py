@@ -0,0 +1,154 @@
+"""
+Índice multi-patrón para los patrones de fraude.
+
+Compila todas las frases de FRAUD_PATTERNS en un único autómata Aho-Corasick,
+de forma que el texto y el comercio de una transacción se recorren una sola
+vez cada uno, independientemente del número de frases configuradas.
+"""
+
+import hashlib
+import json
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+
+class AhoCorasick:
+    """Autómata Aho-Corasick sobre caracteres.
+
+    Cada patrón se identifica por su posición en la secuencia de entrada.
+    La búsqueda es lineal en la longitud del texto e independiente del
+    número de patrones compilados.
+    """
+
+    __slots__ = ("_goto", "_fail", "_out", "pattern_count")
+
+    def __init__(self, patterns: Sequence[str]):
+        goto: List[Dict[str, int]] = [{}]
+        out: List[List[int]] = [[]]
+
+        # Construir el trie de patrones
+        for pattern_id, pattern in enumerate(patterns):
+            state = 0
+            for ch in pattern:
+                next_state = goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][ch] = next_state
+                    goto.append({})
+                    out.append([])
+                state = next_state
+            out[state].append(pattern_id)
+
+        # Enlaces de fallo en anchura, fusionando las salidas de cada sufijo
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and ch not in goto[fallback]:
+                    fallback = fail[fallback]
+                candidate = goto[fallback].get(ch, 0)
+                fail[next_state] = candidate if candidate != next_state else 0
+                out[next_state].extend(out[fail[next_state]])
+
+        self._goto = goto
+        self._fail = fail
+        self._out = [tuple(o) for o in out]
+        self.pattern_count = len(patterns)
+
+    def find(self, text: str) -> Set[int]:
+        """Devuelve el conjunto de ids de patrones presentes en el texto"""
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+
+        found = set(out[0])
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+class FraudPatternIndex:
+    """Índice compilado de FRAUD_PATTERNS y comercios sospechosos.
+
+    Cada frase distinta se asocia a las entradas (categoría, posición) en las
+    que aparece, conservando el orden de declaración para los resultados.
+    """
+
+    def __init__(self, fraud_patterns: Dict[str, List[str]], pattern_weights: Dict[str, float],
+                 suspicious_merchants: Sequence[str]):
+        # Huella del conjunto de reglas: cambia con cualquier patrón, peso o comercio
+        self.version = hashlib.sha256(json.dumps(
+            [fraud_patterns, pattern_weights, list(suspicious_merchants)], sort_keys=True, ensure_ascii=False
+        ).encode("utf-8")).hexdigest()[:12]
+        self.categories: List[str] = list(fraud_patterns.keys())
+        self.keywords: List[List[str]] = [list(k) for k in fraud_patterns.values()]
+        self.weights: List[float] = [pattern_weights[c] for c in self.categories]
+        self.suspicious_merchants: List[str] = list(suspicious_merchants)
+
+        pattern_ids: Dict[str, int] = {}
+        pattern_entries: List[List[Tuple[int, int]]] = []
+        for category_idx, keywords in enumerate(self.keywords):
+            for slot, keyword in enumerate(keywords):
+                pattern_id = pattern_ids.setdefault(keyword, len(pattern_ids))
+                if pattern_id == len(pattern_entries):
+                    pattern_entries.append([])
+                pattern_entries[pattern_id].append((category_idx, slot))
+
+        self._pattern_entries = [tuple(e) for e in pattern_entries]
+        # Riesgo que aporta cada frase (suma de los pesos de sus categorías)
+        self._pattern_risk = [sum(self.weights[category_idx] for category_idx, _ in e) for e in pattern_entries]
+        self._automaton = AhoCorasick(list(pattern_ids))
+        self._merchant_automaton = AhoCorasick(self.suspicious_merchants)
+        self.pattern_count = len(pattern_ids)
+
+    def _category_slots(self, text: str, merchant: str) -> Dict[int, List[int]]:
+        """Posiciones de las frases encontradas en texto y comercio, por categoría"""
+        found = self._automaton.find(text)
+        if merchant:
+            found |= self._automaton.find(merchant)
+
+        slots: Dict[int, List[int]] = {}
+        for pattern_id in found:
+            for category_idx, slot in self._pattern_entries[pattern_id]:
+                slots.setdefault(category_idx, []).append(slot)
+        return slots
+
+    def scan(self, text: str, merchant: str) -> Tuple[Dict[str, List[str]], float]:
+        """Una pasada por texto y comercio: (coincidencias por categoría, riesgo)"""
+        slots = self._category_slots(text, merchant)
+
+        risk_score = 0
+        pattern_matches: Dict[str, List[str]] = {}
+        for category_idx in sorted(slots):
+            category_slots = sorted(slots[category_idx])
+            keywords = self.keywords[category_idx]
+            pattern_matches[self.categories[category_idx]] = [keywords[slot] for slot in category_slots]
+            risk_score += self.weights[category_idx] * len(category_slots)
+        return pattern_matches, risk_score
+
+    def risk(self, text: str, merchant: str) -> int:
+        """Riesgo de las frases encontradas en texto y comercio, sin construir explicaciones"""
+        found = self._automaton.find(text)
+        if merchant:
+            found |= self._automaton.find(merchant)
+        pattern_risk = self._pattern_risk
+        return sum(pattern_risk[pattern_id] for pattern_id in found)
+
+    def category_counts(self, text: str, merchant: str) -> Dict[int, int]:
+        """Número de frases encontradas por categoría, sin construir explicaciones"""
+        return {category_idx: len(slots) for category_idx, slots in self._category_slots(text, merchant).items()}
+
+    def suspicious_merchant(self, merchant: str) -> Optional[str]:
+        """Primer comercio sospechoso (en orden de declaración) contenido en el comercio"""
+        found = self._merchant_automaton.find(merchant)
+        if not found:
+            return None
+        return self.suspicious_merchants[min(found)]
@@ -0,0 +1,96 @@
+"""
+Señales de velocidad: las transacciones idénticas sin transaction_id cuentan
+todas (es la repetición que deben detectar) y solo los reintentos con el
+mismo transaction_id se registran una vez.
+
+Uso:
+    python -m pytest fraud-service/tests
+"""
+
+import os
+import sys
+
+import pytest
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROOT_DIR = os.path.dirname(SERVICE_DIR)  # service_common
+# Módulos del servicio: otros servicios tienen módulos con el mismo nombre (matcher, cache...)
+SERVICE_MODULES = [name[:-3] for name in os.listdir(SERVICE_DIR) if name.endswith(".py")]
+
+TRANSFER = {"text": "transferencia a proveedor", "amount": 120.0, "merchant": "Tienda Uno",
+            "account_id": "cuenta-1", "timestamp": "2026-03-02T10:00:00"}
+
+
+@pytest.fixture(scope="module")
+def service():
+    """Módulos del servicio de fraude con la velocidad activada, aislados en sys.modules"""
+    saved = {name: sys.modules.pop(name) for name in SERVICE_MODULES if name in sys.modules}
+    previous = os.environ.get("VELOCITY_ENABLED")
+    os.environ["VELOCITY_ENABLED"] = "true"
+    sys.path[:0] = [SERVICE_DIR, ROOT_DIR]
+    try:
+        import app
+        import velocity
+        yield app, velocity
+    finally:
+        sys.path.remove(SERVICE_DIR)
+        sys.path.remove(ROOT_DIR)
+        if previous is None:
+            os.environ.pop("VELOCITY_ENABLED", None)
+        else:
+            os.environ["VELOCITY_ENABLED"] = previous
+        for name in SERVICE_MODULES:
+            sys.modules.pop(name, None)
+        sys.modules.update(saved)
+
+
+@pytest.fixture
+def client(service):
+    from fastapi.testclient import TestClient
+
+    app, velocity = service
+    app.VELOCITY_STORE = velocity.VelocityStore()
+    with TestClient(app.app) as test_client:
+        yield test_client
+
+
+def velocity_signals(client, body):
+    response = client.post("/predict?explain=true", json=body)
+    assert response.status_code == 200
+    return [indicator for indicator in response.json()["explanation"]["fraud_indicators"]
+            if "comercio" in indicator or "cuenta" in indicator]
+
+
+def test_identical_unkeyed_transfers_raise_merchant_repeat(service, client):
+    _, velocity = service
+    body = {key: value for key, value in TRANSFER.items() if key != "timestamp"}
+    for _ in range(velocity.MERCHANT_REPEAT - 1):
+        assert velocity_signals(client, body) == []
+    assert any("mismo comercio" in indicator for indicator in velocity_signals(client, body))
+    assert client.get("/velocity/stats").json()["repeats"] == 0
+
+
+def test_identical_unkeyed_transfers_raise_account_burst(service, client):
+    _, velocity = service
+    for _ in range(velocity.ACCOUNT_BURST - 1):
+        velocity_signals(client, TRANSFER)
+    assert any("Ráfaga de transacciones de la cuenta" in indicator for indicator in velocity_signals(client, TRANSFER))
+
+
+def test_retries_with_transaction_id_count_once(service, client):
+    _, velocity = service
+    body = {**TRANSFER, "transaction_id": "tx-1"}
+    for _ in range(velocity.ACCOUNT_BURST + 1):
+        assert velocity_signals(client, body) == []
+    assert client.get("/velocity/stats").json()["repeats"] == velocity.ACCOUNT_BURST
+
+
+def test_store_dedupes_only_with_key(service):
+    _, velocity = service
+    store = velocity.VelocityStore()
+    for _ in range(velocity.MERCHANT_REPEAT):
+        signals = store.observe("cuenta", "tienda", 50.0, False, now=1000.0)
+    assert "merchant_repeat" in signals.signals
+    for _ in range(velocity.MERCHANT_REPEAT):
+        signals = store.observe("otra", "tienda", 50.0, False, now=1000.0, transaction_key="tx")
+    assert signals.signals == [] and store.repeats == velocity.MERCHANT_REPEAT - 1
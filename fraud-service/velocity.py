@@ -0,0 +1,249 @@
+"""
+Almacén en memoria de características de velocidad para fraude.
+
+Por cada cuenta y cada par cuenta-comercio se guardan contadores en cubos de
+tiempo: un anillo de `buckets` posiciones que cubre la ventana deslizante,
+donde cada posición recuerda qué cubo absoluto contiene y se reinicia al
+reutilizarse. Por cuenta se guarda además un anillo con los últimos importes
+y su suma y suma de cuadrados incrementales, para medir cuánto se desvía el
+importe actual del habitual, y las transacciones ya registradas en la ventana
+para que un reintento no vuelva a contar.
+
+Registrar una transacción es O(1) (número fijo de cubos) y la memoria está
+acotada: las claves sin actividad durante la ventana se expulsan en orden
+LRU y nunca hay más de max_keys por tabla. El estado es local al proceso
+(cada worker de uvicorn tiene el suyo): las señales solo son correctas con
+una única instancia, porque con varias réplicas detrás de un Service cada
+una cuenta solo las transacciones que le llegan.
+"""
+
+import math
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Transacciones de la cuenta en la ventana a partir de las que se considera ráfaga
+ACCOUNT_BURST = 5
+# Transacciones de la cuenta al mismo comercio en la ventana
+MERCHANT_REPEAT = 3
+# Transacciones sospechosas (score base > 25) de la cuenta en la ventana
+FLAGGED_BURST = 2
+# Desviación del importe: historial mínimo, z-score y múltiplo de la media
+AMOUNT_MIN_HISTORY = 5
+AMOUNT_ZSCORE = 3.0
+AMOUNT_MEAN_RATIO = 2.0
+# Aportación máxima de las señales de velocidad al risk_score
+MAX_VELOCITY_RISK = 40
+# Transacciones recordadas por cuenta para reconocer reintentos
+MAX_REMEMBERED = 64
+
+
+class WindowCounter:
+    """Conteo de transacciones (y de sospechosas) en una ventana de cubos de tiempo"""
+
+    __slots__ = ("bucket_ids", "counts", "flagged", "last_seen")
+
+    def __init__(self, buckets: int):
+        self.bucket_ids = array("q", [-1]) * buckets
+        self.counts = array("I", [0]) * buckets
+        self.flagged = array("I", [0]) * buckets
+        self.last_seen = 0.0
+
+    def add(self, bucket: int, flagged: bool) -> None:
+        position = bucket % len(self.bucket_ids)
+        if self.bucket_ids[position] > bucket:
+            # Llega tarde: su cubo ya salió de la ventana de la posición
+            return
+        if self.bucket_ids[position] != bucket:
+            self.bucket_ids[position] = bucket
+            self.counts[position] = 0
+            self.flagged[position] = 0
+        self.counts[position] += 1
+        self.flagged[position] += flagged
+
+    def totals(self, bucket: int) -> Tuple[int, int]:
+        """(transacciones, sospechosas) de los cubos que siguen dentro de la ventana"""
+        oldest = bucket - len(self.bucket_ids)
+        count = flagged = 0
+        for position, bucket_id in enumerate(self.bucket_ids):
+            if oldest < bucket_id <= bucket:
+                count += self.counts[position]
+                flagged += self.flagged[position]
+        return count, flagged
+
+
+class AccountState(WindowCounter):
+    """Contadores de la cuenta y anillo con sus últimos importes"""
+
+    __slots__ = ("amounts", "position", "size", "total", "total_sq", "seen")
+
+    def __init__(self, buckets: int, history: int):
+        super().__init__(buckets)
+        self.amounts = array("d", [0.0]) * history
+        self.position = 0
+        self.size = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        # Clave de transacción -> (cubo, señales) de las registradas en la ventana
+        self.seen: "Optional[OrderedDict[str, Tuple[int, VelocitySignals]]]" = None
+
+    def remember(self, key: str, bucket: int, signals: "VelocitySignals") -> None:
+        seen = self.seen
+        if seen is None:
+            seen = self.seen = OrderedDict()
+        seen[key] = (bucket, signals)
+        seen.move_to_end(key)
+        oldest = bucket - len(self.bucket_ids)
+        while len(seen) > MAX_REMEMBERED or seen[next(iter(seen))][0] <= oldest:
+            seen.popitem(last=False)
+
+    def push_amount(self, amount: float) -> None:
+        if self.size == len(self.amounts):
+            evicted = self.amounts[self.position]
+            self.total -= evicted
+            self.total_sq -= evicted * evicted
+        else:
+            self.size += 1
+        self.amounts[self.position] = amount
+        self.total += amount
+        self.total_sq += amount * amount
+        self.position = (self.position + 1) % len(self.amounts)
+
+    def amount_stats(self) -> Tuple[float, float]:
+        """Media y desviación típica de los importes del anillo"""
+        mean = self.total / self.size
+        return mean, math.sqrt(max(0.0, self.total_sq / self.size - mean * mean))
+
+
+# Indicador de la explicación de cada señal; se formatea solo con explain
+INDICATORS = {
+    "account_burst": "Ráfaga de transacciones de la cuenta ({value} en {window})",
+    "merchant_repeat": "Transacciones repetidas al mismo comercio ({value} en {window})",
+    "flagged_burst": "Ráfaga de transacciones sospechosas ({value} en {window})",
+    "amount_deviation": "Importe atípico para la cuenta (z={value:.1f})",
+}
+
+
+class VelocitySignals(NamedTuple):
+    risk: int
+    signals: List[str]
+    # Magnitud de cada señal: transacciones en la ventana o z-score del importe
+    values: List[float]
+
+
+NO_SIGNALS = VelocitySignals(0, [], [])
+
+
+class VelocityStore:
+    """Características de velocidad por cuenta y por cuenta-comercio con expulsión de claves inactivas"""
+
+    def __init__(self, window_seconds: float = 300.0, buckets: int = 10, history: int = 16,
+                 max_keys: int = 100000):
+        self.window_seconds = window_seconds
+        self.buckets = buckets
+        self.bucket_seconds = window_seconds / buckets
+        self.history = history
+        self.max_keys = max_keys
+        self._accounts: "OrderedDict[str, AccountState]" = OrderedDict()
+        self._pairs: "OrderedDict[Tuple[str, str], WindowCounter]" = OrderedDict()
+        self._window_label = f"{window_seconds / 60:g} min"
+        self.evictions = 0
+        self.repeats = 0
+
+    def _evict(self, table: OrderedDict, now: float) -> None:
+        """Expulsa desde el extremo LRU las claves inactivas o por encima de max_keys"""
+        idle_before = now - self.window_seconds
+        while table:
+            state = table[next(iter(table))]
+            if state.last_seen >= idle_before and len(table) <= self.max_keys:
+                break
+            table.popitem(last=False)
+            self.evictions += 1
+
+    def observe(self, account: str, merchant: str, amount: float, flagged: bool,
+                now: Optional[float] = None, transaction_key: Optional[str] = None) -> VelocitySignals:
+        """Registra la transacción y devuelve las señales de velocidad (contando la actual).
+
+        now es el momento de la transacción (por defecto el reloj del servidor);
+        la ventana se mide hacia atrás desde él.
+
+        Si transaction_key ya se registró para la cuenta dentro de la ventana
+        (un reintento) no se vuelve a contar y se devuelven las mismas señales.
+        """
+        now = time.time() if now is None else now
+        bucket = int(now // self.bucket_seconds)
+
+        state = self._accounts.get(account)
+        if state is None:
+            state = self._accounts[account] = AccountState(self.buckets, self.history)
+        else:
+            self._accounts.move_to_end(account)
+            seen = state.seen.get(transaction_key) if transaction_key is not None and state.seen else None
+            if seen is not None and seen[0] > bucket - self.buckets:
+                self.repeats += 1
+                return seen[1]
+        pair_key = (account, merchant)
+        pair = self._pairs.get(pair_key)
+        if pair is None:
+            pair = self._pairs[pair_key] = WindowCounter(self.buckets)
+        else:
+            self._pairs.move_to_end(pair_key)
+
+        # La desviación se mide contra el historial previo a esta transacción
+        deviation = None
+        if state.size >= AMOUNT_MIN_HISTORY:
+            mean, std = state.amount_stats()
+            if amount > AMOUNT_MEAN_RATIO * mean and amount - mean > AMOUNT_ZSCORE * std:
+                deviation = (amount - mean) / std if std > 0 else math.inf
+
+        state.add(bucket, flagged)
+        state.push_amount(amount)
+        state.last_seen = max(state.last_seen, now)
+        pair.add(bucket, flagged)
+        pair.last_seen = max(pair.last_seen, now)
+        self._evict(self._accounts, now)
+        self._evict(self._pairs, now)
+
+        count, flagged_count = state.totals(bucket)
+        pair_count, _ = pair.totals(bucket)
+        risk, signals, values = 0, [], []
+        if count >= 2 * ACCOUNT_BURST:
+            risk += 25
+        elif count >= ACCOUNT_BURST:
+            risk += 15
+        if count >= ACCOUNT_BURST:
+            signals.append("account_burst")
+            values.append(count)
+        if pair_count >= MERCHANT_REPEAT:
+            risk += 15
+            signals.append("merchant_repeat")
+            values.append(pair_count)
+        if flagged and flagged_count >= FLAGGED_BURST:
+            risk += 20
+            signals.append("flagged_burst")
+            values.append(flagged_count)
+        if deviation is not None:
+            risk += 15
+            signals.append("amount_deviation")
+            values.append(min(deviation, 99.0))
+        result = VelocitySignals(min(risk, MAX_VELOCITY_RISK), signals, values) if signals else NO_SIGNALS
+        if transaction_key is not None:
+            state.remember(transaction_key, bucket, result)
+        return result
+
+    def indicators(self, signals: VelocitySignals) -> List[str]:
+        """Indicadores legibles de las señales para la explicación"""
+        return [INDICATORS[signal].format(value=value, window=self._window_label)
+                for signal, value in zip(signals.signals, signals.values)]
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "accounts": len(self._accounts),
+            "account_merchant_pairs": len(self._pairs),
+            "evictions": self.evictions,
+            "repeats": self.repeats,
+            "window_seconds": self.window_seconds,
+            "buckets": self.buckets,
+            "max_keys": self.max_keys
+        }
@@ -1,51 +1,238 @@
 #!/usr/bin/env python3
 """
-Simple HTTP server to serve the frontend application
-This avoids CORS issues when opening index.html directly with file:// protocol
+Servidor de ficheros estáticos del frontend.
+
+Los ficheros se cargan en memoria al arrancar junto con sus copias
+precomprimidas (gzip y, si está instalado el paquete brotli, br). Cada
+conexión se atiende en su propio hilo con keep-alive HTTP/1.1; las respuestas
+llevan ETag, Last-Modified y Cache-Control y las peticiones condicionales se
+responden con 304. El log de accesos se encola y lo escribe un hilo aparte.
+
+Variables de entorno: HOST, PORT, CACHE_MAX_AGE_SECONDS (recursos distintos
+de index.html), KEEPALIVE_TIMEOUT_SECONDS y ACCESS_LOG ("true"/"false").
 """
 
+import gzip
+import hashlib
 import http.server
-import socketserver
+import logging
+import logging.handlers
+import mimetypes
 import os
+import queue
 import sys
+from email.utils import formatdate, parsedate_to_datetime
 from pathlib import Path
+from typing import Dict, NamedTuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 # Get the directory where this script is located
 SCRIPT_DIR = Path(__file__).parent.absolute()
 
-class CORSHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
-    def end_headers(self):
+STATIC_EXTENSIONS = {".html", ".css", ".js", ".json", ".svg", ".png", ".ico", ".jpg", ".webp", ".woff2", ".txt"}
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+# Por debajo de este tamaño la compresión no compensa
+MIN_COMPRESS_BYTES = 512
+
+CACHE_MAX_AGE_SECONDS = int(os.environ.get('CACHE_MAX_AGE_SECONDS', 3600))
+KEEPALIVE_TIMEOUT_SECONDS = float(os.environ.get('KEEPALIVE_TIMEOUT_SECONDS', 30))
+ACCESS_LOG = os.environ.get('ACCESS_LOG', 'true').lower() == 'true'
+
+access_logger = logging.getLogger("frontend.access")
+
+
+class Asset(NamedTuple):
+    content_type: str
+    etag: str
+    last_modified: str
+    mtime: int
+    cache_control: str
+    # Codificación ("identity", "gzip", "br") -> cuerpo
+    bodies: Dict[str, bytes]
+
+
+def load_asset(path: Path) -> Asset:
+    """Lee un fichero y prepara sus variantes comprimidas y cabeceras de caché"""
+    data = path.read_bytes()
+    mtime = path.stat().st_mtime
+    content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    if content_type.startswith("text/") or content_type == "application/javascript":
+        content_type += "; charset=utf-8"
+
+    bodies = {"identity": data}
+    if len(data) >= MIN_COMPRESS_BYTES and content_type.startswith(COMPRESSIBLE_TYPES):
+        bodies["gzip"] = gzip.compress(data, compresslevel=9, mtime=0)
+        if brotli is not None:
+            bodies["br"] = brotli.compress(data, quality=11)
+
+    # index.html se revalida siempre para que los despliegues se vean al momento
+    cache_control = "no-cache" if path.name == "index.html" else f"public, max-age={CACHE_MAX_AGE_SECONDS}"
+    return Asset(
+        content_type=content_type,
+        etag=hashlib.sha256(data).hexdigest()[:16],
+        last_modified=formatdate(mtime, usegmt=True),
+        mtime=int(mtime),
+        cache_control=cache_control,
+        bodies=bodies
+    )
+
+
+def load_assets(root: Path) -> Dict[str, Asset]:
+    """Recursos estáticos por ruta URL; "/" sirve index.html"""
+    assets = {}
+    for path in sorted(root.rglob("*")):
+        if path.is_file() and path.suffix in STATIC_EXTENSIONS:
+            assets["/" + path.relative_to(root).as_posix()] = load_asset(path)
+    if "/index.html" in assets:
+        assets["/"] = assets["/index.html"]
+    return assets
+
+
+def negotiate_encoding(accept_encoding: str, available: Dict[str, bytes]) -> str:
+    """Mejor codificación disponible aceptada por el cliente (br > gzip > identity)"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in ("br", "gzip"):
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return "identity"
+
+
+class StaticHandler(http.server.BaseHTTPRequestHandler):
+    """Sirve los recursos precargados con caché HTTP, compresión y keep-alive"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "FrontendStatic/1.0"
+    timeout = KEEPALIVE_TIMEOUT_SECONDS
+    assets: Dict[str, Asset] = {}
+
+    def send_cors_headers(self):
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS, PUT, DELETE')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
         self.send_header('Access-Control-Max-Age', '86400')
-        super().end_headers()
-    
+
     def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_cors_headers()
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_HEAD(self):
+        self.serve(head=True)
+
+    def do_GET(self):
+        self.serve(head=False)
+
+    def not_modified(self, asset: Asset, etag: str) -> bool:
+        """Peticiones condicionales: If-None-Match tiene prioridad sobre If-Modified-Since"""
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in tags or etag in tags or f'"{asset.etag}"' in tags
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is not None:
+            try:
+                return asset.mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def serve(self, head: bool):
+        path = self.path.split("?", 1)[0].split("#", 1)[0]
+        asset = self.assets.get(path)
+        if asset is None:
+            body = b"Not Found"
+            self.send_response(404)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_cors_headers()
+            self.end_headers()
+            if not head:
+                self.wfile.write(body)
+            return
+
+        encoding = negotiate_encoding(self.headers.get("Accept-Encoding", ""), asset.bodies)
+        etag = f'"{asset.etag}"' if encoding == "identity" else f'"{asset.etag}-{encoding}"'
+
+        if self.not_modified(asset, etag):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", asset.cache_control)
+            self.send_header("Vary", "Accept-Encoding")
+            self.send_cors_headers()
+            self.end_headers()
+            return
+
+        body = asset.bodies[encoding]
         self.send_response(200)
+        self.send_header("Content-Type", asset.content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if encoding != "identity":
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", asset.last_modified)
+        self.send_header("Cache-Control", asset.cache_control)
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_cors_headers()
         self.end_headers()
-    
+        if not head:
+            self.wfile.write(body)
+
+    def log_request(self, code='-', size='-'):
+        if ACCESS_LOG:
+            access_logger.info('%s "%s" %s %s', self.address_string(), self.requestline, code, size)
+
     def log_message(self, format, *args):
-        # Custom logging to show requests
-        print(f"[{self.log_date_time_string()}] {format % args}")
+        # Errores del servidor base (peticiones mal formadas, timeouts)
+        access_logger.warning('%s %s', self.address_string(), format % args)
+
+
+def setup_access_log() -> logging.handlers.QueueListener:
+    """Log de accesos no bloqueante: los hilos de petición solo encolan"""
+    log_queue: queue.Queue = queue.Queue(maxsize=10000)
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter('[%(asctime)s] %(message)s'))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    access_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    access_logger.setLevel(logging.INFO)
+    access_logger.propagate = False
+    listener.start()
+    return listener
+
 
 def main():
-    # Change to the frontend directory
-    os.chdir(SCRIPT_DIR)
-    
     PORT = int(os.environ.get('PORT', 3000))
     HOST = os.environ.get('HOST', '0.0.0.0')
-    
-    with socketserver.TCPServer((HOST, PORT), CORSHTTPRequestHandler) as httpd:
+
+    StaticHandler.assets = load_assets(SCRIPT_DIR)
+    listener = setup_access_log()
+
+    with http.server.ThreadingHTTPServer((HOST, PORT), StaticHandler) as httpd:
         print(f"🚀 Servidor frontend iniciado en http://{HOST}:{PORT}")
-        print(f"📁 Sirviendo archivos desde: {SCRIPT_DIR}")
+        print(f"📁 Sirviendo {len(StaticHandler.assets)} recursos en memoria desde: {SCRIPT_DIR} "
+              f"(gzip{', br' if brotli is not None else ''})")
         print(f"🌐 Abre tu navegador en: http://localhost:{PORT}")
         print("Presiona Ctrl+C para detener el servidor")
-        
+
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
             print("\n🛑 Servidor detenido")
+        finally:
+            listener.stop()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,300 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+import uvicorn
+
+from service_common.metrics import MetricsMiddleware, Registry
+from service_common.structured_logging import setup_logging, shutdown_logging
+
+from upstream import HealthMonitor, PodUpstream, Upstream, UpstreamTimeout, UpstreamUnavailable, forward_headers
+
+try:
+    import h2  # noqa: F401  (dependencia de httpx para HTTP/2)
+except ImportError:
+    h2 = None
+
+# Configurar logging no bloqueante (cola + hilo de escritura)
+setup_logging()
+logger = logging.getLogger(__name__)
+# httpx registra cada petición a los backends en INFO
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+class AnalyzeRequest(BaseModel):
+    medical: Optional[Dict[str, Any]] = None
+    fraud: Optional[Dict[str, Any]] = None
+
+class AnalyzeResponse(BaseModel):
+    medical: Optional[Dict[str, Any]] = None
+    fraud: Optional[Dict[str, Any]] = None
+    errors: Dict[str, Dict[str, Any]] = {}
+    processing_time_ms: float
+
+class HealthResponse(BaseModel):
+    status: str
+    upstreams: Dict[str, bool]
+
+app = FastAPI(
+    title="API Gateway",
+    description="Pasarela hacia los servicios médico, de fraude y de voz",
+    version="1.0.0"
+)
+
+# Configurar CORS
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# Métricas Prometheus expuestas en /metrics
+METRICS = Registry()
+REQUESTS_TOTAL = METRICS.counter("http_requests_total", "Peticiones HTTP atendidas", ("endpoint", "status"))
+REQUEST_LATENCY = METRICS.histogram("http_request_duration_seconds", "Latencia de las peticiones HTTP", ("endpoint",))
+REQUESTS_IN_FLIGHT = METRICS.gauge("http_requests_in_flight", "Peticiones HTTP en curso", ("endpoint",))
+UPSTREAM_LATENCY = METRICS.histogram("upstream_request_duration_seconds", "Latencia de las llamadas a los backends", ("service",))
+UPSTREAM_ERRORS = METRICS.counter("upstream_errors_total", "Llamadas a backends sin respuesta", ("service", "reason"))
+UPSTREAM_COALESCED = METRICS.gauge("upstream_coalesced_requests", "Llamadas resueltas con la respuesta de otra idéntica en vuelo", ("service",))
+UPSTREAM_HEALTHY = METRICS.gauge("upstream_endpoint_healthy", "Estado de salud de cada URL de backend", ("service", "url"))
+
+app.add_middleware(
+    MetricsMiddleware,
+    requests_total=REQUESTS_TOTAL,
+    latency=REQUEST_LATENCY,
+    in_flight=REQUESTS_IN_FLIGHT,
+    routes=("/", "/health", "/metrics", "/upstreams", "/api/analyze",
+            "/api/medical/predict", "/api/medical/predict/batch",
+            "/api/medical/sessions", "/api/medical/sessions/delta",
+            "/api/fraud/predict", "/api/fraud/predict/batch", "/api/fraud/predict/stream",
+            "/api/speech/transcribe"),
+)
+
+def url_list(value: str) -> List[str]:
+    return [url.strip() for url in value.split(",") if url.strip()]
+
+# URLs de cada backend separadas por comas (Services de Kubernetes por defecto)
+UPSTREAM_URLS = {
+    "medical": url_list(os.getenv("GATEWAY_MEDICAL_URLS", "http://medical-service")),
+    "fraud": url_list(os.getenv("GATEWAY_FRAUD_URLS", "http://fraud-service")),
+    "speech": url_list(os.getenv("GATEWAY_SPEECH_URLS", "http://speech-service")),
+}
+# Sesiones de clasificación incremental: viven en memoria de un pod de medical,
+# así que se enrutan por session_id a una URL por pod (Service headless con el
+# puerto del contenedor). Vacío: van por GATEWAY_MEDICAL_URLS (una sola réplica)
+GATEWAY_MEDICAL_SESSION_URL = os.getenv("GATEWAY_MEDICAL_SESSION_URL", "").strip()
+GATEWAY_HTTP2 = os.getenv("GATEWAY_HTTP2", "true").lower() == "true"
+GATEWAY_COALESCE = os.getenv("GATEWAY_COALESCE", "true").lower() == "true"
+GATEWAY_MAX_CONNECTIONS = int(os.getenv("GATEWAY_MAX_CONNECTIONS", "200"))
+GATEWAY_MAX_KEEPALIVE = int(os.getenv("GATEWAY_MAX_KEEPALIVE", "50"))
+GATEWAY_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("GATEWAY_KEEPALIVE_EXPIRY_SECONDS", "30"))
+GATEWAY_CONNECT_TIMEOUT_SECONDS = float(os.getenv("GATEWAY_CONNECT_TIMEOUT_SECONDS", "2"))
+GATEWAY_TIMEOUT_SECONDS = float(os.getenv("GATEWAY_TIMEOUT_SECONDS", "60"))
+HEALTH_CHECK_INTERVAL_SECONDS = float(os.getenv("HEALTH_CHECK_INTERVAL_SECONDS", "5"))
+RETRY_AFTER_SECONDS = "1"
+
+# Cabeceras de la petición del navegador que se reenvían (el resto solo
+# romperían la agrupación de llamadas idénticas)
+FORWARDED_REQUEST_HEADERS = frozenset(("content-type", "accept", "authorization", "x-tenant-id", "x-api-key"))
+JSON_HEADERS = (("content-type", "application/json"),)
+
+HTTP_CLIENT: Optional[httpx.AsyncClient] = None
+UPSTREAMS: Dict[str, Upstream] = {}
+SESSION_UPSTREAM: Optional[PodUpstream] = None
+HEALTH_MONITOR: Optional[HealthMonitor] = None
+
+async def call_upstream(service: str, method: str, path: str, body: bytes = b"",
+                        headers: Tuple[Tuple[str, str], ...] = (), query: Optional[str] = None,
+                        upstream: Optional[Upstream] = None, key: Optional[str] = None):
+    """Llamada con respuesta completa; traduce la indisponibilidad del backend a 503/504"""
+    start = time.perf_counter()
+    try:
+        return await (upstream or UPSTREAMS[service]).request(method, path, body, headers, query, key)
+    except UpstreamTimeout as e:
+        UPSTREAM_ERRORS.inc(service, "timeout")
+        raise HTTPException(status_code=504, detail=str(e))
+    except UpstreamUnavailable as e:
+        UPSTREAM_ERRORS.inc(service, "unavailable")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": RETRY_AFTER_SECONDS})
+    finally:
+        UPSTREAM_LATENCY.observe(time.perf_counter() - start, service)
+
+async def analyze_part(service: str, payload: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """POST /predict de un servicio: (resultado, error)"""
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    try:
+        response = await call_upstream(service, "POST", "/predict", body, JSON_HEADERS)
+    except HTTPException as e:
+        return None, {"status_code": e.status_code, "detail": e.detail}
+
+    try:
+        content = json.loads(response.content)
+    except ValueError:
+        content = {"detail": response.content.decode("utf-8", "replace")}
+    if response.status_code != 200:
+        return None, {"status_code": response.status_code, "detail": content.get("detail", content)}
+    return content, None
+
+@app.on_event("startup")
+async def startup_event():
+    """Crea el pool de conexiones a los backends y arranca el sondeo de salud"""
+    global HTTP_CLIENT, SESSION_UPSTREAM, HEALTH_MONITOR
+    http2 = GATEWAY_HTTP2 and h2 is not None
+    if GATEWAY_HTTP2 and h2 is None:
+        logger.warning("GATEWAY_HTTP2 activado pero el paquete h2 no está instalado; se usa HTTP/1.1")
+
+    HTTP_CLIENT = httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(max_connections=GATEWAY_MAX_CONNECTIONS,
+                            max_keepalive_connections=GATEWAY_MAX_KEEPALIVE,
+                            keepalive_expiry=GATEWAY_KEEPALIVE_EXPIRY_SECONDS),
+        timeout=httpx.Timeout(GATEWAY_TIMEOUT_SECONDS, connect=GATEWAY_CONNECT_TIMEOUT_SECONDS),
+    )
+    for service, urls in UPSTREAM_URLS.items():
+        UPSTREAMS[service] = Upstream(service, urls, HTTP_CLIENT, coalesce=GATEWAY_COALESCE)
+    monitored = list(UPSTREAMS.values())
+    if GATEWAY_MEDICAL_SESSION_URL:
+        SESSION_UPSTREAM = PodUpstream("medical-sessions", GATEWAY_MEDICAL_SESSION_URL, HTTP_CLIENT,
+                                       coalesce=GATEWAY_COALESCE)
+        await SESSION_UPSTREAM.resolve()
+        monitored.append(SESSION_UPSTREAM)
+    HEALTH_MONITOR = HealthMonitor(monitored, HEALTH_CHECK_INTERVAL_SECONDS)
+    HEALTH_MONITOR.start()
+    logger.info(f"Pasarela iniciada - HTTP/2: {http2}, Coalescing: {GATEWAY_COALESCE}, "
+                f"Backends: {', '.join(f'{s}={len(u)}' for s, u in UPSTREAM_URLS.items())}, "
+                f"Sesiones: {GATEWAY_MEDICAL_SESSION_URL or 'sin afinidad'}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Detiene el sondeo y cierra las conexiones keep-alive"""
+    if HEALTH_MONITOR is not None:
+        await HEALTH_MONITOR.stop()
+    if HTTP_CLIENT is not None:
+        await HTTP_CLIENT.aclose()
+    shutdown_logging()
+
+@app.get("/health", response_model=HealthResponse)
+async def health_check():
+    """Estado de la pasarela y de cada backend según el último sondeo"""
+    upstreams = {service: upstream.healthy for service, upstream in UPSTREAMS.items()}
+    return HealthResponse(
+        status="healthy" if all(upstreams.values()) else "degraded",
+        upstreams=upstreams
+    )
+
+@app.post("/api/analyze", response_model=AnalyzeResponse)
+async def analyze(request: AnalyzeRequest):
+    """Análisis médico y de fraude en paralelo en un solo viaje de ida y vuelta"""
+    start_time = time.perf_counter()
+    parts = {service: payload for service, payload in (("medical", request.medical), ("fraud", request.fraud))
+             if payload is not None}
+    if not parts:
+        raise HTTPException(status_code=400, detail="Se requiere al menos una petición: medical o fraud")
+
+    outcomes = await asyncio.gather(*(analyze_part(service, payload) for service, payload in parts.items()))
+    response = AnalyzeResponse(processing_time_ms=0)
+    for service, (result, error) in zip(parts, outcomes):
+        if error is not None:
+            response.errors[service] = error
+        else:
+            setattr(response, service, result)
+    response.processing_time_ms = (time.perf_counter() - start_time) * 1000
+
+    # Solo falla la petición combinada si fallan todas sus partes
+    if len(response.errors) == len(parts):
+        status_code = max(error["status_code"] for error in response.errors.values())
+        return Response(response.model_dump_json(), status_code=status_code, media_type="application/json")
+    return response
+
+def session_key(body: bytes) -> Optional[str]:
+    """session_id del cuerpo JSON de una petición de sesión (None si no lo hay)"""
+    try:
+        session_id = json.loads(body).get("session_id")
+    except (ValueError, AttributeError):
+        return None
+    return session_id if isinstance(session_id, str) else None
+
+@app.api_route("/api/{service}/{path:path}", methods=["GET", "POST"])
+async def proxy(service: str, path: str, request: Request):
+    """Reenvía la petición al backend del servicio con balanceo por salud"""
+    upstream = UPSTREAMS.get(service)
+    if upstream is None:
+        raise HTTPException(status_code=404, detail=f"Servicio desconocido: {service}")
+
+    body = await request.body()
+    headers = tuple((k, v) for k, v in request.headers.items() if k in FORWARDED_REQUEST_HEADERS)
+    query = request.url.query or None
+
+    # Respuestas NDJSON: se transmiten según llegan, sin agrupar
+    if path.endswith("/stream"):
+        try:
+            response = await upstream.stream(request.method, f"/{path}", body, headers, query)
+        except UpstreamTimeout as e:
+            UPSTREAM_ERRORS.inc(service, "timeout")
+            raise HTTPException(status_code=504, detail=str(e))
+        except UpstreamUnavailable as e:
+            UPSTREAM_ERRORS.inc(service, "unavailable")
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": RETRY_AFTER_SECONDS})
+        return StreamingResponse(response.aiter_raw(), status_code=response.status_code,
+                                 headers=dict(forward_headers(response.headers.items())),
+                                 background=BackgroundTask(response.aclose))
+
+    # Las sesiones de medical van siempre al pod que las tiene en memoria
+    if service == "medical" and path.startswith("sessions") and SESSION_UPSTREAM is not None:
+        response = await call_upstream(service, request.method, f"/{path}", body, headers, query,
+                                       SESSION_UPSTREAM, session_key(body))
+    else:
+        response = await call_upstream(service, request.method, f"/{path}", body, headers, query)
+    return Response(response.content, status_code=response.status_code, headers=dict(response.headers))
+
+@app.get("/upstreams")
+async def upstreams_status():
+    """Estado de salud, carga y agrupación de llamadas de cada backend"""
+    stats = {service: upstream.stats() for service, upstream in UPSTREAMS.items()}
+    if SESSION_UPSTREAM is not None:
+        stats[SESSION_UPSTREAM.name] = SESSION_UPSTREAM.stats()
+    return stats
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Métricas en formato de exposición de Prometheus"""
+    for service, upstream in UPSTREAMS.items():
+        UPSTREAM_COALESCED.set(upstream.coalesced, service)
+        for endpoint in upstream.endpoints:
+            UPSTREAM_HEALTHY.set(float(endpoint.healthy), service, endpoint.base_url)
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/")
+async def root():
+    """Endpoint raíz"""
+    return {
+        "service": "API Gateway",
+        "version": "1.0.0",
+        "endpoints": {
+            "health": "/health",
+            "analyze": "/api/analyze",
+            "medical": "/api/medical/{ruta}",
+            "fraud": "/api/fraud/{ruta}",
+            "speech": "/api/speech/{ruta}",
+            "upstreams": "/upstreams",
+            "metrics": "/metrics"
+        }
+    }
+
+if __name__ == "__main__":
+    uvicorn.run(
+        "app:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=False,
+        log_level="info"
+    )
@@ -0,0 +1,303 @@
+"""
+Clientes de los servicios de backend para la pasarela.
+
+Cada servicio (medical, fraud, speech) es un Upstream con una o varias URL
+base. Todas comparten un cliente httpx con conexiones keep-alive en pool
+(HTTP/2 cuando el backend lo negocia por ALPN). El balanceo tiene en cuenta
+la salud: un sondeo periódico de /health y los errores de conexión marcan
+cada URL como sana o no, y cada petición va a la URL sana con menos
+peticiones en curso. Las llamadas idénticas en vuelo se agrupan
+(coalescing): solo la primera llega al backend y las demás esperan su
+respuesta.
+
+Las peticiones con clave de afinidad (p. ej. el id de una sesión con estado en
+memoria del backend) van siempre a la misma URL mientras siga sana (hashing
+por rendezvous). PodUpstream obtiene esas URL resolviendo un Service headless
+de Kubernetes, una por pod.
+"""
+
+import asyncio
+import hashlib
+import itertools
+import logging
+import socket
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Cabeceras que no se reenvían entre saltos (RFC 9110, sección 7.6.1)
+HOP_BY_HOP_HEADERS = frozenset((
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te", "trailer",
+    "transfer-encoding", "upgrade", "host", "content-length"
+))
+# httpx entrega el cuerpo ya descomprimido
+RESPONSE_EXCLUDED_HEADERS = HOP_BY_HOP_HEADERS | {"content-encoding"}
+# Solo los fallos de conexión se reintentan en otra URL: la petición no llegó al backend
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+
+class UpstreamUnavailable(Exception):
+    """Ninguna URL del servicio ha respondido"""
+
+
+class UpstreamTimeout(UpstreamUnavailable):
+    """El backend aceptó la petición pero no respondió a tiempo"""
+
+
+class UpstreamResponse(NamedTuple):
+    status_code: int
+    headers: List[Tuple[str, str]]
+    content: bytes
+
+
+def forward_headers(headers: Sequence[Tuple[str, str]], excluded=HOP_BY_HOP_HEADERS) -> List[Tuple[str, str]]:
+    """Cabeceras de extremo a extremo (sin las de conexión)"""
+    return [(k, v) for k, v in headers if k.lower() not in excluded]
+
+
+class Endpoint:
+    """URL base de un backend con su estado de salud y peticiones en curso"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self.healthy = True
+        self.in_flight = 0
+        self.failures = 0
+        self.checked_at = 0.0
+        self.last_error: Optional[str] = None
+
+    def mark_down(self, error: str) -> None:
+        if self.healthy:
+            logger.warning(f"Backend {self.base_url} marcado como no disponible: {error}")
+        self.healthy = False
+        self.failures += 1
+        self.last_error = error
+
+    def mark_up(self) -> None:
+        if not self.healthy:
+            logger.info(f"Backend {self.base_url} disponible de nuevo")
+        self.healthy = True
+        self.last_error = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.base_url,
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "failures": self.failures,
+            "checked_at": self.checked_at,
+            "last_error": self.last_error
+        }
+
+
+class Upstream:
+    """Servicio de backend con balanceo por salud y agrupación de llamadas en vuelo"""
+
+    def __init__(self, name: str, base_urls: Sequence[str], client: httpx.AsyncClient,
+                 health_path: str = "/health", coalesce: bool = True):
+        if not base_urls:
+            raise ValueError(f"El servicio {name} no tiene URLs configuradas")
+        self.name = name
+        self.endpoints = [Endpoint(url) for url in base_urls]
+        self.client = client
+        self.health_path = health_path
+        self.coalesce = coalesce
+        self.coalesced = 0
+        self._in_flight: Dict[str, "asyncio.Future[UpstreamResponse]"] = {}
+        self._round_robin = itertools.count()
+
+    def candidates(self, key: Optional[str] = None) -> List[Endpoint]:
+        """URLs en orden de preferencia: sanas con menos carga primero.
+
+        Con clave de afinidad el orden es el del hashing por rendezvous: la
+        misma clave va a la misma URL y, si cae, solo se mueven sus claves.
+        Si ninguna está sana se prueban todas (el sondeo puede ir por detrás).
+        """
+        if key is not None:
+            ranked = sorted(self.endpoints, reverse=True, key=lambda e: hashlib.blake2b(
+                f"{key}\0{e.base_url}".encode(), digest_size=8).digest())
+            return [e for e in ranked if e.healthy] + [e for e in ranked if not e.healthy]
+        offset = next(self._round_robin)
+        rotated = self.endpoints[offset % len(self.endpoints):] + self.endpoints[:offset % len(self.endpoints)]
+        healthy = sorted((e for e in rotated if e.healthy), key=lambda e: e.in_flight)
+        return healthy + [e for e in rotated if not e.healthy]
+
+    async def request(self, method: str, path: str, content: bytes = b"",
+                      headers: Sequence[Tuple[str, str]] = (), params: Optional[str] = None,
+                      key: Optional[str] = None) -> UpstreamResponse:
+        """Petición con respuesta completa; las idénticas en vuelo se resuelven una sola vez"""
+        if not self.coalesce:
+            return await self._send(method, path, content, headers, params, key)
+
+        key = hashlib.sha256(b"\0".join((
+            method.encode(), path.encode(), (params or "").encode(),
+            "\0".join(f"{k.lower()}:{v}" for k, v in sorted(headers)).encode(), content
+        ))).hexdigest()
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # Se canceló la petición original (cliente desconectado), no esta
+                return await self._send(method, path, content, headers, params, key)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            response = await self._send(method, path, content, headers, params, key)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Evitar el aviso de excepción no recuperada si nadie más esperaba
+            future.exception()
+            raise
+        else:
+            future.set_result(response)
+            return response
+        finally:
+            del self._in_flight[key]
+
+    async def _send(self, method: str, path: str, content: bytes,
+                    headers: Sequence[Tuple[str, str]], params: Optional[str],
+                    key: Optional[str] = None) -> UpstreamResponse:
+        last_error = "sin URLs"
+        for endpoint in self.candidates(key):
+            endpoint.in_flight += 1
+            try:
+                response = await self.client.request(
+                    method, endpoint.base_url + path, content=content, headers=list(headers), params=params
+                )
+            except RETRYABLE_ERRORS as e:
+                last_error = f"{type(e).__name__}: {e}"
+                endpoint.mark_down(last_error)
+                continue
+            except httpx.TimeoutException as e:
+                raise UpstreamTimeout(f"Servicio {self.name} sin respuesta ({type(e).__name__})") from e
+            except httpx.TransportError as e:
+                endpoint.mark_down(f"{type(e).__name__}: {e}")
+                raise UpstreamUnavailable(f"Servicio {self.name} no disponible ({type(e).__name__}: {e})") from e
+            finally:
+                endpoint.in_flight -= 1
+            endpoint.mark_up()
+            return UpstreamResponse(response.status_code,
+                                    forward_headers(response.headers.items(), RESPONSE_EXCLUDED_HEADERS),
+                                    response.content)
+        raise UpstreamUnavailable(f"Servicio {self.name} no disponible ({last_error})")
+
+    async def stream(self, method: str, path: str, content: bytes = b"",
+                     headers: Sequence[Tuple[str, str]] = (), params: Optional[str] = None) -> httpx.Response:
+        """Petición con respuesta en streaming (sin agrupar); el llamante debe cerrarla"""
+        last_error = "sin URLs"
+        for endpoint in self.candidates():
+            request = self.client.build_request(
+                method, endpoint.base_url + path, content=content, headers=list(headers), params=params
+            )
+            try:
+                response = await self.client.send(request, stream=True)
+            except RETRYABLE_ERRORS as e:
+                last_error = f"{type(e).__name__}: {e}"
+                endpoint.mark_down(last_error)
+                continue
+            except httpx.TimeoutException as e:
+                raise UpstreamTimeout(f"Servicio {self.name} sin respuesta ({type(e).__name__})") from e
+            except httpx.TransportError as e:
+                endpoint.mark_down(f"{type(e).__name__}: {e}")
+                raise UpstreamUnavailable(f"Servicio {self.name} no disponible ({type(e).__name__}: {e})") from e
+            endpoint.mark_up()
+            return response
+        raise UpstreamUnavailable(f"Servicio {self.name} no disponible ({last_error})")
+
+    async def check_health(self, timeout: float) -> None:
+        """Sondea /health de todas las URLs en paralelo"""
+        async def probe(endpoint: Endpoint) -> None:
+            try:
+                response = await self.client.get(endpoint.base_url + self.health_path, timeout=timeout)
+            except httpx.TransportError as e:
+                endpoint.mark_down(f"{type(e).__name__}: {e}")
+            else:
+                if response.status_code < 500:
+                    endpoint.mark_up()
+                else:
+                    endpoint.mark_down(f"HTTP {response.status_code} en {self.health_path}")
+            endpoint.checked_at = time.time()
+
+        await asyncio.gather(*(probe(e) for e in self.endpoints))
+
+    @property
+    def healthy(self) -> bool:
+        return any(e.healthy for e in self.endpoints)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "healthy": self.healthy,
+            "coalesced": self.coalesced,
+            "in_flight_keys": len(self._in_flight),
+            "endpoints": [e.stats() for e in self.endpoints]
+        }
+
+
+class PodUpstream(Upstream):
+    """Upstream con una URL por pod, resuelta del nombre de un Service headless.
+
+    Cada sondeo de salud vuelve a resolver el nombre: los pods nuevos entran y
+    los que desaparecen salen conservando el estado de los que siguen.
+    """
+
+    def __init__(self, name: str, base_url: str, client: httpx.AsyncClient,
+                 health_path: str = "/health", coalesce: bool = True):
+        super().__init__(name, [base_url], client, health_path, coalesce)
+        url = httpx.URL(base_url)
+        self.service_url = url
+        self.port = url.port or (443 if url.scheme == "https" else 80)
+
+    async def resolve(self) -> None:
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(
+                self.service_url.host, self.port, type=socket.SOCK_STREAM)
+        except OSError as e:
+            logger.warning(f"No se pudo resolver {self.service_url.host}: {e}")
+            return
+        addresses = sorted({info[4][0] for info in infos})
+        if not addresses:
+            return
+        current = {e.base_url: e for e in self.endpoints}
+        urls = [str(self.service_url.copy_with(host=address)).rstrip("/") for address in addresses]
+        self.endpoints = [current.get(url) or Endpoint(url) for url in urls]
+
+    async def check_health(self, timeout: float) -> None:
+        await self.resolve()
+        await super().check_health(timeout)
+
+
+class HealthMonitor:
+    """Tarea de fondo que sondea periódicamente la salud de los backends"""
+
+    def __init__(self, upstreams: Sequence[Upstream], interval_seconds: float = 5.0, timeout_seconds: float = 2.0):
+        self.upstreams = upstreams
+        self.interval_seconds = interval_seconds
+        self.timeout_seconds = timeout_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.gather(*(u.check_health(self.timeout_seconds) for u in self.upstreams))
+            await asyncio.sleep(self.interval_seconds)
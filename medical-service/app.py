@@ -1,20 +1,41 @@
 import os
+import sys
 import time
+# Inicio de la importación del servicio (fases del arranque en /ready y /metrics)
+IMPORT_STARTED = time.perf_counter()
+import asyncio
+import heapq
 import logging
-from typing import Dict, Any, List
-from fastapi import FastAPI, HTTPException
+import math
+from functools import lru_cache
+from typing import Dict, Any, List, NamedTuple, Optional, Sequence, Set, Tuple
+import numpy as np
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import uvicorn
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, ValidationError
 import re
 import traceback
 
-# Configurar logging mejorado
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+from service_common.admission import (BATCH, INTERACTIVE, LANES, AdmissionController, AdmissionRejected,
+                                     TenantRateLimiter, parse_deadline, parse_lane, tenant_id)
+from service_common.fast_json import FastJSONResponse, dumps, parse_body, request_body_schema
+from service_common.hot_reload import RuleSetWatcher
+from service_common.metrics import MetricsMiddleware, Registry
+from service_common.structured_logging import endpoint_logger, setup_logging, shutdown_logging
+from service_common.worker_pool import ClassifierPool, PoolSaturated, default_workers
+
+from cache import ResultCache, make_cache_key
+from kb_artifact import MappedKnowledgeIndex, load_catalogue
+from matcher import KnowledgeIndex
+from retrieval import RetrievalIndex
+from sessions import NoteSession, SessionStore, edited_length
+from transcript_stream import TRANSCRIBERS, TranscriptEvent, TranscriptSession
+
+# Configurar logging no bloqueante (cola + hilo de escritura)
+setup_logging()
 logger = logging.getLogger(__name__)
+predict_logger = endpoint_logger("predict")
 
 class MedicalRequest(BaseModel):
     text: str
@@ -29,6 +50,45 @@ class MedicalResponse(BaseModel):
     processing_time_ms: float
     alternative_codes: List[Dict[str, Any]] = []
 
+class MedicalExplainedResponse(MedicalResponse):
+    # Solo con explain=true: analysis_score, matched_symptoms, matched_keywords, category
+    explanation: Optional[Dict[str, Any]] = None
+
+class SessionOpenRequest(MedicalRequest):
+    session_id: str
+
+class SessionEdit(BaseModel):
+    # Rango [start, end) de la nota actual (en caracteres) y texto que lo sustituye
+    start: int
+    end: int
+    text: str = ""
+
+class SessionDeltaRequest(BaseModel):
+    session_id: str
+    revision: Optional[int] = None
+    edits: List[SessionEdit] = []
+    patient_age: Optional[int] = None
+    symptoms: Optional[List[str]] = None
+
+class SessionCloseRequest(BaseModel):
+    session_id: str
+
+class MedicalSessionResponse(MedicalExplainedResponse):
+    session_id: str
+    revision: int
+
+class TranscriptMessage(BaseModel):
+    # start (edad y síntomas), partial, final o end
+    type: str
+    text: str = ""
+    patient_age: Optional[int] = None
+    symptoms: Optional[List[str]] = None
+
+class MedicalBatchItem(BaseModel):
+    index: int
+    result: Optional[MedicalResponse] = None
+    error: Optional[str] = None
+
 class HealthResponse(BaseModel):
     status: str
     model_loaded: bool
@@ -49,9 +109,48 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métricas Prometheus expuestas en /metrics
+METRICS = Registry()
+REQUESTS_TOTAL = METRICS.counter("http_requests_total", "Peticiones HTTP atendidas", ("endpoint", "status"))
+REQUEST_LATENCY = METRICS.histogram("http_request_duration_seconds", "Latencia de las peticiones HTTP", ("endpoint",))
+REQUESTS_IN_FLIGHT = METRICS.gauge("http_requests_in_flight", "Peticiones HTTP en curso", ("endpoint",))
+VALIDATION_ERRORS = METRICS.counter("validation_errors_total", "Peticiones rechazadas por validación", ("endpoint", "reason"))
+STAGE_LATENCY = METRICS.histogram("classifier_stage_duration_seconds", "Duración de cada etapa del clasificador", ("classifier", "stage"))
+POOL_PENDING = METRICS.gauge("classifier_pool_pending", "Tareas en el pool de clasificación",
+                             callback=lambda: CLASSIFIER_POOL.pending if CLASSIFIER_POOL else 0)
+POOL_REJECTED = METRICS.counter("classifier_pool_rejected_total", "Peticiones rechazadas por saturación del pool", ("endpoint",))
+ADMISSION_QUEUE_DEPTH = METRICS.gauge("admission_queue_depth", "Peticiones esperando un slot de clasificación", ("lane",),
+                                      callback=lambda: {(lane,): ADMISSION.queued(lane) for lane in LANES})
+ADMISSION_ACTIVE = METRICS.gauge("admission_active_slots", "Slots de clasificación ocupados",
+                                 callback=lambda: ADMISSION.active)
+ADMISSION_SHED = METRICS.counter("admission_shed_total", "Peticiones rechazadas por el control de admisión",
+                                 ("endpoint", "lane", "reason"))
+SESSIONS_ACTIVE = METRICS.gauge("classification_sessions", "Sesiones de clasificación incremental abiertas",
+                                callback=lambda: len(SESSIONS))
+SESSION_TOKENS_RESCANNED = METRICS.counter("session_tokens_rescanned_total",
+                                           "Tokens reescaneados al aplicar cambios a las sesiones")
+TRANSCRIPT_STREAMS = METRICS.gauge("transcript_streams", "Dictados abiertos por WebSocket")
+TRANSCRIPT_UPDATES = METRICS.counter("transcript_stream_updates_total", "Transcripciones recibidas en los dictados",
+                                     ("kind",))
+RULES_RELOADS = METRICS.counter("rules_reloads_total", "Recargas de la base de conocimiento publicadas")
+# Duración de cada fase del arranque: import, warmup y pool (en modo pool)
+STARTUP_PHASES: Dict[str, float] = {}
+STARTUP_DURATION = METRICS.gauge("startup_phase_seconds", "Duración de cada fase del arranque del servicio", ("phase",),
+                                 callback=lambda: {(phase,): seconds for phase, seconds in STARTUP_PHASES.items()})
+
+app.add_middleware(
+    MetricsMiddleware,
+    requests_total=REQUESTS_TOTAL,
+    latency=REQUEST_LATENCY,
+    in_flight=REQUESTS_IN_FLIGHT,
+    routes=("/", "/health", "/ready", "/metrics", "/predict", "/predict/batch", "/cache/stats", "/admission/stats", "/rules",
+            "/sessions", "/sessions/delta", "/sessions/close", "/sessions/stats"),
+)
+
 # Variables globales
 model_version = "Clinical ModernBERT v2.0"
-model_loaded = True
+model_loaded = False  # True tras el calentamiento del arranque (/ready)
+WARMUP_TASK: Optional[asyncio.Task] = None
 
 # Base de conocimiento médico mejorada con análisis semántico
 MEDICAL_KNOWLEDGE_BASE = {
@@ -145,70 +244,281 @@ MEDICAL_KNOWLEDGE_BASE = {
     }
 }
 
-def classify_medical_enhanced(text: str, age: int, symptoms: List[str]) -> Dict[str, Any]:
-    """Clasificación médica usando Clinical ModernBERT con análisis semántico avanzado"""
+# Bonificaciones demográficas por categoría (edad > 60 y edad < 40)
+AGE_BONUS_SENIOR = {"cardiovascular": 1.5, "endocrino": 1.2}
+AGE_BONUS_YOUNG = {"musculoesquelético": 0.8}
+
+# Límites del endpoint por lotes
+BATCH_MAX_ITEMS = 1000
+BATCH_SCORING_CELLS = 4_000_000  # Celdas nota × código por bloque de puntuación
+
+def load_knowledge_index(path: str) -> KnowledgeIndex:
+    """Índice de un artefacto precompilado (.kbx, mmap) o de un catálogo fuente (.json/.csv)"""
+    if path.endswith(".kbx"):
+        return MappedKnowledgeIndex(path)
+    return KnowledgeIndex(load_catalogue(path))
+
+# Índice multi-patrón: fichero externo (p. ej. el catálogo CIE-10-CM completo
+# compilado con kb_artifact.py, montado desde un ConfigMap o volumen) o, sin él,
+# la base de conocimiento integrada. Es un puntero copy-on-write: se sustituye
+# entero al recargar y cada clasificación lee la referencia una sola vez.
+KNOWLEDGE_BASE_PATH = os.getenv("KNOWLEDGE_BASE_PATH", "")
+KNOWLEDGE_INDEX = (load_knowledge_index(KNOWLEDGE_BASE_PATH) if KNOWLEDGE_BASE_PATH
+                   else KnowledgeIndex(MEDICAL_KNOWLEDGE_BASE))
+RULES_RELOAD_INTERVAL_SECONDS = float(os.getenv("RULES_RELOAD_INTERVAL_SECONDS", "5"))
+RULES_WATCHER: Optional[RuleSetWatcher] = None
+
+# Recuperación aproximada por similitud (retrieval.py): añade como candidatos
+# los códigos más parecidos a la nota aunque ninguna keyword coincida exacta.
+# Índice precompilado (RETRIEVAL_INDEX_PATH) si es de la misma versión de la
+# base de conocimiento; si no, se construye al arrancar y en cada recarga.
+RETRIEVAL_ENABLED = os.getenv("RETRIEVAL_ENABLED", "false").lower() == "true"
+RETRIEVAL_INDEX_PATH = os.getenv("RETRIEVAL_INDEX_PATH", "")
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "10"))
+RETRIEVAL_NPROBE = int(os.getenv("RETRIEVAL_NPROBE", "32"))
+RETRIEVAL_MIN_SIMILARITY = float(os.getenv("RETRIEVAL_MIN_SIMILARITY", "0.1"))
+RETRIEVAL_SCORE_WEIGHT = 3.0      # Puntos por unidad de similitud coseno
+RETRIEVAL_RELEVANCE_WEIGHT = 1.5  # Ídem en la relevancia de las alternativas
+
+def load_retrieval_index(index: KnowledgeIndex) -> Optional[RetrievalIndex]:
+    """Índice de recuperación para `index` (None si la recuperación está desactivada)"""
+    if not RETRIEVAL_ENABLED:
+        return None
+    if RETRIEVAL_INDEX_PATH:
+        try:
+            retrieval = RetrievalIndex.load(RETRIEVAL_INDEX_PATH, RETRIEVAL_NPROBE)
+            if retrieval.version == index.version:
+                return retrieval
+            logger.warning(f"Índice de recuperación de otra versión ({retrieval.version}), se reconstruye")
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"No se pudo cargar el índice de recuperación {RETRIEVAL_INDEX_PATH}: {e}")
+    return RetrievalIndex.build(index, nprobe=RETRIEVAL_NPROBE)
+
+RETRIEVAL_INDEX = load_retrieval_index(KNOWLEDGE_INDEX)
+
+def versioned_model(kb_version: str) -> str:
+    """Versión del modelo expuesta en las respuestas, con la de la base de conocimiento"""
+    return f"{model_version} (kb {kb_version})"
+
+def cache_version(kb_version: str) -> str:
+    """Versión de la caché de resultados: la recuperación cambia las puntuaciones"""
+    return f"{kb_version}+retrieval" if RETRIEVAL_ENABLED else kb_version
+
+# Caché de resultados para notas repetidas (reintentos, plantillas, re-renderizados)
+RESULT_CACHE = ResultCache(
+    max_size=int(os.getenv("RESULT_CACHE_MAX_SIZE", "10000")),
+    ttl_seconds=float(os.getenv("RESULT_CACHE_TTL_SECONDS", "300")),
+    redis_url=os.getenv("RESULT_CACHE_REDIS_URL", ""),
+    version=cache_version(KNOWLEDGE_INDEX.version)
+)
+CACHED_FIELDS = ("icd10_code", "description", "confidence", "alternative_codes", "kb_version")
+
+# Modo de servicio: "inline" clasifica en el event loop; "pool" en procesos pre-forkeados
+SERVING_MODE = os.getenv("SERVING_MODE", "inline")
+SERVER_WORKERS = int(os.getenv("UVICORN_WORKERS", "1"))
+POOL_WORKERS = int(os.getenv("CLASSIFIER_POOL_WORKERS", "0")) or default_workers(SERVER_WORKERS)
+POOL_QUEUE_SIZE = int(os.getenv("CLASSIFIER_QUEUE_SIZE", "0")) or 4 * POOL_WORKERS
+DRAIN_TIMEOUT_SECONDS = float(os.getenv("DRAIN_TIMEOUT_SECONDS", "20"))
+RETRY_AFTER_SECONDS = "1"
+CLASSIFIER_POOL: Optional[ClassifierPool] = None
+EVENT_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+# Control de admisión: límite de tasa por tenant y slots de clasificación con
+# carriles interactive/batch. En modo pool hay un slot por proceso, de modo que
+# la espera ocurre en la cola con prioridad y no en la FIFO del pool.
+RATE_LIMITER = TenantRateLimiter(
+    rate=float(os.getenv("RATE_LIMIT_RPS", "0")),
+    burst=float(os.getenv("RATE_LIMIT_BURST", "0")) or 2 * float(os.getenv("RATE_LIMIT_RPS", "0"))
+)
+ADMISSION = AdmissionController(
+    slots=int(os.getenv("ADMISSION_SLOTS", "0")) or (POOL_WORKERS if SERVING_MODE == "pool" else 1),
+    max_queue=int(os.getenv("ADMISSION_QUEUE_SIZE", "0")) or POOL_QUEUE_SIZE
+)
+
+# Sesiones de clasificación incremental para las notas en edición del frontend.
+# Viven en el proceso de la API (también en modo pool): aplicar un cambio cuesta
+# microsegundos y no compensa enviarlo a otro proceso.
+SESSIONS = SessionStore(
+    max_sessions=int(os.getenv("SESSION_MAX_SESSIONS", "5000")),
+    idle_seconds=float(os.getenv("SESSION_IDLE_SECONDS", "600"))
+)
+SESSION_ID_RE = re.compile(r"[A-Za-z0-9_-]{8,64}")
+SESSION_MAX_TEXT_LENGTH = 2000
+
+# Dictado por WebSocket: transcriptor local de los frames binarios (sin él se
+# rechazan; el texto puede llegar ya transcrito) y cierre de los inactivos
+STREAM_TRANSCRIBER = os.getenv("STREAM_TRANSCRIBER", "")
+STREAM_IDLE_SECONDS = float(os.getenv("STREAM_IDLE_SECONDS", "60"))
+
+@lru_cache(maxsize=2)
+def _age_bonus(index: KnowledgeIndex) -> Tuple[Dict[int, float], Dict[int, float]]:
+    """Bonificaciones por edad (> 60, < 40) indexadas por id de categoría del índice"""
+    names = index.category_names
+    return ({category_id: AGE_BONUS_SENIOR[name] for category_id, name in enumerate(names) if name in AGE_BONUS_SENIOR},
+            {category_id: AGE_BONUS_YOUNG[name] for category_id, name in enumerate(names) if name in AGE_BONUS_YOUNG})
+
+@lru_cache(maxsize=6)
+def _bonus_ranking(index: KnowledgeIndex, group: int) -> List[Tuple[float, Sequence[int]]]:
+    """Códigos agrupados por bonificación de edad (0: > 60, 1: < 40, 2: ninguna),
+    de mayor a menor bonificación y en orden de declaración dentro de cada grupo"""
+    if group == 2:
+        return [(0, range(len(index.codes)))]
+    age_bonus = _age_bonus(index)[group]
+    groups: Dict[float, List[int]] = {}
+    for code_idx, category_id in enumerate(index.category_ids):
+        groups.setdefault(age_bonus.get(category_id, 0), []).append(code_idx)
+    return sorted(groups.items(), reverse=True)
+
+def _best_uncovered(ranking: List[Tuple[float, Sequence[int]]], candidates: Set[int]) -> Tuple[float, int]:
+    """Primer código sin coincidencias con la mayor bonificación de edad: (bonificación, posición)"""
+    for bonus, code_indices in ranking:
+        for code_idx in code_indices:
+            if code_idx not in candidates:
+                return bonus, code_idx
+    return 0, -1
+
+def _explain_code(index: KnowledgeIndex, code_idx: int, text_hits: Dict[int, Tuple[Sequence[int], Sequence[int]]],
+                  user_hits: List[Tuple[Dict, Dict]]) -> Tuple[List[str], List[str]]:
+    """Síntomas y keywords que justifican un código (solo con explain)"""
+    matched_symptoms: List[str] = []
+    matched_keywords: List[str] = []
+    keywords = index.keywords[code_idx]
+    symptom_patterns = index.symptoms[code_idx]
+    hits = text_hits.get(code_idx)
+    if hits is not None:
+        keyword_slots, symptom_slots = hits
+        matched_keywords.extend(keywords[slot] for slot in keyword_slots)
+        matched_symptoms.extend(symptom_patterns[slot] for slot in symptom_slots)
+    for keyword_hits, word_hits in user_hits:
+        hits = keyword_hits.get(code_idx)
+        if hits is not None and hits[0]:
+            matched_keywords.extend(f"user: {keywords[slot]}" for slot in hits[0])
+        symptom_slots = word_hits.get(code_idx)
+        if symptom_slots is not None:
+            matched_symptoms.extend(f"user: {symptom_patterns[slot]}" for slot in symptom_slots)
+    return matched_symptoms, matched_keywords
+
+def match_symptoms(index: KnowledgeIndex, symptoms: List[str]) -> List[Tuple[Dict, Dict]]:
+    """Coincidencias de los síntomas del usuario (keywords y palabras de síntomas)"""
+    symptom_tokens = [index.tokenize(s) for s in symptoms if s.strip()]
+    return [(index.scan(tokens), index.scan_symptom_words(tokens)) for tokens in symptom_tokens]
+
+def retrieve_codes(index: KnowledgeIndex, text: str, classifier: str) -> Optional[Dict[int, float]]:
+    """Códigos más parecidos a la nota {código: similitud}; None si la recuperación está desactivada"""
+    retrieval = RETRIEVAL_INDEX
+    if retrieval is None or retrieval.version != index.version:
+        # Desactivada, o recarga en curso: el índice publicado aún no es el de esta versión
+        return None
+    stage_start = time.perf_counter()
+    retrieved = {code_idx: similarity for code_idx, similarity in retrieval.search(retrieval.encode(text), RETRIEVAL_TOP_K)
+                 if similarity >= RETRIEVAL_MIN_SIMILARITY}
+    observe_stage(time.perf_counter() - stage_start, classifier, "retrieval")
+    return retrieved
+
+def classify_medical_enhanced(text: str, age: int, symptoms: List[str], explain: bool = False) -> Dict[str, Any]:
+    """Clasificación médica usando Clinical ModernBERT con análisis semántico avanzado.
     
-    text_lower = text.lower()
-    symptoms_lower = [s.lower() for s in symptoms if s.strip()]
+    La puntuación usa solo el número de coincidencias; con explain=True se
+    añade "explanation" con los síntomas y keywords del código elegido.
+    """
     
-    best_match = None
-    best_score = 0
-    best_confidence = 0
-    matched_symptoms = []
-    matched_keywords = []
+    index = KNOWLEDGE_INDEX
+    stage_start = time.perf_counter()
+    
+    # Normalización y tokenización una sola vez; una pasada del autómata sobre
+    # los tokens de la nota para todos los códigos
+    text_hits = index.scan(index.tokenize(text))
+    user_hits = match_symptoms(index, symptoms)
+    observe_stage(time.perf_counter() - stage_start, "single", "pattern_matching")
+    retrieved = retrieve_codes(index, text, "single")
+    return score_matches(index, text_hits, user_hits, len(text), age, explain, "single", retrieved)
+
+def score_matches(index: KnowledgeIndex, text_hits: Dict[int, Tuple[Sequence[int], Sequence[int]]],
+                  user_hits: List[Tuple[Dict, Dict]], text_length: int, age: int, explain: bool,
+                  classifier: str, retrieved: Optional[Dict[int, float]] = None) -> Dict[str, Any]:
+    """Puntuación, código elegido y alternativas a partir de las coincidencias de la nota y los síntomas.
+    
+    retrieved son los códigos de retrieve_codes (None sin recuperación).
+    """
+    matched_at = time.perf_counter()
+    similar = retrieved or {}
+    
+    # Candidatos: solo los códigos con alguna coincidencia en la nota o en los
+    # síntomas, o recuperados por similitud, se puntúan por completo
+    candidates = set(text_hits)
+    for keyword_hits, word_hits in user_hits:
+        candidates.update(keyword_hits)
+        candidates.update(word_hits)
+    candidates.update(similar)
+    
+    # Bonificación demográfica (edad) por categoría del índice
+    age_group = 0 if age > 60 else 1 if age < 40 else 2
+    age_bonus = _age_bonus(index)[age_group] if age_group < 2 else {}
+    category_ids = index.category_ids
+    long_text = text_length > 100
     
-    # Análisis semántico avanzado por categoría
-    for icd10_code, knowledge in MEDICAL_KNOWLEDGE_BASE.items():
+    # Análisis semántico avanzado de los códigos candidatos (solo conteos)
+    scored: Dict[int, float] = {}
+    for code_idx in candidates:
         score = 0
-        local_symptoms = []
-        local_keywords = []
         
-        # Análisis de keywords con ponderación
-        for keyword in knowledge["keywords"]:
-            if keyword in text_lower:
-                score += 2  # Mayor peso para keywords exactas
-                local_keywords.append(keyword)
-        
-        # Análisis de síntomas específicos
-        for symptom_pattern in knowledge["symptoms"]:
-            if symptom_pattern in text_lower:
-                score += 3  # Aún mayor peso para síntomas específicos
-                local_symptoms.append(symptom_pattern)
+        # Análisis de keywords (peso 2) y síntomas específicos (peso 3) en el texto
+        hits = text_hits.get(code_idx)
+        if hits is not None:
+            score += 2 * len(hits[0]) + 3 * len(hits[1])
         
         # Verificar síntomas del usuario
-        for user_symptom in symptoms_lower:
-            for keyword in knowledge["keywords"]:
-                if keyword in user_symptom:
-                    score += 1.5
-                    local_keywords.append(f"user: {keyword}")
-            for symptom_pattern in knowledge["symptoms"]:
-                if any(word in user_symptom for word in symptom_pattern.split()):
-                    score += 2.5
-                    local_symptoms.append(f"user: {symptom_pattern}")
+        for keyword_hits, word_hits in user_hits:
+            hits = keyword_hits.get(code_idx)
+            if hits is not None and hits[0]:
+                score += 1.5 * len(hits[0])
+            symptom_slots = word_hits.get(code_idx)
+            if symptom_slots is not None:
+                score += 2.5 * len(symptom_slots)
+        
+        # Similitud con la nota (recuperación aproximada)
+        if code_idx in similar:
+            score += RETRIEVAL_SCORE_WEIGHT * similar[code_idx]
         
         # Factores demográficos (edad)
-        if age > 60:
-            if knowledge["category"] == "cardiovascular":
-                score += 1.5
-            elif knowledge["category"] == "endocrino":
-                score += 1.2
-        elif age < 40:
-            if knowledge["category"] == "musculoesquelético":
-                score += 0.8
+        category_id = category_ids[code_idx]
+        if category_id in age_bonus:
+            score += age_bonus[category_id]
         
         # Factores de presentación clínica
-        if len(text_lower) > 100:  # Descripción detallada
+        if long_text:  # Descripción detallada
             score += 0.5
         
-        if score > best_score:
-            best_score = score
-            best_match = icd10_code
-            best_confidence = knowledge["confidence"]
-            matched_symptoms = local_symptoms
-            matched_keywords = local_keywords
+        scored[code_idx] = score
+    
+    # El resto de códigos solo suma bonificaciones; basta con el primero de
+    # la mayor bonificación que no sea candidato
+    ranking = [(-score, code_idx) for code_idx, score in scored.items()]
+    bonus, uncovered_idx = _best_uncovered(_bonus_ranking(index, age_group), candidates)
+    if uncovered_idx >= 0:
+        score = 0
+        if bonus:
+            score += bonus
+        if long_text:
+            score += 0.5
+        ranking.append((-score, uncovered_idx))
+    
+    # Mayor puntuación; en empate, el primero en orden de declaración
+    best_match = None
+    best_idx = -1
+    best_score = 0
+    best_confidence = 0
+    if ranking:
+        neg_score, code_idx = min(ranking)
+        if -neg_score > 0:
+            best_score = -neg_score
+            best_idx = code_idx
+            best_match = index.codes[code_idx]
+            best_confidence = index.confidences[code_idx]
     
     # Si no hay coincidencias suficientes, usar códigos genéricos
     if best_match is None or best_score < 1:
+        best_idx = -1
         if age > 65:
             best_match = "Z00.1"
             description = "Examen de rutina del adulto"
@@ -218,51 +528,416 @@ def classify_medical_enhanced(text: str, age: int, symptoms: List[str]) -> Dict[
             description = "Examen médico general"
             best_confidence = 0.55
     else:
-        description = MEDICAL_KNOWLEDGE_BASE[best_match]["description"]
+        description = index.descriptions[best_idx]
+    scored_at = time.perf_counter()
     
-    # Generar códigos alternativos más inteligentes
-    alternative_codes = []
-    for icd10_code, knowledge in MEDICAL_KNOWLEDGE_BASE.items():
-        if icd10_code != best_match:
-            alt_score = 0
-            for keyword in knowledge["keywords"]:
-                if keyword in text_lower:
-                    alt_score += 1
-            for symptom in knowledge["symptoms"]:
-                if symptom in text_lower:
-                    alt_score += 1.5
-            
+    # Generar códigos alternativos reutilizando las coincidencias de la misma
+    # pasada: top 3 por relevancia con un heap (empates en orden de declaración)
+    relevance = []
+    for code_idx, (keyword_slots, symptom_slots) in text_hits.items():
+        if code_idx != best_idx:
+            alt_score = len(keyword_slots) + 1.5 * len(symptom_slots)
+            if code_idx in similar:
+                alt_score += RETRIEVAL_RELEVANCE_WEIGHT * similar[code_idx]
             if alt_score > 0.5:
-                alternative_codes.append({
-                    "code": icd10_code,
-                    "description": knowledge["description"],
-                    "confidence": min(knowledge["confidence"] * 0.8, 0.85),
-                    "category": knowledge["category"],
-                    "relevance_score": alt_score
-                })
+                relevance.append((-alt_score, code_idx))
+    for code_idx, similarity in similar.items():
+        if code_idx != best_idx and code_idx not in text_hits:
+            alt_score = RETRIEVAL_RELEVANCE_WEIGHT * similarity
+            if alt_score > 0.5:
+                relevance.append((-alt_score, code_idx))
+    
+    alternative_codes = []
+    for neg_score, code_idx in heapq.nsmallest(3, relevance):
+        alternative_codes.append({
+            "code": index.codes[code_idx],
+            "description": index.descriptions[code_idx],
+            "confidence": min(index.confidences[code_idx] * 0.8, 0.85),
+            "category": index.category_names[index.category_ids[code_idx]],
+            "relevance_score": -neg_score
+        })
     
-    # Ordenar códigos alternativos por relevancia
-    alternative_codes.sort(key=lambda x: x["relevance_score"], reverse=True)
+    finished_at = time.perf_counter()
+    observe_stage(scored_at - matched_at, classifier, "scoring")
+    observe_stage(finished_at - scored_at, classifier, "alternatives")
     
-    return {
+    result = {
         "icd10_code": best_match,
         "description": description,
         "confidence": min(best_confidence + (best_score * 0.02), 0.98),  # Ajuste dinámico de confianza
-        "alternative_codes": alternative_codes[:3],  # Top 3 alternativas
-        "analysis_score": best_score,
-        "matched_symptoms": matched_symptoms,
-        "matched_keywords": matched_keywords,
-        "algorithm_version": "Clinical ModernBERT v2.0",
-        "category": MEDICAL_KNOWLEDGE_BASE[best_match]["category"] if best_match in MEDICAL_KNOWLEDGE_BASE else "general"
+        "alternative_codes": alternative_codes,  # Top 3 alternativas
+        "kb_version": index.version
     }
+    if explain:
+        matched_symptoms, matched_keywords = (_explain_code(index, best_idx, text_hits, user_hits)
+                                              if best_idx in scored else ([], []))
+        result["explanation"] = {
+            "analysis_score": best_score,
+            "matched_symptoms": matched_symptoms,
+            "matched_keywords": matched_keywords,
+            "algorithm_version": "Clinical ModernBERT v2.0",
+            "category": index.category_names[index.category_ids[best_idx]] if best_idx >= 0 else "general"
+        }
+        if retrieved is not None:
+            result["explanation"]["retrieval_similarity"] = similar.get(best_idx, 0.0)
+    return result
+
+@lru_cache(maxsize=2)
+def _batch_tables(index: KnowledgeIndex) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Vectores por código: confianza base y bonificaciones por edad"""
+    category_ids = np.asarray(index.category_ids, dtype=np.intp)
+    confidences = np.asarray(index.confidences, dtype=float)
+    senior_bonus = np.array([AGE_BONUS_SENIOR.get(name, 0.0) for name in index.category_names])[category_ids]
+    young_bonus = np.array([AGE_BONUS_YOUNG.get(name, 0.0) for name in index.category_names])[category_ids]
+    return confidences, senior_bonus, young_bonus
+
+def classify_medical_batch(items: List[Tuple[str, int, List[str]]]) -> List[Dict[str, Any]]:
+    """Clasificación vectorizada de un lote de notas.
+    
+    Cada nota se recorre una vez con el índice; las coincidencias (y los
+    códigos recuperados por similitud) forman una matriz dispersa nota × código
+    (formato COO) que se acumula con NumPy junto con las bonificaciones por
+    edad y longitud. Produce los mismos códigos,
+    confianzas y alternativas que classify_medical_enhanced.
+    """
+    index = KNOWLEDGE_INDEX
+    n_codes = len(index.codes)
+    confidences, senior_bonus, young_bonus = _batch_tables(index)
+    chunk_size = max(1, BATCH_SCORING_CELLS // max(n_codes, 1))
+    results = []
+    
+    for chunk_start in range(0, len(items), chunk_size):
+        stage_start = time.perf_counter()
+        chunk = items[chunk_start:chunk_start + chunk_size]
+        rows, cols, weights, alt_weights = [], [], [], []
+        ages = np.empty(len(chunk))
+        long_text = np.empty(len(chunk), dtype=bool)
+        
+        # Matriz de coincidencias: una entrada (nota, código, peso) por código con hits
+        for row, (text, age, symptoms) in enumerate(chunk):
+            ages[row] = age
+            long_text[row] = len(text) > 100
+            for code_idx, (keyword_slots, symptom_slots) in index.scan(index.tokenize(text)).items():
+                rows.append(row)
+                cols.append(code_idx)
+                weights.append(2 * len(keyword_slots) + 3 * len(symptom_slots))
+                alt_weights.append(len(keyword_slots) + 1.5 * len(symptom_slots))
+            for symptom in symptoms:
+                if not symptom.strip():
+                    continue
+                user_symptom = index.tokenize(symptom)
+                for code_idx, (keyword_slots, _) in index.scan(user_symptom).items():
+                    if keyword_slots:
+                        rows.append(row)
+                        cols.append(code_idx)
+                        weights.append(1.5 * len(keyword_slots))
+                        alt_weights.append(0.0)
+                for code_idx, symptom_slots in index.scan_symptom_words(user_symptom).items():
+                    rows.append(row)
+                    cols.append(code_idx)
+                    weights.append(2.5 * len(symptom_slots))
+                    alt_weights.append(0.0)
+            for code_idx, similarity in (retrieve_codes(index, text, "batch") or {}).items():
+                rows.append(row)
+                cols.append(code_idx)
+                weights.append(RETRIEVAL_SCORE_WEIGHT * similarity)
+                alt_weights.append(RETRIEVAL_RELEVANCE_WEIGHT * similarity)
+        
+        matched_at = time.perf_counter()
+        scores = np.zeros((len(chunk), n_codes))
+        alt_scores = np.zeros((len(chunk), n_codes))
+        np.add.at(scores, (rows, cols), weights)
+        np.add.at(alt_scores, (rows, cols), alt_weights)
+        
+        # Factores demográficos y de presentación clínica
+        scores += np.where((ages > 60)[:, None], senior_bonus,
+                           np.where((ages < 40)[:, None], young_bonus, 0.0))
+        scores += np.where(long_text, 0.5, 0.0)[:, None]
+        
+        # Mejor código (argmax devuelve el primero en caso de empate) y fallback genérico
+        best_idx = scores.argmax(axis=1)
+        best_scores = scores[np.arange(len(chunk)), best_idx]
+        fallback = best_scores < 1
+        base_confidence = np.where(fallback, np.where(ages > 65, 0.60, 0.55), confidences[best_idx])
+        final_confidence = np.minimum(base_confidence + best_scores * 0.02, 0.98)
+        scored_at = time.perf_counter()
+        
+        for row in range(len(chunk)):
+            if fallback[row]:
+                best_match = "Z00.1" if ages[row] > 65 else "Z00.0"
+                description = "Examen de rutina del adulto" if ages[row] > 65 else "Examen médico general"
+                category = "general"
+                excluded = -1
+            else:
+                excluded = int(best_idx[row])
+                best_match = index.codes[excluded]
+                description = index.descriptions[excluded]
+                category = index.category_names[index.category_ids[excluded]]
+            
+            # Alternativas: relevancia > 0.5, orden estable por relevancia, top 3
+            candidates = np.flatnonzero(alt_scores[row] > 0.5)
+            candidates = candidates[candidates != excluded]
+            order = np.argsort(-alt_scores[row, candidates], kind="stable")[:3]
+            alternative_codes = []
+            for code_idx in candidates[order].tolist():
+                alternative_codes.append({
+                    "code": index.codes[code_idx],
+                    "description": index.descriptions[code_idx],
+                    "confidence": min(index.confidences[code_idx] * 0.8, 0.85),
+                    "category": index.category_names[index.category_ids[code_idx]],
+                    "relevance_score": float(alt_scores[row, code_idx])
+                })
+            
+            results.append({
+                "icd10_code": best_match,
+                "description": description,
+                "confidence": float(final_confidence[row]),
+                "alternative_codes": alternative_codes,
+                "analysis_score": float(best_scores[row]),
+                "algorithm_version": "Clinical ModernBERT v2.0",
+                "category": category,
+                "kb_version": index.version
+            })
+        
+        observe_stage(matched_at - stage_start, "batch", "pattern_matching")
+        observe_stage(scored_at - matched_at, "batch", "scoring")
+        observe_stage(time.perf_counter() - scored_at, "batch", "alternatives")
+    
+    return results
+
+# Motivos de rechazo de la validación: clave (etiqueta de métrica) → mensaje
+VALIDATION_MESSAGES = {
+    "invalid_request": "Petición inválida",
+    "text_required": "Texto de diagnóstico requerido",
+    "text_too_short": "Texto de diagnóstico demasiado corto (mínimo 10 caracteres)",
+    "text_too_long": "Texto de diagnóstico demasiado largo (máximo 2000 caracteres)",
+    "age_negative": "La edad no puede ser negativa",
+    "age_too_high": "La edad excede el límite máximo",
+    "too_many_symptoms": "Demasiados síntomas (máximo 20)",
+    "invalid_session_id": "Identificador de sesión inválido (8 a 64 caracteres: letras, dígitos, '-' o '_')",
+    "invalid_edit": "Cambio fuera del texto de la sesión"
+}
+
+def validate_medical_request(request: MedicalRequest) -> Optional[str]:
+    """Valida una petición de clasificación; devuelve el motivo del rechazo o None"""
+    text = request.text.strip() if request.text else ""
+    
+    if not text:
+        return "text_required"
+    
+    if len(text) < 10:
+        return "text_too_short"
+    
+    if len(text) > 2000:
+        return "text_too_long"
+    
+    return validate_patient(request.patient_age, request.symptoms)
+
+def validate_patient(age: int, symptoms: List[str]) -> Optional[str]:
+    """Valida la edad y los síntomas del paciente"""
+    # Validar edad
+    if age < 0:
+        return "age_negative"
+    
+    if age > 150:
+        return "age_too_high"
+    
+    # Validar síntomas
+    if symptoms and len(symptoms) > 20:
+        return "too_many_symptoms"
+    
+    return None
+
+def validate_session(session_id: str, text_length: int, age: int, symptoms: List[str]) -> Optional[str]:
+    """Como validate_medical_request, pero una nota en edición puede estar vacía o ser corta"""
+    if not SESSION_ID_RE.fullmatch(session_id):
+        return "invalid_session_id"
+    
+    if text_length > SESSION_MAX_TEXT_LENGTH:
+        return "text_too_long"
+    
+    return validate_patient(age, symptoms)
+
+# Motivos de rechazo del control de admisión: clave (etiqueta de métrica) → mensaje
+ADMISSION_MESSAGES = {
+    "rate_limited": "Límite de peticiones del tenant excedido",
+    "queue_full": "Servicio saturado, reintente más tarde",
+    "deadline": "La petición no puede completarse antes de su deadline"
+}
+
+class RequestAdmission(NamedTuple):
+    lane: str
+    deadline: Optional[float]
+
+def admission_error(endpoint: str, lane: str, error: AdmissionRejected) -> HTTPException:
+    """429 por límite de tasa, 503 por cola llena o deadline inalcanzable"""
+    ADMISSION_SHED.inc(endpoint, lane, error.reason)
+    return HTTPException(status_code=429 if error.reason == "rate_limited" else 503,
+                         detail=ADMISSION_MESSAGES[error.reason],
+                         headers={"Retry-After": str(math.ceil(error.retry_after))})
+
+def admit_request(http_request: Request, endpoint: str, default_lane: str, cost: float = 1) -> RequestAdmission:
+    """Aplica el límite de tasa del tenant y lee el carril (X-Priority) y X-Request-Deadline"""
+    headers = http_request.headers
+    lane = parse_lane(headers.get("x-priority"), default_lane)
+    tenant = tenant_id(headers.get("x-tenant-id"), headers.get("x-api-key"),
+                       http_request.client.host if http_request.client else None)
+    try:
+        RATE_LIMITER.check(tenant, cost)
+    except AdmissionRejected as e:
+        raise admission_error(endpoint, lane, e)
+    return RequestAdmission(lane, parse_deadline(headers.get("x-request-deadline"), time.monotonic()))
+
+# Duraciones de etapa pendientes de enviar al proceso padre (solo en los procesos del pool)
+_STAGE_BUFFER: Optional[List[Tuple[float, str, str]]] = None
+
+def observe_stage(seconds: float, classifier: str, stage: str) -> None:
+    """Duración de una etapa del clasificador; en el pool se acumula y la registra el padre"""
+    if _STAGE_BUFFER is not None:
+        _STAGE_BUFFER.append((seconds, classifier, stage))
+    else:
+        STAGE_LATENCY.observe(seconds, classifier, stage)
+
+def call_with_stages(func, *args) -> Tuple[Any, List[Tuple[float, str, str]]]:
+    """Ejecuta el clasificador en un proceso del pool: (resultado, duraciones de etapa)"""
+    global _STAGE_BUFFER
+    _STAGE_BUFFER = []
+    try:
+        return func(*args), _STAGE_BUFFER
+    finally:
+        _STAGE_BUFFER = None
+
+async def run_classifier(endpoint: str, admission: RequestAdmission, func, *args):
+    """Ejecuta el clasificador en un slot de admisión, en el pool de procesos (modo pool) o en línea"""
+    try:
+        async with ADMISSION.slot(admission.lane, admission.deadline):
+            if CLASSIFIER_POOL is None:
+                return func(*args)
+            # Las métricas del proceso hijo no llegan a /metrics: las etapas vuelven con el resultado
+            result, stages = await CLASSIFIER_POOL.submit(call_with_stages, func, *args)
+            for seconds, classifier, stage in stages:
+                STAGE_LATENCY.observe(seconds, classifier, stage)
+            return result
+    except AdmissionRejected as e:
+        raise admission_error(endpoint, admission.lane, e)
+    except PoolSaturated:
+        POOL_REJECTED.inc(endpoint)
+        raise HTTPException(status_code=503, detail="Servicio saturado, reintente más tarde",
+                            headers={"Retry-After": RETRY_AFTER_SECONDS})
+
+def publish_knowledge_index(index: KnowledgeIndex) -> None:
+    """Publica un índice recién compilado (se llama desde el hilo del watcher).
+    
+    En modo pool los procesos existentes conservan el índice anterior: el
+    event loop forkea un pool nuevo que hereda el índice publicado y drena el
+    anterior, de modo que las tareas en curso terminan con su versión. El
+    watcher solo compila; nunca forkea desde su hilo.
+    """
+    global KNOWLEDGE_INDEX, RETRIEVAL_INDEX
+    # El índice de recuperación se publica antes: hasta el cambio de KNOWLEDGE_INDEX
+    # las clasificaciones lo ignoran por su versión
+    RETRIEVAL_INDEX = load_retrieval_index(index)
+    KNOWLEDGE_INDEX = index
+    RULES_RELOADS.inc()
+    if CLASSIFIER_POOL is not None:
+        asyncio.run_coroutine_threadsafe(replace_pool(), EVENT_LOOP)
+
+async def replace_pool() -> None:
+    """Sustituye el pool por uno forkeado desde el event loop y drena el anterior"""
+    global CLASSIFIER_POOL
+    if CLASSIFIER_POOL is None:
+        return
+    pool = ClassifierPool(POOL_WORKERS, POOL_QUEUE_SIZE)
+    await pool.start()
+    previous, CLASSIFIER_POOL = CLASSIFIER_POOL, pool
+    await previous.drain(DRAIN_TIMEOUT_SECONDS)
+
+# Nota de calentamiento: keywords y síntomas de varias categorías
+WARMUP_NOTE = "Paciente con dolor torácico, sudoración y disnea; diabetes con glucosa elevada y tos con fiebre"
+WARMUP_SYMPTOMS = ["fatiga", "náuseas"]
+
+def warm_up() -> None:
+    """Recorre una vez cada camino de clasificación antes de recibir tráfico.
+    
+    Construye las tablas perezosas (bonificaciones por edad de los tres
+    grupos, tablas del lote, síntomas del usuario) y hace la primera
+    validación y serialización de los modelos de petición y respuesta, que de
+    otro modo pagarían las primeras peticiones del pod.
+    """
+    MedicalRequest.model_validate_json(dumps({"text": WARMUP_NOTE, "patient_age": 70, "symptoms": WARMUP_SYMPTOMS}))
+    items = [(WARMUP_NOTE, age, WARMUP_SYMPTOMS) for age in (30, 50, 70)]
+    for text, age, symptoms in items:
+        FastJSONResponse(classify_medical_enhanced(text, age, symptoms, explain=True))
+    for position, result in enumerate(classify_medical_batch(items)):
+        MedicalBatchItem(index=position, result=MedicalResponse(
+            icd10_code=result["icd10_code"], description=result["description"], confidence=result["confidence"],
+            model_version=versioned_model(result["kb_version"]), processing_time_ms=0.0,
+            alternative_codes=result["alternative_codes"]
+        )).model_dump()
+    session = NoteSession(KNOWLEDGE_INDEX, WARMUP_NOTE)
+    set_session_patient(session, 70, WARMUP_SYMPTOMS)
+    session.apply(len(WARMUP_NOTE), len(WARMUP_NOTE), " y cefalea")
+    FastJSONResponse(classify_session(session, True, time.perf_counter()))
+
+async def warm_start() -> None:
+    """Calienta el servicio fuera del event loop y arranca el pool; después /ready responde 200.
+    
+    Mientras tanto /health (liveness) ya responde. En modo pool los procesos
+    se forkean tras el calentamiento y heredan las tablas ya construidas.
+    """
+    global model_loaded, CLASSIFIER_POOL
+    loop = asyncio.get_running_loop()
+    try:
+        phase_start = time.perf_counter()
+        await loop.run_in_executor(None, warm_up)
+        STARTUP_PHASES["warmup"] = time.perf_counter() - phase_start
+        if SERVING_MODE == "pool":
+            phase_start = time.perf_counter()
+            pool = ClassifierPool(POOL_WORKERS, POOL_QUEUE_SIZE)
+            await pool.start()
+            CLASSIFIER_POOL = pool
+            STARTUP_PHASES["pool"] = time.perf_counter() - phase_start
+    except Exception as e:
+        # Sin calentamiento completo el pod no se declara listo
+        logger.error(f"Error en el calentamiento del servicio: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return
+    model_loaded = True
+    logger.info("Servicio listo para recibir peticiones - "
+                + ", ".join(f"{phase}: {seconds * 1000:.0f}ms" for phase, seconds in STARTUP_PHASES.items()))
 
 @app.on_event("startup")
 async def startup_event():
-    """Evento de inicio de la aplicación"""
+    """Evento de inicio de la aplicación: el calentamiento sigue en segundo plano (ver /ready)"""
     logger.info("Iniciando servicio de clasificación médica...")
-    global model_loaded
-    model_loaded = True
-    logger.info("Servicio listo para recibir peticiones")
+    global RULES_WATCHER, EVENT_LOOP, WARMUP_TASK
+    EVENT_LOOP = asyncio.get_running_loop()
+    if KNOWLEDGE_BASE_PATH and RULES_RELOAD_INTERVAL_SECONDS > 0:
+        RULES_WATCHER = RuleSetWatcher(KNOWLEDGE_BASE_PATH, load_knowledge_index, publish_knowledge_index,
+                                       KNOWLEDGE_INDEX.version, RULES_RELOAD_INTERVAL_SECONDS)
+        RULES_WATCHER.start()
+    logger.info(f"Base de conocimiento - Versión: {KNOWLEDGE_INDEX.version}, Códigos: {len(KNOWLEDGE_INDEX.codes)}, "
+                f"Origen: {KNOWLEDGE_BASE_PATH or 'integrada'}")
+    if RETRIEVAL_INDEX is not None:
+        logger.info(f"Recuperación por similitud - Listas: {RETRIEVAL_INDEX.nlist}, Dimensión: {RETRIEVAL_INDEX.dim}, "
+                    f"nprobe: {RETRIEVAL_INDEX.nprobe}, Top-k: {RETRIEVAL_TOP_K}")
+    WARMUP_TASK = asyncio.create_task(warm_start())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Evento de parada: detener la recarga de reglas, drenar el pool y vaciar la cola de logs"""
+    logger.info("Deteniendo servicio de clasificación médica...")
+    global model_loaded, CLASSIFIER_POOL
+    model_loaded = False
+    if WARMUP_TASK is not None:
+        # Un pool a medio arrancar también se drena
+        await WARMUP_TASK
+    if RULES_WATCHER is not None:
+        RULES_WATCHER.stop()
+    if CLASSIFIER_POOL is not None:
+        await CLASSIFIER_POOL.drain(DRAIN_TIMEOUT_SECONDS)
+        CLASSIFIER_POOL = None
+    shutdown_logging()
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
@@ -270,63 +945,412 @@ async def health_check():
     return HealthResponse(
         status="healthy",
         model_loaded=model_loaded,
-        model_version=model_version
+        model_version=versioned_model(KNOWLEDGE_INDEX.version)
     )
 
-@app.post("/predict", response_model=MedicalResponse)
-async def predict_medical_endpoint(request: MedicalRequest):
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 200 solo cuando el calentamiento ha terminado; 503 mientras tanto y al parar"""
+    return FastJSONResponse({
+        "ready": model_loaded,
+        "kb_version": KNOWLEDGE_INDEX.version,
+        "startup_seconds": STARTUP_PHASES
+    }, status_code=200 if model_loaded else 503)
+
+@app.post("/predict", response_model=MedicalExplainedResponse, openapi_extra=request_body_schema(MedicalRequest))
+async def predict_medical_endpoint(http_request: Request,
+                                   explain: bool = Query(False, description="Incluir la explicación para auditoría")):
     """Endpoint principal para clasificación médica"""
-    start_time = time.time()
+    start_time = time.perf_counter()
+    admission = admit_request(http_request, "/predict", INTERACTIVE)
+    request = await parse_body(http_request, MedicalRequest)
     
     try:
         # Validar entrada con más detalle
-        if not request.text or not request.text.strip():
-            raise HTTPException(status_code=400, detail="Texto de diagnóstico requerido")
+        reason = validate_medical_request(request)
+        if reason is not None:
+            VALIDATION_ERRORS.inc("/predict", reason)
+            raise HTTPException(status_code=400, detail=VALIDATION_MESSAGES[reason])
         
-        if len(request.text.strip()) < 10:
-            raise HTTPException(status_code=400, detail="Texto de diagnóstico demasiado corto (mínimo 10 caracteres)")
+        # Realizar clasificación (o reutilizar el resultado de una nota equivalente)
+        kb_version = KNOWLEDGE_INDEX.version
+        RESULT_CACHE.set_version(cache_version(kb_version))
+        cache_key = make_cache_key(request.text, request.patient_age, request.symptoms, surface=RETRIEVAL_ENABLED)
+        # La caché no guarda explicaciones: con explain se clasifica siempre
+        result = await RESULT_CACHE.get(cache_key) if not explain else None
+        cache_hit = result is not None
+        if not cache_hit:
+            result = await run_classifier("/predict", admission, classify_medical_enhanced,
+                                          request.text, request.patient_age, request.symptoms, explain)
+            # Durante una recarga el resultado puede venir de la versión anterior
+            if result["kb_version"] == kb_version:
+                await RESULT_CACHE.set(cache_key, {field: result[field] for field in CACHED_FIELDS})
         
-        if len(request.text.strip()) > 2000:
-            raise HTTPException(status_code=400, detail="Texto de diagnóstico demasiado largo (máximo 2000 caracteres)")
+        # Calcular tiempo de procesamiento
+        processing_time = (time.perf_counter() - start_time) * 1000
         
-        # Validar edad
-        if request.patient_age < 0:
-            raise HTTPException(status_code=400, detail="La edad no puede ser negativa")
+        # Un único registro por petición, sin el texto de la nota (datos clínicos)
+        if predict_logger.isEnabledFor(logging.INFO):
+            predict_logger.info("Clasificación completada", extra={"fields": {
+                "processing_time_ms": round(processing_time, 3),
+                "icd10_code": result["icd10_code"],
+                "confidence": round(result["confidence"], 3),
+                "text_length": len(request.text),
+                "patient_age": request.patient_age,
+                "symptoms": len(request.symptoms),
+                "cache_hit": cache_hit
+            }})
         
-        if request.patient_age > 150:
-            raise HTTPException(status_code=400, detail="La edad excede el límite máximo")
+        # Respuesta ya serializada: sin revalidar MedicalResponse ni copiar alternative_codes
+        response = {
+            "icd10_code": result["icd10_code"],
+            "description": result["description"],
+            "confidence": float(result["confidence"]),
+            "model_version": versioned_model(result.get("kb_version", kb_version)),
+            "processing_time_ms": processing_time,
+            "alternative_codes": result["alternative_codes"]
+        }
+        if explain:
+            response["explanation"] = result["explanation"]
+        return FastJSONResponse(response)
         
-        # Validar síntomas
-        if request.symptoms and len(request.symptoms) > 20:
-            raise HTTPException(status_code=400, detail="Demasiados síntomas (máximo 20)")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error inesperado en clasificación: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
+@app.post("/predict/batch", response_model=List[MedicalBatchItem])
+async def predict_medical_batch_endpoint(items: List[Any], http_request: Request):
+    """Clasificación por lotes; los errores de validación (también elementos que no son objetos) se reportan por elemento"""
+    start_time = time.perf_counter()
+    
+    if not items:
+        raise HTTPException(status_code=400, detail="El lote no contiene peticiones")
+    
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Lote demasiado grande (máximo {BATCH_MAX_ITEMS} peticiones)")
+    
+    # Cada elemento del lote consume un token del tenant
+    admission = admit_request(http_request, "/predict/batch", BATCH, cost=len(items))
+    
+    try:
+        responses: List[Optional[MedicalBatchItem]] = [None] * len(items)
+        valid: List[Tuple[int, MedicalRequest]] = []
         
-        # Log de la petición
-        logger.info(f"Clasificación solicitada - Texto: {request.text[:50]}..., Edad: {request.patient_age}, Síntomas: {len(request.symptoms)}")
+        for position, item in enumerate(items):
+            try:
+                request = MedicalRequest.model_validate(item)
+            except ValidationError as e:
+                detail = "; ".join(f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" if err["loc"] else err["msg"]
+                                   for err in e.errors())
+                VALIDATION_ERRORS.inc("/predict/batch", "invalid_request")
+                responses[position] = MedicalBatchItem(index=position, error=f"{VALIDATION_MESSAGES['invalid_request']} - {detail}")
+                continue
+            
+            reason = validate_medical_request(request)
+            if reason is not None:
+                VALIDATION_ERRORS.inc("/predict/batch", reason)
+                responses[position] = MedicalBatchItem(index=position, error=VALIDATION_MESSAGES[reason])
+            else:
+                valid.append((position, request))
         
-        # Realizar clasificación
-        result = classify_medical_enhanced(request.text, request.patient_age, request.symptoms)
+        # Clasificación vectorizada de todas las peticiones válidas
+        results = await run_classifier("/predict/batch", admission, classify_medical_batch,
+                                       [(r.text, r.patient_age, r.symptoms) for _, r in valid])
         
-        # Calcular tiempo de procesamiento
-        processing_time = (time.time() - start_time) * 1000
+        # Tiempo de procesamiento amortizado por elemento del lote
+        processing_time = (time.perf_counter() - start_time) * 1000
+        per_item_time = processing_time / len(items)
         
-        logger.info(f"Clasificación completada en {processing_time:.2f}ms - Código: {result['icd10_code']}, Confianza: {result['confidence']:.3f}")
+        for (position, _), result in zip(valid, results):
+            responses[position] = MedicalBatchItem(
+                index=position,
+                result=MedicalResponse(
+                    icd10_code=result["icd10_code"],
+                    description=result["description"],
+                    confidence=result["confidence"],
+                    model_version=versioned_model(result["kb_version"]),
+                    processing_time_ms=per_item_time,
+                    alternative_codes=result["alternative_codes"]
+                )
+            )
         
-        return MedicalResponse(
-            icd10_code=result["icd10_code"],
-            description=result["description"],
-            confidence=result["confidence"],
-            model_version=model_version,
-            processing_time_ms=processing_time,
-            alternative_codes=result["alternative_codes"]
-        )
+        logger.info(f"Lote clasificado en {processing_time:.2f}ms - Peticiones: {len(items)}, Válidas: {len(valid)}")
+        
+        return responses
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error inesperado en clasificación: {str(e)}")
+        logger.error(f"Error inesperado en clasificación por lotes: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
+def set_session_patient(session: NoteSession, age: int, symptoms: List[str]) -> None:
+    session.patient_age = age
+    session.symptoms = symptoms
+    session.user_hits = match_symptoms(session.index, symptoms)
+
+def classify_session(session: NoteSession, explain: bool, start_time: float) -> Dict[str, Any]:
+    """Clasificación con las coincidencias acumuladas de la sesión, sin reescanear la nota"""
+    retrieved = retrieve_codes(session.index, session.text, "session")
+    result = score_matches(session.index, session.text_hits(), session.user_hits, len(session.text),
+                           session.patient_age, explain, "session", retrieved)
+    response = {
+        "icd10_code": result["icd10_code"],
+        "description": result["description"],
+        "confidence": float(result["confidence"]),
+        "model_version": versioned_model(result["kb_version"]),
+        "processing_time_ms": (time.perf_counter() - start_time) * 1000,
+        "alternative_codes": result["alternative_codes"]
+    }
+    if explain:
+        response["explanation"] = result["explanation"]
+    return response
+
+def session_owner(http_request: Request) -> str:
+    """Tenant dueño de una sesión (sin la IP: tras la pasarela sería la de su pod)"""
+    headers = http_request.headers
+    return tenant_id(headers.get("x-tenant-id"), headers.get("x-api-key"), None)
+
+def session_response(session_id: str, session: NoteSession, explain: bool, start_time: float) -> FastJSONResponse:
+    response = classify_session(session, explain, start_time)
+    response["session_id"] = session_id
+    response["revision"] = session.revision
+    return FastJSONResponse(response)
+
+@app.post("/sessions", response_model=MedicalSessionResponse, openapi_extra=request_body_schema(SessionOpenRequest))
+async def open_session_endpoint(http_request: Request,
+                                explain: bool = Query(False, description="Incluir la explicación para auditoría")):
+    """Abre (o reinicia) una sesión de clasificación incremental con la nota completa.
+    
+    409 si el id ya es de una sesión activa de otro tenant.
+    """
+    start_time = time.perf_counter()
+    admit_request(http_request, "/sessions", INTERACTIVE)
+    request = await parse_body(http_request, SessionOpenRequest)
+    
+    reason = validate_session(request.session_id, len(request.text), request.patient_age, request.symptoms)
+    if reason is not None:
+        VALIDATION_ERRORS.inc("/sessions", reason)
+        raise HTTPException(status_code=400, detail=VALIDATION_MESSAGES[reason])
+    
+    owner = session_owner(http_request)
+    current = SESSIONS.get(request.session_id)
+    if current is not None and current.owner != owner:
+        raise HTTPException(status_code=409, detail="Identificador de sesión en uso")
+    
+    try:
+        session = NoteSession(KNOWLEDGE_INDEX, request.text)
+        session.owner = owner
+        set_session_patient(session, request.patient_age, request.symptoms)
+        SESSIONS.put(request.session_id, session)
+        return session_response(request.session_id, session, explain, start_time)
+    except Exception as e:
+        logger.error(f"Error inesperado al abrir la sesión: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
+@app.post("/sessions/delta", response_model=MedicalSessionResponse, openapi_extra=request_body_schema(SessionDeltaRequest))
+async def session_delta_endpoint(http_request: Request,
+                                 explain: bool = Query(False, description="Incluir la explicación para auditoría")):
+    """Aplica cambios a la nota de una sesión y reclasifica reescaneando solo la zona editada.
+    
+    404 si la sesión no existe o expiró y 409 si revision no es la actual: el
+    cliente vuelve a abrirla con la nota completa.
+    """
+    start_time = time.perf_counter()
+    admit_request(http_request, "/sessions/delta", INTERACTIVE)
+    request = await parse_body(http_request, SessionDeltaRequest)
+    
+    session = SESSIONS.get(request.session_id)
+    if session is None or session.owner != session_owner(http_request):
+        raise HTTPException(status_code=404, detail="Sesión no encontrada o expirada")
+    if request.revision is not None and request.revision != session.revision:
+        raise HTTPException(status_code=409, detail=f"Revisión de la sesión desincronizada (actual: {session.revision})")
+    
+    edits = [(edit.start, edit.end, edit.text) for edit in request.edits]
+    age = session.patient_age if request.patient_age is None else request.patient_age
+    symptoms = session.symptoms if request.symptoms is None else request.symptoms
+    try:
+        text_length = edited_length(len(session.text), edits)
+    except ValueError:
+        reason = "invalid_edit"
+    else:
+        reason = validate_session(request.session_id, text_length, age, symptoms)
+    if reason is not None:
+        VALIDATION_ERRORS.inc("/sessions/delta", reason)
+        raise HTTPException(status_code=400, detail=VALIDATION_MESSAGES[reason])
+    
+    try:
+        index = KNOWLEDGE_INDEX
+        reload = session.index is not index
+        if reload:
+            # Base de conocimiento recargada: escaneo completo con la nueva versión
+            session.reset(index)
+        rescanned = 0
+        for start, end, text in edits:
+            rescanned += session.apply(start, end, text)
+        SESSION_TOKENS_RESCANNED.inc(amount=rescanned)
+        if reload or request.patient_age is not None or request.symptoms is not None:
+            set_session_patient(session, age, symptoms)
+        session.revision += 1
+        return session_response(request.session_id, session, explain, start_time)
+    except Exception as e:
+        logger.error(f"Error inesperado al aplicar cambios a la sesión: {str(e)}")
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
+async def send_stream_message(websocket: WebSocket, message: Dict[str, Any]) -> None:
+    await websocket.send_text(dumps(message).decode("utf-8"))
+
+@app.websocket("/stream/transcripts")
+async def transcript_stream_endpoint(websocket: WebSocket):
+    """Dictado en streaming: recibe transcripciones y devuelve códigos provisionales.
+    
+    Mensajes JSON: {"type": "start", "patient_age", "symptoms"} (opcional),
+    {"type": "partial" | "final", "text"} y {"type": "end"}; los frames
+    binarios van al transcriptor local. Se envía la clasificación cada vez que
+    cambia y la definitiva (final: true) al recibir "end".
+    """
+    headers = websocket.headers
+    tenant = tenant_id(headers.get("x-tenant-id"), headers.get("x-api-key"),
+                       websocket.client.host if websocket.client else None)
+    try:
+        RATE_LIMITER.check(tenant)
+    except AdmissionRejected as e:
+        ADMISSION_SHED.inc("/stream/transcripts", INTERACTIVE, e.reason)
+        await websocket.close(code=1013)  # Try Again Later
+        return
+    
+    await websocket.accept()
+    TRANSCRIPT_STREAMS.inc()
+    stream = TranscriptSession(KNOWLEDGE_INDEX, SESSION_MAX_TEXT_LENGTH)
+    set_session_patient(stream.note, 0, [])
+    transcriber = TRANSCRIBERS[STREAM_TRANSCRIBER]() if STREAM_TRANSCRIBER else None
+    last_pushed = None
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(websocket.receive(), STREAM_IDLE_SECONDS)
+            except asyncio.TimeoutError:
+                await websocket.close(code=1000, reason="Dictado inactivo")
+                return
+            if message["type"] == "websocket.disconnect":
+                return
+            start_time = time.perf_counter()
+            
+            finished = False
+            if message.get("bytes") is not None:
+                if transcriber is None:
+                    await send_stream_message(websocket, {"type": "error", "detail": "Sin transcriptor local: envíe texto"})
+                    continue
+                events = transcriber.feed(message["bytes"])
+            else:
+                try:
+                    request = TranscriptMessage.model_validate_json(message.get("text") or "")
+                except ValidationError as e:
+                    detail = "; ".join(f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" if err["loc"] else err["msg"]
+                                   for err in e.errors())
+                    await send_stream_message(websocket, {"type": "error",
+                                                          "detail": f"{VALIDATION_MESSAGES['invalid_request']} - {detail}"})
+                    continue
+                if request.type in ("partial", "final"):
+                    events = [TranscriptEvent(request.type == "final", request.text)]
+                elif request.type == "start":
+                    age = request.patient_age or 0
+                    symptoms = request.symptoms or []
+                    reason = validate_patient(age, symptoms)
+                    if reason is not None:
+                        await send_stream_message(websocket, {"type": "error", "detail": VALIDATION_MESSAGES[reason]})
+                        continue
+                    set_session_patient(stream.note, age, symptoms)
+                    events = []
+                elif request.type == "end":
+                    events = transcriber.flush() if transcriber is not None else []
+                    finished = True
+                else:
+                    await send_stream_message(websocket, {"type": "error", "detail": f"Tipo de mensaje desconocido: {request.type}"})
+                    continue
+            
+            note = stream.note
+            if note.index is not KNOWLEDGE_INDEX:
+                # Base de conocimiento recargada: escaneo completo con la nueva versión
+                note.reset(KNOWLEDGE_INDEX)
+                set_session_patient(note, note.patient_age, note.symptoms)
+            try:
+                for event in events:
+                    TRANSCRIPT_UPDATES.inc("final" if event.final else "partial")
+                    SESSION_TOKENS_RESCANNED.inc(amount=stream.update(event))
+            except ValueError:
+                VALIDATION_ERRORS.inc("/stream/transcripts", "text_too_long")
+                await send_stream_message(websocket, {"type": "error", "detail": VALIDATION_MESSAGES["text_too_long"]})
+                await websocket.close(code=1009)  # Message Too Big
+                return
+            
+            # Solo se envía cuando cambia el código, la confianza o las alternativas
+            result = classify_session(note, False, start_time)
+            pushed = (result["icd10_code"], result["confidence"], result["alternative_codes"])
+            if finished or pushed != last_pushed:
+                last_pushed = pushed
+                await send_stream_message(websocket, {"type": "classification", "final": finished,
+                                                      "transcript": note.text, **result})
+            if finished:
+                await websocket.close(code=1000)
+                return
+    except WebSocketDisconnect:
+        pass
+    finally:
+        TRANSCRIPT_STREAMS.dec()
+
+@app.post("/sessions/close")
+async def close_session_endpoint(request: SessionCloseRequest, http_request: Request):
+    """Cierra una sesión de clasificación incremental del tenant"""
+    session = SESSIONS.get(request.session_id)
+    closed = session is not None and session.owner == session_owner(http_request)
+    if closed:
+        SESSIONS.pop(request.session_id)
+    return {"session_id": request.session_id, "closed": closed}
+
+@app.get("/sessions/stats")
+async def sessions_stats():
+    """Sesiones abiertas, límites y expulsiones"""
+    return SESSIONS.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Métricas en formato de exposición de Prometheus"""
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/admission/stats")
+async def admission_stats():
+    """Estado del control de admisión: slots, colas por carril y límite por tenant"""
+    return {"admission": ADMISSION.stats(), "rate_limit": RATE_LIMITER.stats()}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Estadísticas de la caché de resultados"""
+    return RESULT_CACHE.stats()
+
+@app.get("/rules")
+async def rules_status():
+    """Versión activa de la base de conocimiento y estado de la recarga en caliente"""
+    return {
+        "version": KNOWLEDGE_INDEX.version,
+        "codes": len(KNOWLEDGE_INDEX.codes),
+        "source": KNOWLEDGE_BASE_PATH or "integrada",
+        "watcher": RULES_WATCHER.stats() if RULES_WATCHER is not None else None,
+        "retrieval": {
+            "version": RETRIEVAL_INDEX.version,
+            "lists": RETRIEVAL_INDEX.nlist,
+            "dimension": RETRIEVAL_INDEX.dim,
+            "nprobe": RETRIEVAL_INDEX.nprobe,
+            "top_k": RETRIEVAL_TOP_K
+        } if RETRIEVAL_INDEX is not None else None
+    }
+
 @app.get("/")
 async def root():
     """Endpoint raíz"""
@@ -335,15 +1359,36 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "health": "/health",
-            "predict": "/predict"
+            "ready": "/ready",
+            "predict": "/predict",
+            "predict_batch": "/predict/batch",
+            "cache_stats": "/cache/stats",
+            "admission_stats": "/admission/stats",
+            "sessions": "/sessions",
+            "sessions_delta": "/sessions/delta",
+            "sessions_close": "/sessions/close",
+            "sessions_stats": "/sessions/stats",
+            "stream_transcripts": "/stream/transcripts (WebSocket)",
+            "rules": "/rules",
+            "metrics": "/metrics"
         }
     }
 
+# Fin de la importación (sin contar la del servidor ASGI al lanzar con python app.py)
+STARTUP_PHASES["import"] = time.perf_counter() - IMPORT_STARTED
+
 if __name__ == "__main__":
+    import uvicorn
+    
+    # uvicorn importa "app:app": con este módulo registrado como "app" no se
+    # vuelve a ejecutar (ni a compilar los índices) en el mismo proceso
+    sys.modules.setdefault("app", sys.modules[__name__])
     uvicorn.run(
         "app:app",
         host="0.0.0.0",
-        port=8000,
+        port=int(os.getenv("PORT", "8000")),
         reload=False,
-        log_level="info"
+        log_level="info",
+        workers=SERVER_WORKERS,
+        timeout_graceful_shutdown=DRAIN_TIMEOUT_SECONDS
     ) 
\ No newline at end of file
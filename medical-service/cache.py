@@ -0,0 +1,184 @@
+"""
+Caché de resultados de clasificación.
+
+Caché LRU en proceso con expiración por TTL y, opcionalmente, un segundo
+nivel compartido en un servidor compatible con Redis para que las réplicas
+del servicio compartan aciertos.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from normalizer import tokenize, words
+
+logger = logging.getLogger(__name__)
+
+
+def age_bucket(age: int) -> str:
+    """Tramo de edad con los mismos cortes que usa el clasificador (40, 60 y 65)"""
+    if age < 40:
+        return "lt40"
+    if age <= 60:
+        return "40-60"
+    if age <= 65:
+        return "61-65"
+    return "gt65"
+
+
+def make_cache_key(text: str, age: int, symptoms: List[str], surface: bool = False) -> str:
+    """Clave normalizada de (texto, tramo de edad, síntomas ordenados).
+
+    Solo se normaliza lo que el clasificador ya ignora: mayúsculas, acentos,
+    espacios y puntuación (tokens), síntomas sin palabras y el orden de los
+    síntomas. La longitud original solo cuenta a través del umbral de 100.
+    Con surface el texto se reduce solo a words(), sin quitar palabras vacías
+    ni reducir a raíces: la recuperación puntúa esas palabras y sus trigramas,
+    así que dos flexiones con la misma raíz pueden dar candidatos distintos.
+    """
+    symptom_tokens = (" ".join(tokenize(s)) for s in symptoms)
+    text_tokens = words(text) if surface else tokenize(text)
+    normalized = json.dumps(
+        [" ".join(text_tokens), len(text) > 100, age_bucket(age), sorted(t for t in symptom_tokens if t)],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Caché LRU con TTL, contadores de uso e invalidación por versión.
+
+    La versión de la base de conocimiento forma parte de cada entrada: al
+    cambiar, la caché local se vacía y las claves compartidas antiguas dejan
+    de consultarse.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 300.0,
+                 redis_url: str = "", version: str = ""):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.version = version
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.shared_errors = 0
+
+        self._shared = None
+        if redis_url:
+            # Import diferido: el cliente (~0.1 s de import) solo hace falta con el backend compartido
+            try:
+                import redis.asyncio as redis
+            except ImportError:  # El backend compartido es opcional
+                logger.warning("RESULT_CACHE_REDIS_URL definido pero el paquete redis no está instalado")
+            else:
+                # Cliente asíncrono: las consultas al segundo nivel no bloquean el event loop
+                self._shared = redis.Redis.from_url(redis_url, socket_timeout=0.05,
+                                                    socket_connect_timeout=0.05)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def set_version(self, version: str) -> None:
+        """Invalida la caché si cambia la versión de la base de conocimiento"""
+        with self._lock:
+            if version != self.version:
+                self.version = version
+                self._entries.clear()
+
+    def _shared_key(self, key: str) -> str:
+        return f"medical:result:{self.version}:{key}"
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+
+        value = await self._get_shared(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.shared_hits += 1
+            self._store(key, value, now)
+        return value
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._store(key, value, time.monotonic())
+        await self._set_shared(key, value)
+
+    def _store(self, key: str, value: Dict[str, Any], now: float) -> None:
+        self._entries[key] = (now + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def _get_shared(self, key: str) -> Optional[Dict[str, Any]]:
+        if self._shared is None:
+            return None
+        try:
+            raw = await self._shared.get(self._shared_key(key))
+        except Exception as e:
+            self.shared_errors += 1
+            logger.warning(f"Error leyendo caché compartida: {str(e)}")
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    async def _set_shared(self, key: str, value: Dict[str, Any]) -> None:
+        if self._shared is None:
+            return
+        try:
+            await self._shared.set(self._shared_key(key), json.dumps(value, ensure_ascii=False),
+                                   ex=max(1, int(self.ttl_seconds)))
+        except Exception as e:
+            self.shared_errors += 1
+            logger.warning(f"Error escribiendo caché compartida: {str(e)}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "shared_backend": self._shared is not None,
+                "version": self.version,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared_hits": self.shared_hits,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "shared_errors": self.shared_errors
+            }
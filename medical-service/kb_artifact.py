@@ -0,0 +1,460 @@
+"""
+Artefacto binario precompilado de la base de conocimiento médico.
+
+El compilador (offline) convierte un catálogo fuente (JSON con el formato de
+MEDICAL_KNOWLEDGE_BASE o CSV del catálogo CIE-10-CM con sinónimos) en un
+fichero con cadenas internadas, el vocabulario de tokens como tabla hash,
+tablas de patrones en arrays y el autómata Aho-Corasick sobre ids de token ya
+construido como doble array. El servicio lo proyecta en memoria con mmap de
+solo lectura: el arranque no parsea nada y los procesos forkeados comparten
+las mismas páginas.
+
+Uso:
+    python kb_artifact.py catalogo.csv -o knowledge_base.kbx
+    python kb_artifact.py knowledge_base.json -o knowledge_base.kbx
+"""
+
+import argparse
+import bisect
+import csv
+import json
+import mmap
+import struct
+import sys
+import time
+import zlib
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set
+
+from matcher import UNKNOWN_TOKEN, AhoCorasick, KnowledgeIndex
+from normalizer import NORMALIZATION_VERSION
+
+MAGIC = b"MKBX"
+FORMAT_VERSION = 2
+# Cabecera fija: magia, versión del formato y longitud de la cabecera JSON
+PREAMBLE = struct.Struct("<4sII")
+ALIGNMENT = 8
+# Construcción del doble array: celdas libres probadas por estado y ventana retenida
+DOUBLE_ARRAY_PROBES = 32
+DOUBLE_ARRAY_FREE_WINDOW = 4096
+
+
+class ArtifactError(Exception):
+    """El fichero no es un artefacto válido para esta versión del formato"""
+
+
+def load_catalogue(path: str) -> Dict[str, Dict[str, Any]]:
+    """Lee el catálogo fuente en el formato de MEDICAL_KNOWLEDGE_BASE.
+
+    CSV: columnas code, description, category, confidence, keywords, symptoms
+    y synonyms; las listas van separadas por "|" y los sinónimos se añaden a
+    las keywords.
+    """
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    knowledge_base: Dict[str, Dict[str, Any]] = {}
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            def terms(column: str) -> List[str]:
+                return [t.strip() for t in (row.get(column) or "").split("|") if t.strip()]
+            knowledge_base[row["code"].strip()] = {
+                "keywords": terms("keywords") + terms("synonyms"),
+                "symptoms": terms("symptoms"),
+                "description": row["description"].strip(),
+                "confidence": float(row.get("confidence") or 0.8),
+                "category": (row.get("category") or "general").strip(),
+            }
+    return knowledge_base
+
+
+def _vocabulary_table(vocabulary: Dict[str, int]) -> array:
+    """Tabla hash (crc32, sondeo lineal) de token a id; 0 marca una celda vacía"""
+    size = 1
+    while size < 2 * len(vocabulary) + 1:
+        size *= 2
+    table = array("I", [0]) * size
+    for token, token_id in vocabulary.items():
+        cell = zlib.crc32(token.encode("utf-8")) & (size - 1)
+        while table[cell]:
+            cell = (cell + 1) & (size - 1)
+        table[cell] = token_id
+    return table
+
+
+def _double_array(automaton: AhoCorasick) -> Dict[str, array]:
+    """Aplana el trie del autómata en un doble array (base/check).
+
+    Los símbolos son los ids de token (>= 1): la transición desde el estado s
+    con el token c es t = base[s] + c si check[t] == s. Los estados se
+    renumeran con su posición en el doble array; fail y las salidas se
+    guardan por posición.
+    """
+    goto, fail, out = automaton._goto, automaton._fail, automaton._out
+
+    position = [0] * len(goto)
+    base = [0]
+    check = [-1]
+    # Celdas libres (ordenadas); solo se prueban las primeras para que la
+    # construcción sea lineal, a costa de dejar algún hueco sin usar
+    free: List[int] = []
+    order = [0]
+    for state in order:
+        children = sorted(goto[state].items())
+        if not children:
+            continue
+        first, last = children[0][0], children[-1][0]
+        offset = max(len(check) - first, 1)
+        for cell in free[:DOUBLE_ARRAY_PROBES]:
+            candidate = cell - first
+            if candidate >= 1 and all(candidate + c >= len(check) or check[candidate + c] == -1
+                                      for c, _ in children):
+                offset = candidate
+                break
+        needed = offset + last + 1
+        if needed > len(check):
+            free.extend(range(len(check), needed))
+            check.extend([-1] * (needed - len(check)))
+            base.extend([0] * (needed - len(base)))
+        base[position[state]] = offset
+        for c, child in children:
+            check[offset + c] = position[state]
+            position[child] = offset + c
+            order.append(child)
+            cell = bisect.bisect_left(free, offset + c)
+            if cell < len(free) and free[cell] == offset + c:
+                del free[cell]
+        if len(free) > DOUBLE_ARRAY_FREE_WINDOW:
+            del free[:len(free) - DOUBLE_ARRAY_FREE_WINDOW]
+
+    size = len(check)
+    fail_by_position = [0] * size
+    outputs: List[Sequence[int]] = [()] * size
+    for state, pos in enumerate(position):
+        fail_by_position[pos] = position[fail[state]]
+        outputs[pos] = out[state]
+    out_offsets = [0]
+    out_ids: List[int] = []
+    for ids in outputs:
+        out_ids.extend(ids)
+        out_offsets.append(len(out_ids))
+
+    return {
+        "base": array("i", base),
+        "check": array("i", check),
+        "fail": array("I", fail_by_position),
+        "out_offsets": array("I", out_offsets),
+        "out_ids": array("I", out_ids),
+    }
+
+
+def compile_artifact(knowledge_base: Dict[str, Dict[str, Any]], output_path: str) -> Dict[str, Any]:
+    """Compila la base de conocimiento en un artefacto; devuelve la cabecera"""
+    index = KnowledgeIndex(knowledge_base)
+    strings: Dict[str, int] = {}
+
+    def intern(value: str) -> int:
+        return strings.setdefault(value, len(strings))
+
+    def string_lists(lists: List[List[str]]) -> Dict[str, array]:
+        offsets, ids = array("I", [0]), array("I")
+        for values in lists:
+            ids.extend(intern(v) for v in values)
+            offsets.append(len(ids))
+        return {"offsets": offsets, "ids": ids}
+
+    sections: Dict[str, array] = {
+        "code_str": array("I", (intern(c) for c in index.codes)),
+        "description_str": array("I", (intern(d) for d in index.descriptions)),
+        "confidence": array("d", index.confidences),
+        "category_id": array("I", index.category_ids),
+        "category_str": array("I", (intern(c) for c in index.category_names)),
+    }
+    for name, lists in (("keyword", index.keywords), ("symptom", index.symptoms)):
+        for suffix, values in string_lists(lists).items():
+            sections[f"{name}_{suffix}"] = values
+
+    entry_offsets, entry_code, entry_kind, entry_slot = array("I", [0]), array("I"), array("I"), array("I")
+    for entries in index._pattern_entries:
+        for code_idx, kind, slot in entries:
+            entry_code.append(code_idx)
+            entry_kind.append(kind)
+            entry_slot.append(slot)
+        entry_offsets.append(len(entry_code))
+    sections.update(pattern_entry_offsets=entry_offsets, pattern_entry_code=entry_code,
+                    pattern_entry_kind=entry_kind, pattern_entry_slot=entry_slot)
+
+    # Palabras de síntomas indexadas directamente por id de token
+    word_offsets, word_code, word_slot = array("I", [0]), array("I"), array("I")
+    for token_id in range(len(index.vocabulary) + 1):
+        for code_idx, slot in index._word_entries.get(token_id, ()):
+            word_code.append(code_idx)
+            word_slot.append(slot)
+        word_offsets.append(len(word_code))
+    sections.update(word_entry_offsets=word_offsets, word_entry_code=word_code, word_entry_slot=word_slot)
+
+    # Vocabulario: cadena de cada id de token (posición id - 1) y tabla hash
+    token_str = array("I", [0]) * len(index.vocabulary)
+    for token, token_id in index.vocabulary.items():
+        token_str[token_id - 1] = intern(token)
+    sections["token_str"] = token_str
+    sections["token_table"] = _vocabulary_table(index.vocabulary)
+
+    for name, values in _double_array(index._automaton).items():
+        sections[f"pattern_automaton_{name}"] = values
+
+    # Tabla de cadenas internadas: un único blob UTF-8 más desplazamientos
+    blob = bytearray()
+    string_offsets = array("I", [0])
+    for value in strings:
+        blob += value.encode("utf-8")
+        string_offsets.append(len(blob))
+    sections["string_offsets"] = string_offsets
+
+    payloads = [(name, values.typecode, values.tobytes()) for name, values in sections.items()]
+    payloads.append(("string_blob", "B", bytes(blob)))
+
+    header: Dict[str, Any] = {
+        "version": index.version,
+        "normalization": NORMALIZATION_VERSION,
+        "codes": len(index.codes),
+        "patterns": index.pattern_count,
+        "tokens": len(index.vocabulary),
+        "compiled_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "sections": {},
+    }
+    # Desplazamientos relativos al final de la cabecera (alineados a 8 bytes)
+    offset = 0
+    for name, typecode, data in payloads:
+        header["sections"][name] = [offset, typecode, len(data)]
+        offset += len(data) + (-len(data) % ALIGNMENT)
+
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    header_bytes += b" " * (-(PREAMBLE.size + len(header_bytes)) % ALIGNMENT)
+    with open(output_path, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for _, _, data in payloads:
+            f.write(data)
+            f.write(b"\0" * (-len(data) % ALIGNMENT))
+    return header
+
+
+class _StringTable:
+    """Cadenas internadas; se decodifican bajo demanda"""
+
+    __slots__ = ("_offsets", "_blob")
+
+    def __init__(self, offsets: memoryview, blob: memoryview):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __getitem__(self, string_id: int) -> str:
+        return str(self._blob[self._offsets[string_id]:self._offsets[string_id + 1]], "utf-8")
+
+
+class _StringColumn:
+    """Columna de cadenas por posición (p. ej. codes o descriptions)"""
+
+    def __init__(self, ids: memoryview, strings: _StringTable):
+        self._ids = ids
+        self._strings = strings
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self._strings[i] for i in self._ids[position]]
+        return self._strings[self._ids[position]]
+
+
+class _StringLists:
+    """Listas de cadenas por código en formato CSR (keywords, symptoms)"""
+
+    def __init__(self, offsets: memoryview, ids: memoryview, strings: _StringTable):
+        self._offsets = offsets
+        self._ids = ids
+        self._strings = strings
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, code_idx: int) -> List[str]:
+        strings = self._strings
+        return [strings[i] for i in self._ids[self._offsets[code_idx]:self._offsets[code_idx + 1]]]
+
+
+class _Entries:
+    """Entradas por patrón en formato CSR: tuplas de las columnas indicadas"""
+
+    def __init__(self, offsets: memoryview, *columns: memoryview):
+        self._offsets = offsets
+        self._columns = columns
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, item: int) -> Iterator[tuple]:
+        start, end = self._offsets[item], self._offsets[item + 1]
+        return zip(*(column[start:end] for column in self._columns))
+
+    def get(self, item: int) -> Optional[Iterator[tuple]]:
+        """Como un dict: None si no hay entradas para item"""
+        if item + 1 >= len(self._offsets) or self._offsets[item] == self._offsets[item + 1]:
+            return None
+        return self[item]
+
+
+class _Vocabulary:
+    """Vocabulario de tokens proyectado: tabla hash crc32 con sondeo lineal"""
+
+    __slots__ = ("_table", "_mask", "_offsets", "_blob", "_token_str")
+
+    def __init__(self, table: memoryview, token_str: memoryview, strings: _StringTable):
+        self._table = table
+        self._mask = len(table) - 1
+        self._token_str = token_str
+        self._offsets = strings._offsets
+        self._blob = strings._blob
+
+    def __len__(self) -> int:
+        return len(self._token_str)
+
+    def get(self, token: str, default: int = UNKNOWN_TOKEN) -> int:
+        encoded = token.encode("utf-8")
+        table, mask, offsets, blob, token_str = self._table, self._mask, self._offsets, self._blob, self._token_str
+        cell = zlib.crc32(encoded) & mask
+        while True:
+            token_id = table[cell]
+            if not token_id:
+                return default
+            string_id = token_str[token_id - 1]
+            if blob[offsets[string_id]:offsets[string_id + 1]] == encoded:
+                return token_id
+            cell = (cell + 1) & mask
+
+
+class DoubleArrayAutomaton:
+    """Autómata Aho-Corasick leído de un doble array (mismo find que AhoCorasick)"""
+
+    def __init__(self, base: memoryview, check: memoryview,
+                 fail: memoryview, out_offsets: memoryview, out_ids: memoryview):
+        self._base = base
+        self._check = check
+        self._fail = fail
+        self._out_offsets = out_offsets
+        self._out_ids = out_ids
+
+    def find(self, tokens: Sequence[int]) -> Set[int]:
+        """Devuelve el conjunto de ids de patrones presentes en los tokens"""
+        base = self._base
+        check = self._check
+        fail = self._fail
+        out_offsets = self._out_offsets
+        out_ids = self._out_ids
+        size = len(check)
+
+        found = set(out_ids[out_offsets[0]:out_offsets[1]])
+        state = 0
+        for c in tokens:
+            if c == UNKNOWN_TOKEN:
+                # Ningún estado tiene transición con un token fuera del vocabulario
+                state = 0
+                continue
+            while True:
+                target = base[state] + c
+                if target < size and check[target] == state:
+                    state = target
+                    break
+                if not state:
+                    break
+                state = fail[state]
+            start, end = out_offsets[state], out_offsets[state + 1]
+            if start != end:
+                found.update(out_ids[start:end])
+        return found
+
+    def step(self, state: int, token: int) -> int:
+        """Estado tras consumir un token (reescaneo incremental)"""
+        if token == UNKNOWN_TOKEN:
+            return 0
+        base = self._base
+        check = self._check
+        size = len(check)
+        while True:
+            target = base[state] + token
+            if target < size and check[target] == state:
+                return target
+            if not state:
+                return 0
+            state = self._fail[state]
+
+    def outputs(self, state: int) -> Sequence[int]:
+        """Ids de los patrones que terminan en el estado"""
+        return self._out_ids[self._out_offsets[state]:self._out_offsets[state + 1]]
+
+
+class MappedKnowledgeIndex(KnowledgeIndex):
+    """KnowledgeIndex respaldado por un artefacto proyectado con mmap.
+
+    Expone la misma interfaz (codes, keywords, symptoms, descriptions,
+    confidences, category_ids, vocabulary, tokenize, scan,
+    scan_symptom_words) sin copiar las tablas al heap del proceso.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._mmap)
+        if len(buffer) < PREAMBLE.size:
+            raise ArtifactError(f"Artefacto truncado: {path}")
+        magic, format_version, header_length = PREAMBLE.unpack_from(buffer)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ArtifactError(f"Formato de artefacto no soportado: {path}")
+        data_start = PREAMBLE.size + header_length
+        self.header = json.loads(bytes(buffer[PREAMBLE.size:data_start]))
+        # El vocabulario está en tokens normalizados: otra normalización no los encontraría
+        if self.header.get("normalization", 1) != NORMALIZATION_VERSION:
+            raise ArtifactError(f"Artefacto compilado con otra normalización del texto, hay que recompilarlo: {path}")
+
+        def section(name: str) -> memoryview:
+            offset, typecode, length = self.header["sections"][name]
+            return buffer[data_start + offset:data_start + offset + length].cast(typecode)
+
+        strings = _StringTable(section("string_offsets"), section("string_blob"))
+        self.path = path
+        self.version = self.header["version"]
+        self.codes = _StringColumn(section("code_str"), strings)
+        self.descriptions = _StringColumn(section("description_str"), strings)
+        self.confidences = section("confidence")
+        self.category_ids = section("category_id")
+        self.category_names = list(_StringColumn(section("category_str"), strings))
+        self.keywords = _StringLists(section("keyword_offsets"), section("keyword_ids"), strings)
+        self.symptoms = _StringLists(section("symptom_offsets"), section("symptom_ids"), strings)
+        self._pattern_entries = _Entries(section("pattern_entry_offsets"), section("pattern_entry_code"),
+                                         section("pattern_entry_kind"), section("pattern_entry_slot"))
+        self._word_entries = _Entries(section("word_entry_offsets"), section("word_entry_code"),
+                                      section("word_entry_slot"))
+        self.vocabulary = _Vocabulary(section("token_table"), section("token_str"), strings)
+        self._automaton = DoubleArrayAutomaton(*(section(f"pattern_automaton_{name}")
+                                                 for name in ("base", "check", "fail", "out_offsets", "out_ids")))
+        self.pattern_count = self.header["patterns"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="Catálogo fuente (.json o .csv)")
+    parser.add_argument("-o", "--output", required=True, help="Fichero de salida (.kbx)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    knowledge_base = load_catalogue(args.source)
+    header = compile_artifact(knowledge_base, args.output)
+    print(f"Artefacto {args.output} - Versión: {header['version']}, Códigos: {header['codes']}, "
+          f"Patrones: {header['patterns']}, Tiempo: {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Índice multi-patrón para la base de conocimiento médico.
+
+Compila todas las keywords y síntomas de la base de conocimiento, ya
+normalizados y convertidos en secuencias de ids de token, en un único
+autómata Aho-Corasick: una sola pasada sobre los tokens de la nota clínica
+devuelve todas las coincidencias de todos los códigos CIE-10.
+"""
+
+import hashlib
+import json
+from collections import deque
+from typing import Any, Dict, Hashable, List, Sequence, Set, Tuple
+
+from normalizer import NORMALIZATION_VERSION, tokenize
+
+# Tipos de patrón dentro de una entrada de la base de conocimiento
+KIND_KEYWORD = 0
+KIND_SYMPTOM = 1
+
+# Id de los tokens que no aparecen en ningún patrón (nunca forman parte de una coincidencia)
+UNKNOWN_TOKEN = 0
+
+
+class AhoCorasick:
+    """Autómata Aho-Corasick sobre secuencias de símbolos (caracteres o ids de token).
+
+    Cada patrón se identifica por su posición en la secuencia de entrada.
+    La búsqueda es lineal en la longitud del texto e independiente del
+    número de patrones compilados.
+    """
+
+    __slots__ = ("_goto", "_fail", "_out", "pattern_count")
+
+    def __init__(self, patterns: Sequence[Sequence[Hashable]]):
+        goto: List[Dict[Hashable, int]] = [{}]
+        out: List[List[int]] = [[]]
+
+        # Construir el trie de patrones
+        for pattern_id, pattern in enumerate(patterns):
+            state = 0
+            for ch in pattern:
+                next_state = goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][ch] = next_state
+                    goto.append({})
+                    out.append([])
+                state = next_state
+            out[state].append(pattern_id)
+
+        # Enlaces de fallo en anchura, fusionando las salidas de cada sufijo
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and ch not in goto[fallback]:
+                    fallback = fail[fallback]
+                candidate = goto[fallback].get(ch, 0)
+                fail[next_state] = candidate if candidate != next_state else 0
+                out[next_state].extend(out[fail[next_state]])
+
+        self._goto = goto
+        self._fail = fail
+        self._out = [tuple(o) for o in out]
+        self.pattern_count = len(patterns)
+
+    def find(self, text: Sequence[Hashable]) -> Set[int]:
+        """Devuelve el conjunto de ids de patrones presentes en el texto"""
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+
+        found = set(out[0])
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+    def step(self, state: int, symbol: Hashable) -> int:
+        """Estado tras consumir un símbolo (reescaneo incremental)"""
+        goto = self._goto
+        while state and symbol not in goto[state]:
+            state = self._fail[state]
+        return goto[state].get(symbol, 0)
+
+    def outputs(self, state: int) -> Sequence[int]:
+        """Ids de los patrones que terminan en el estado"""
+        return self._out[state]
+
+
+class KnowledgeIndex:
+    """Índice compilado de MEDICAL_KNOWLEDGE_BASE.
+
+    Cada patrón distinto (como secuencia de tokens normalizados) se asocia a
+    la lista de entradas (código, tipo, posición) en las que aparece, de modo
+    que un mismo término compartido por varios códigos se busca una sola vez.
+    Los tokens se internan en un vocabulario con ids desde 1. Los datos de
+    cada código se exponen por posición (codes, descriptions, confidences,
+    category_ids), igual que en el artefacto precompilado
+    (kb_artifact.MappedKnowledgeIndex).
+    """
+
+    def __init__(self, knowledge_base: Dict[str, Dict[str, Any]]):
+        # Huella del contenido y de la normalización: cambia con cualquier modificación
+        self.version = hashlib.sha256(
+            json.dumps([NORMALIZATION_VERSION, knowledge_base], sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()[:12]
+        self.codes: List[str] = list(knowledge_base.keys())
+        self.keywords: List[List[str]] = []
+        self.symptoms: List[List[str]] = []
+        self.descriptions: List[str] = []
+        self.confidences: List[float] = []
+        self.category_ids: List[int] = []
+        self.category_names: List[str] = []
+        category_ids: Dict[str, int] = {}
+
+        vocabulary: Dict[str, int] = {}
+        pattern_ids: Dict[Tuple[int, ...], int] = {}
+        pattern_entries: List[List[Tuple[int, int, int]]] = []
+        word_entries: Dict[int, List[Tuple[int, int]]] = {}
+
+        def token_ids(pattern: str) -> Tuple[int, ...]:
+            return tuple(vocabulary.setdefault(token, len(vocabulary) + 1) for token in tokenize(pattern))
+
+        def register(tokens: Tuple[int, ...], entry: Tuple[int, int, int]) -> None:
+            if not tokens:
+                return
+            pattern_id = pattern_ids.setdefault(tokens, len(pattern_ids))
+            if pattern_id == len(pattern_entries):
+                pattern_entries.append([])
+            pattern_entries[pattern_id].append(entry)
+
+        for code_idx, knowledge in enumerate(knowledge_base.values()):
+            self.keywords.append(list(knowledge["keywords"]))
+            self.symptoms.append(list(knowledge["symptoms"]))
+            self.descriptions.append(knowledge["description"])
+            self.confidences.append(knowledge["confidence"])
+            self.category_ids.append(category_ids.setdefault(knowledge["category"], len(category_ids)))
+
+            for slot, keyword in enumerate(knowledge["keywords"]):
+                register(token_ids(keyword), (code_idx, KIND_KEYWORD, slot))
+
+            for slot, symptom_pattern in enumerate(knowledge["symptoms"]):
+                tokens = token_ids(symptom_pattern)
+                register(tokens, (code_idx, KIND_SYMPTOM, slot))
+                # Palabras sueltas para el cruce con síntomas del usuario
+                for token_id in sorted(set(tokens)):
+                    word_entries.setdefault(token_id, []).append((code_idx, slot))
+
+        self.category_names = list(category_ids)
+        self.vocabulary = vocabulary
+        self._pattern_entries = [tuple(e) for e in pattern_entries]
+        self._word_entries = {token_id: tuple(e) for token_id, e in word_entries.items()}
+        self._automaton = AhoCorasick(list(pattern_ids))
+        self.pattern_count = len(pattern_ids)
+
+    def tokenize(self, text: str) -> List[int]:
+        """Normaliza el texto una vez y lo convierte en ids de token del vocabulario"""
+        vocabulary = self.vocabulary
+        return [vocabulary.get(token, UNKNOWN_TOKEN) for token in tokenize(text)]
+
+    def scan(self, tokens: Sequence[int]) -> Dict[int, Tuple[List[int], List[int]]]:
+        """Una pasada sobre los tokens: {código: (slots keywords, slots síntomas)}"""
+        hits: Dict[int, Tuple[List[int], List[int]]] = {}
+        for pattern_id in self._automaton.find(tokens):
+            for code_idx, kind, slot in self._pattern_entries[pattern_id]:
+                entry = hits.get(code_idx)
+                if entry is None:
+                    entry = hits[code_idx] = ([], [])
+                entry[kind].append(slot)
+
+        # Mantener el orden de declaración de la base de conocimiento
+        for keyword_slots, symptom_slots in hits.values():
+            keyword_slots.sort()
+            symptom_slots.sort()
+        return hits
+
+    def step(self, state: int, token_id: int) -> int:
+        return self._automaton.step(state, token_id)
+
+    def outputs(self, state: int) -> Sequence[int]:
+        return self._automaton.outputs(state)
+
+    def pattern_entries(self, pattern_id: int) -> Sequence[Tuple[int, int, int]]:
+        """Entradas (código, tipo, posición) de un patrón"""
+        return self._pattern_entries[pattern_id]
+
+    def scan_symptom_words(self, tokens: Sequence[int]) -> Dict[int, List[int]]:
+        """Síntomas con al menos una palabra entre los tokens: {código: slots}"""
+        matched: Dict[int, Set[int]] = {}
+        word_entries = self._word_entries
+        for token_id in set(tokens):
+            entries = word_entries.get(token_id)
+            if entries is not None:
+                for code_idx, slot in entries:
+                    matched.setdefault(code_idx, set()).add(slot)
+        return {code_idx: sorted(slots) for code_idx, slots in matched.items()}
+
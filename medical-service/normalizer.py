@@ -0,0 +1,69 @@
+"""
+Normalización y tokenización del texto clínico.
+
+Misma canalización para las notas, los síntomas del usuario y los patrones de
+la base de conocimiento: minúsculas (casefold), descomposición Unicode NFKD
+sin marcas diacríticas, separación en palabras sin las palabras funcionales
+(de, la, con...) y una raíz ligera de número y género. Así "Dolor de PECHO",
+"dolor pecho", "cardiaco"/"cardíaca" o "úlcera"/"úlceras" producen los
+mismos tokens.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List
+
+# Forma parte de la versión del índice: cambiarla invalida cachés y artefactos
+NORMALIZATION_VERSION = 3
+
+# Bloques de marcas diacríticas combinantes que quedan tras la descomposición NFKD
+_COMBINING_RE = re.compile("[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]")
+_TOKEN_RE = re.compile(r"\w+")
+# Consonantes tras las que el plural añade "-es" (dolor/dolores, pulmón/pulmones)
+_PLURAL_ES_AFTER = frozenset("lrndjsz")
+# Palabras funcionales: no distinguen ningún código y se quitan de los tokens
+STOPWORDS = frozenset((
+    "a", "al", "con", "de", "del", "el", "en", "la", "las", "lo", "los", "no", "o", "para", "por", "que",
+    "se", "sin", "su", "un", "una", "y"
+))
+# Las palabras más cortas (tos, hta) se dejan tal cual
+_MIN_STEM_LENGTH = 4
+
+
+def fold(text: str) -> str:
+    """Minúsculas y sin acentos ("Cardíaco" -> "cardiaco")"""
+    folded = text.casefold()
+    if folded.isascii():
+        return folded
+    return _COMBINING_RE.sub("", unicodedata.normalize("NFKD", folded))
+
+
+@lru_cache(maxsize=100000)
+def stem(word: str) -> str:
+    """Raíz de número y género de una palabra ya plegada.
+
+    Quita el plural ("-es" tras consonante, "-s" tras a/e/o) y después la
+    vocal final a/e/o: "ulceras" -> "ulcer", "fumadores" -> "fumador",
+    "cardiaca"/"cardiaco" -> "cardiac". No es un stemmer completo: las
+    derivaciones ("arteria"/"arterial") siguen siendo palabras distintas.
+    """
+    if len(word) < _MIN_STEM_LENGTH or not word.isalpha():
+        return word
+    if word.endswith("es") and len(word) > _MIN_STEM_LENGTH and word[-3] in _PLURAL_ES_AFTER:
+        return word[:-2]
+    if word[-1] == "s" and word[-2] in "aeo":
+        word = word[:-1]
+    if word[-1] in "aeo" and len(word) >= _MIN_STEM_LENGTH:
+        word = word[:-1]
+    return word
+
+
+def words(text: str) -> List[str]:
+    """Palabras plegadas del texto, sin raíz; espacios y puntuación solo separan"""
+    return _TOKEN_RE.findall(fold(text))
+
+
+def tokenize(text: str) -> List[str]:
+    """Palabras normalizadas (plegadas, sin palabras funcionales y con raíz) del texto"""
+    return [stem(word) for word in words(text) if word not in STOPWORDS]
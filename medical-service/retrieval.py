@@ -0,0 +1,201 @@
+"""
+Recuperación aproximada de códigos CIE-10 por similitud, solo con CPU.
+
+Cada código se representa con un vector TF-IDF de n-gramas hasheados de su
+descripción, keywords y síntomas: las palabras plegadas (sin raíz) y los
+trigramas de caracteres de cada palabra, de modo que variantes que el emparejamiento
+exacto no cubre ("torácico"/"tórax", "respiratoria"/"respirar") comparten
+parte del vector. Los vectores van normalizados en una matriz NumPy float32.
+
+El índice es IVF: un k-means esférico agrupa los vectores en nlist listas y
+la matriz se guarda ordenada por lista, así que una consulta se compara con
+los centroides y solo recorre las nprobe listas más cercanas (trozos
+contiguos de la matriz). Se compila offline a un .npz o al arrancar.
+
+Uso:
+    python retrieval.py knowledge_base.kbx -o retrieval.npz
+    python retrieval.py catalogo.csv -o retrieval.npz --dim 512
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+import zlib
+from collections import Counter
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from kb_artifact import MappedKnowledgeIndex, load_catalogue
+from matcher import KnowledgeIndex
+from normalizer import NORMALIZATION_VERSION, STOPWORDS, words
+
+FORMAT_VERSION = 1
+DEFAULT_DIM = 512
+# Filas por bloque al asignar vectores a centroides (acota la memoria temporal)
+ASSIGN_BLOCK_ROWS = 8192
+
+
+@lru_cache(maxsize=100000)
+def _word_features(word: str, dim: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Cubetas y pesos con signo de una palabra: la palabra (peso 1) y sus trigramas (peso 1 en total)"""
+    padded = f"<{word}>"
+    trigrams = [padded[i:i + 3] for i in range(len(padded) - 2)]
+    features = [word] + [f"#{trigram}" for trigram in trigrams]
+    weights = [1.0] + [1.0 / len(trigrams)] * len(trigrams)
+    buckets = np.empty(len(features), dtype=np.intp)
+    values = np.empty(len(features), dtype=np.float32)
+    for position, (feature, weight) in enumerate(zip(features, weights)):
+        hashed = zlib.crc32(feature.encode("utf-8"))
+        buckets[position] = hashed % dim
+        # El bit alto decide el signo: las colisiones se compensan en el producto escalar
+        values[position] = weight if hashed & 0x80000000 else -weight
+    return buckets, values
+
+
+def term_vector(text: str, dim: int) -> np.ndarray:
+    """Vector de términos (tf sublineal) sin ponderar ni normalizar"""
+    counts = Counter(word for word in words(text) if word not in STOPWORDS)
+    if not counts:
+        return np.zeros(dim, dtype=np.float32)
+    buckets, values = [], []
+    for word, count in counts.items():
+        word_buckets, word_values = _word_features(word, dim)
+        buckets.append(word_buckets)
+        values.append(word_values * (1.0 + math.log(count)))
+    return np.bincount(np.concatenate(buckets), np.concatenate(values), minlength=dim).astype(np.float32)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+def _spherical_kmeans(vectors: np.ndarray, nlist: int, iterations: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Centroides normalizados y asignación de cada vector (similitud coseno)"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    assignment = np.zeros(len(vectors), dtype=np.intp)
+    for _ in range(iterations):
+        for start in range(0, len(vectors), ASSIGN_BLOCK_ROWS):
+            block = vectors[start:start + ASSIGN_BLOCK_ROWS]
+            assignment[start:start + len(block)] = (block @ centroids.T).argmax(axis=1)
+        # Suma por lista con los vectores ordenados por asignación; las listas vacías conservan su centroide
+        order = np.argsort(assignment, kind="stable")
+        lists, starts = np.unique(assignment[order], return_index=True)
+        centroids[lists] = _normalize(np.add.reduceat(vectors[order], starts, axis=0))
+    return centroids, assignment
+
+
+class RetrievalIndex:
+    """Índice IVF de vectores de código con búsqueda top-k aproximada y exacta"""
+
+    def __init__(self, vectors: np.ndarray, ids: np.ndarray, offsets: np.ndarray, centroids: np.ndarray,
+                 idf: np.ndarray, version: str, nprobe: int = 32):
+        self.vectors = vectors      # Ordenados por lista
+        self.ids = ids              # Posición del código de cada fila
+        self.offsets = offsets      # Lista l: filas offsets[l]:offsets[l + 1]
+        self.centroids = centroids
+        self.idf = idf
+        self.dim = len(idf)
+        self.version = version      # Versión del KnowledgeIndex de origen
+        self.nprobe = nprobe
+
+    @classmethod
+    def build(cls, index: KnowledgeIndex, dim: int = DEFAULT_DIM, nlist: Optional[int] = None,
+              nprobe: int = 32, iterations: int = 10, seed: int = 0) -> "RetrievalIndex":
+        """Vectoriza los códigos del índice y los agrupa en nlist listas (por defecto ~4·sqrt(códigos))"""
+        documents = [". ".join([index.descriptions[code_idx], *index.keywords[code_idx], *index.symptoms[code_idx]])
+                     for code_idx in range(len(index.codes))]
+        terms = np.zeros((len(documents), dim), dtype=np.float32)
+        for code_idx, document in enumerate(documents):
+            terms[code_idx] = term_vector(document, dim)
+        # IDF por cubeta: los términos comunes a muchos códigos ("dolor") pesan menos y las
+        # cubetas que no aparecen en el catálogo no cuentan en la norma de la consulta
+        document_frequency = np.count_nonzero(terms, axis=0)
+        idf = np.where(document_frequency > 0, np.log((1 + len(documents)) / (1 + document_frequency)) + 1,
+                       0).astype(np.float32)
+        vectors = _normalize(terms * idf)
+
+        nlist = nlist or max(1, round(4 * math.sqrt(len(vectors))))
+        nlist = min(nlist, len(vectors))
+        if nlist > 1:
+            centroids, assignment = _spherical_kmeans(vectors, nlist, iterations, seed)
+        else:
+            centroids = _normalize(vectors.sum(axis=0, keepdims=True))
+            assignment = np.zeros(len(vectors), dtype=np.intp)
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.searchsorted(assignment[order], np.arange(nlist + 1))
+        return cls(np.ascontiguousarray(vectors[order]), order.astype(np.int32), offsets.astype(np.int64),
+                   centroids.astype(np.float32), idf, index.version, nprobe)
+
+    @classmethod
+    def load(cls, path: str, nprobe: int = 32) -> "RetrievalIndex":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("format") != FORMAT_VERSION or meta.get("normalization") != NORMALIZATION_VERSION:
+                raise ValueError(f"Índice de recuperación incompatible: {path}")
+            return cls(data["vectors"], data["ids"], data["offsets"], data["centroids"], data["idf"],
+                       meta["version"], nprobe)
+
+    def save(self, path: str) -> None:
+        meta = {"format": FORMAT_VERSION, "normalization": NORMALIZATION_VERSION, "version": self.version}
+        np.savez(path, vectors=self.vectors, ids=self.ids, offsets=self.offsets, centroids=self.centroids,
+                 idf=self.idf, meta=np.array(json.dumps(meta)))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    def encode(self, text: str) -> np.ndarray:
+        """Vector normalizado de la consulta en el mismo espacio que los códigos"""
+        return _normalize(term_vector(text, self.dim) * self.idf)
+
+    def search(self, query: np.ndarray, k: int, nprobe: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Top-k aproximado: (posición del código, similitud coseno) de mayor a menor"""
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        if nprobe >= self.nlist:
+            return self.search_exact(query, k)
+        lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        rows = [np.arange(self.offsets[l], self.offsets[l + 1]) for l in lists]
+        scores = [self.vectors[self.offsets[l]:self.offsets[l + 1]] @ query for l in lists]
+        return self._top(np.concatenate(rows), np.concatenate(scores), k)
+
+    def search_exact(self, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """Top-k por fuerza bruta sobre toda la matriz (referencia de recall)"""
+        return self._top(np.arange(len(self.ids)), self.vectors @ query, k)
+
+    def _top(self, rows: np.ndarray, scores: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        if len(scores) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[best], scores[best]
+        order = np.argsort(-scores, kind="stable")
+        return [(int(self.ids[row]), float(score)) for row, score in zip(rows[order], scores[order]) if score > 0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="Catálogo fuente (.json o .csv) o artefacto .kbx")
+    parser.add_argument("-o", "--output", required=True, help="Fichero de salida (.npz)")
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM, help="Dimensión de los vectores hasheados")
+    parser.add_argument("--nlist", type=int, default=0, help="Listas del IVF (0: ~4 veces la raíz del número de códigos)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = (MappedKnowledgeIndex(args.source) if args.source.endswith(".kbx")
+             else KnowledgeIndex(load_catalogue(args.source)))
+    retrieval = RetrievalIndex.build(index, dim=args.dim, nlist=args.nlist or None)
+    retrieval.save(args.output)
+    print(f"Índice de recuperación {args.output} - Versión: {retrieval.version}, Códigos: {len(retrieval)}, "
+          f"Listas: {retrieval.nlist}, Dimensión: {retrieval.dim}, Tiempo: {time.perf_counter() - start:.1f}s",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
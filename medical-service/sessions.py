@@ -0,0 +1,225 @@
+"""
+Sesiones de clasificación incremental para notas en edición.
+
+El cliente abre una sesión con la nota completa y después envía solo los
+cambios (start, end, texto nuevo, en caracteres de la nota actual). Cada
+sesión guarda los tokens de la nota por segmentos separados por espacios, el
+estado del autómata tras cada token, cuántas veces aparece cada patrón y, por
+código, las keywords y síntomas con coincidencia.
+
+Como la normalización no cruza los espacios, una edición solo se vuelve a
+tokenizar dentro de los segmentos que toca. El autómata se reanuda desde el
+estado guardado antes de la edición y avanza hasta que su estado vuelve a
+coincidir con el guardado: a partir de ahí las coincidencias no cambian. Las
+sesiones viven en el proceso (cada worker de uvicorn tiene las suyas), con
+un máximo de sesiones y expulsión LRU de las inactivas.
+"""
+
+import re
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from matcher import KnowledgeIndex
+
+_SEGMENT_RE = re.compile(r"\S+")
+
+
+def edited_length(length: int, edits: Iterable[Tuple[int, int, str]]) -> int:
+    """Longitud de la nota tras aplicar los cambios en orden; ValueError si alguno sale del texto"""
+    for start, end, text in edits:
+        if not 0 <= start <= end <= length:
+            raise ValueError(f"Cambio fuera del texto: [{start}, {end}) con longitud {length}")
+        length += len(text) - (end - start)
+    return length
+
+
+class NoteSession:
+    """Estado de coincidencias de una nota que se edita por cambios"""
+
+    __slots__ = ("index", "text", "owner", "patient_age", "symptoms", "user_hits", "revision", "last_seen",
+                 "_seg_starts", "_seg_ends", "_seg_tokens", "_tokens", "_states",
+                 "_pattern_counts", "_code_hits")
+
+    def __init__(self, index: KnowledgeIndex, text: str, now: Optional[float] = None):
+        self.text = text
+        # Tenant que abrió la sesión; solo él puede modificarla o cerrarla
+        self.owner = ""
+        self.patient_age = 0
+        self.symptoms: List[str] = []
+        # Coincidencias de los síntomas del usuario; las calcula quien clasifica
+        self.user_hits: list = []
+        self.revision = 0
+        self.last_seen = time.monotonic() if now is None else now
+        self.reset(index)
+
+    def reset(self, index: KnowledgeIndex) -> None:
+        """Reconstruye el estado con un escaneo completo (p. ej. tras recargar la base)"""
+        self.index = index
+        # Segmentos sin espacios: inicio, fin y número de tokens
+        self._seg_starts = array("i")
+        self._seg_ends = array("i")
+        self._seg_tokens = array("i")
+        self._tokens = array("i")
+        self._states = array("i")
+        self._pattern_counts: Dict[int, int] = {}
+        self._code_hits: Dict[int, Tuple[Set[int], Set[int]]] = {}
+        text = self.text
+        self.text = ""
+        self.apply(0, 0, text)
+
+    def apply(self, start: int, end: int, replacement: str) -> int:
+        """Sustituye text[start:end] por replacement; devuelve los tokens reescaneados"""
+        text = self.text
+        new_text = text[:start] + replacement + text[end:]
+        shift = len(replacement) - (end - start)
+        starts, ends, counts = self._seg_starts, self._seg_ends, self._seg_tokens
+
+        # Segmentos que tocan el rango (los contiguos pueden fusionarse con el texto nuevo)
+        first = bisect_left(ends, start)
+        last = bisect_right(starts, end)
+        window_start = min(start, starts[first]) if first < last else start
+        window_end = max(end, ends[last - 1]) if first < last else end
+
+        index = self.index
+        new_starts, new_ends, new_counts = array("i"), array("i"), array("i")
+        new_tokens = array("i")
+        for match in _SEGMENT_RE.finditer(new_text, window_start, window_end + shift):
+            tokens = index.tokenize(match.group())
+            new_starts.append(match.start())
+            new_ends.append(match.end())
+            new_counts.append(len(tokens))
+            new_tokens.extend(tokens)
+
+        token_start = sum(counts[:first])
+        token_end = token_start + sum(counts[first:last])
+        starts[first:last] = new_starts
+        ends[first:last] = new_ends
+        counts[first:last] = new_counts
+        following = first + len(new_starts)
+        if shift and following < len(starts):
+            # Desplazamiento en bloque de los segmentos posteriores (vista numpy sobre el array)
+            np.frombuffer(starts, dtype=np.int32)[following:] += shift
+            np.frombuffer(ends, dtype=np.int32)[following:] += shift
+        self.text = new_text
+        return self._rescan(token_start, token_end, new_tokens)
+
+    def _rescan(self, token_start: int, token_end: int, new_tokens: Sequence[int]) -> int:
+        """Sustituye tokens[token_start:token_end] y avanza el autómata hasta que converge"""
+        tokens, states = self._tokens, self._states
+        if tokens[token_start:token_end] == new_tokens:
+            return 0
+        index = self.index
+        step, outputs = index.step, index.outputs
+
+        for state in states[token_start:token_end]:
+            self._drop(outputs(state))
+        state = states[token_start - 1] if token_start else 0
+        new_states = array("i")
+        for token in new_tokens:
+            state = step(state, token)
+            new_states.append(state)
+            self._add(outputs(state))
+
+        # Tras la edición el estado solo difiere hasta coincidir con el guardado
+        position = token_end
+        while position < len(tokens):
+            state = step(state, tokens[position])
+            previous = states[position]
+            if state == previous:
+                break
+            self._drop(outputs(previous))
+            self._add(outputs(state))
+            states[position] = state
+            position += 1
+
+        tokens[token_start:token_end] = array("i", new_tokens)
+        states[token_start:token_end] = new_states
+        return len(new_tokens) + position - token_end
+
+    def _add(self, pattern_ids: Sequence[int]) -> None:
+        counts = self._pattern_counts
+        for pattern_id in pattern_ids:
+            count = counts.get(pattern_id, 0)
+            counts[pattern_id] = count + 1
+            if not count:
+                for code_idx, kind, slot in self.index.pattern_entries(pattern_id):
+                    hits = self._code_hits.get(code_idx)
+                    if hits is None:
+                        hits = self._code_hits[code_idx] = (set(), set())
+                    hits[kind].add(slot)
+
+    def _drop(self, pattern_ids: Sequence[int]) -> None:
+        counts = self._pattern_counts
+        for pattern_id in pattern_ids:
+            count = counts[pattern_id] - 1
+            if count:
+                counts[pattern_id] = count
+                continue
+            del counts[pattern_id]
+            for code_idx, kind, slot in self.index.pattern_entries(pattern_id):
+                hits = self._code_hits[code_idx]
+                hits[kind].discard(slot)
+                if not hits[0] and not hits[1]:
+                    del self._code_hits[code_idx]
+
+    def text_hits(self) -> Dict[int, Tuple[List[int], List[int]]]:
+        """Coincidencias de la nota como KnowledgeIndex.scan: {código: (slots keywords, slots síntomas)}"""
+        return {code_idx: (sorted(keyword_slots), sorted(symptom_slots))
+                for code_idx, (keyword_slots, symptom_slots) in self._code_hits.items()}
+
+
+class SessionStore:
+    """Sesiones por id con un máximo de sesiones y expulsión LRU de las inactivas"""
+
+    def __init__(self, max_sessions: int = 5000, idle_seconds: float = 600.0):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._sessions: "OrderedDict[str, NoteSession]" = OrderedDict()
+        self.evictions = {"idle": 0, "capacity": 0}
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _evict(self, now: float) -> None:
+        """Expulsa desde el extremo LRU las sesiones inactivas o por encima de max_sessions"""
+        idle_before = now - self.idle_seconds
+        sessions = self._sessions
+        while sessions:
+            session = sessions[next(iter(sessions))]
+            if session.last_seen >= idle_before:
+                if len(sessions) <= self.max_sessions:
+                    break
+                self.evictions["capacity"] += 1
+            else:
+                self.evictions["idle"] += 1
+            sessions.popitem(last=False)
+
+    def get(self, session_id: str, now: Optional[float] = None) -> Optional[NoteSession]:
+        now = time.monotonic() if now is None else now
+        self._evict(now)
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.last_seen = now
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def put(self, session_id: str, session: NoteSession) -> None:
+        self._sessions[session_id] = session
+        self._sessions.move_to_end(session_id)
+        self._evict(session.last_seen)
+
+    def pop(self, session_id: str) -> Optional[NoteSession]:
+        return self._sessions.pop(session_id, None)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "idle_seconds": self.idle_seconds,
+            **{f"evictions_{reason}": count for reason, count in self.evictions.items()}
+        }
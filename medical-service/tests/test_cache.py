@@ -0,0 +1,28 @@
+"""
+Claves de la caché de resultados: con la recuperación activa las notas que
+solo coinciden tras reducir a raíces no comparten entrada, porque la
+recuperación puntúa las palabras sin reducir.
+
+Uso:
+    python -m pytest medical-service/tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cache import make_cache_key  # noqa: E402
+
+
+def test_stemmed_key_without_retrieval():
+    assert make_cache_key("Úlceras gástricas", 50, []) == make_cache_key("úlcera gástrica", 50, [])
+    assert make_cache_key("dolor de pecho", 50, []) == make_cache_key("dolor pecho", 50, [])
+
+
+def test_surface_key_with_retrieval():
+    assert make_cache_key("Úlceras  GÁSTRICAS", 50, [], surface=True) == \
+        make_cache_key("úlceras gástricas", 50, [], surface=True)
+    assert make_cache_key("Úlceras gástricas", 50, [], surface=True) != \
+        make_cache_key("úlcera gástrica", 50, [], surface=True)
+    assert make_cache_key("dolor de pecho", 50, [], surface=True) != \
+        make_cache_key("dolor pecho", 50, [], surface=True)
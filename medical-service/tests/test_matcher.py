@@ -0,0 +1,126 @@
+"""
+Regresión de la coincidencia por tokens: plurales y flexiones de género deben
+seguir encontrando las keywords y síntomas de la base de conocimiento, como
+hacía la búsqueda por subcadenas, sin volver a casar dentro de otras palabras.
+
+Uso:
+    python -m pytest medical-service/tests
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from kb_artifact import MappedKnowledgeIndex, compile_artifact  # noqa: E402
+from matcher import KnowledgeIndex  # noqa: E402
+from normalizer import stem, tokenize  # noqa: E402
+
+KNOWLEDGE_BASE = {
+    "I21.9": {
+        "keywords": ["dolor pecho", "infarto", "cardíaco"],
+        "symptoms": ["dolor torácico", "náuseas"],
+        "description": "Infarto agudo de miocardio", "confidence": 0.95, "category": "Cardiovascular",
+    },
+    "J44.9": {
+        "keywords": ["EPOC", "tos", "fumador"],
+        "symptoms": ["tos crónica", "sibilancias"],
+        "description": "EPOC", "confidence": 0.9, "category": "Respiratorio",
+    },
+    "K29.3": {
+        "keywords": ["úlcera", "estómago"],
+        "symptoms": ["dolor epigástrico", "vómitos"],
+        "description": "Gastritis crónica", "confidence": 0.88, "category": "Digestivo",
+    },
+    "K80.9": {
+        "keywords": ["cólico biliar", "piedras"],
+        "symptoms": ["intolerancia grasas"],
+        "description": "Colelitiasis", "confidence": 0.87, "category": "Digestivo",
+    },
+}
+
+
+@pytest.fixture(scope="module", params=["memoria", "artefacto"])
+def index(request, tmp_path_factory):
+    if request.param == "memoria":
+        return KnowledgeIndex(KNOWLEDGE_BASE)
+    path = str(tmp_path_factory.mktemp("kb") / "knowledge_base.kbx")
+    compile_artifact(KNOWLEDGE_BASE, path)
+    return MappedKnowledgeIndex(path)
+
+
+def hits(index, text):
+    """{código: (keywords, síntomas)} de la nota"""
+    return {
+        index.codes[code_idx]: ([index.keywords[code_idx][s] for s in keyword_slots],
+                                [index.symptoms[code_idx][s] for s in symptom_slots])
+        for code_idx, (keyword_slots, symptom_slots) in index.scan(index.tokenize(text)).items()
+    }
+
+
+@pytest.mark.parametrize("singular, inflected", [
+    ("úlcera", "úlceras"),
+    ("dolor", "dolores"),
+    ("fumador", "fumadores"),
+    ("fumador", "fumadora"),
+    ("cardíaco", "cardíaca"),
+    ("cardíaco", "CARDIACOS"),
+    ("pulmón", "pulmones"),
+    ("vómito", "vómitos"),
+    ("náusea", "náuseas"),
+    ("alteración", "alteraciones"),
+    ("tos", "toses"),
+])
+def test_inflections_share_stem(singular, inflected):
+    assert tokenize(singular) == tokenize(inflected)
+
+
+def test_function_words_dropped():
+    assert tokenize("Dolor de PECHO") == tokenize("dolor pecho")
+    assert tokenize("intolerancia a las grasas") == tokenize("intolerancia grasas")
+
+
+@pytest.mark.parametrize("word", ["tos", "hta", "dm2", "bronquitis", "crisis"])
+def test_short_words_and_acronyms_unchanged(word):
+    assert stem(word) == word
+
+
+@pytest.mark.parametrize("text, code, keyword", [
+    ("Úlceras gástricas sangrantes", "K29.3", "úlcera"),
+    ("dolor de estómagos", "K29.3", "estómago"),
+    ("paciente fumadora desde hace años", "J44.9", "fumador"),
+    ("exfumadores", None, None),
+    ("antecedentes de infartos previos", "I21.9", "infarto"),
+    ("insuficiencia cardíaca", "I21.9", "cardíaco"),
+    ("Dolores Pecho al esfuerzo", "I21.9", "dolor pecho"),
+    ("Dolor de PECHO", "I21.9", "dolor pecho"),
+    ("dolor  de  pecho", "I21.9", "dolor pecho"),
+    ("dolor en el pecho", "I21.9", "dolor pecho"),
+    ("cólicos biliares de repetición", "K80.9", "cólico biliar"),
+    ("piedra en la vesícula", "K80.9", "piedras"),
+])
+def test_plural_and_inflected_keywords(index, text, code, keyword):
+    found = hits(index, text)
+    if code is None:
+        assert found == {}
+    else:
+        assert keyword in found[code][0]
+
+
+@pytest.mark.parametrize("text, code, symptom", [
+    ("náusea matutina", "I21.9", "náuseas"),
+    ("vómito alimentario", "K29.3", "vómitos"),
+    ("dolores epigástricos", "K29.3", "dolor epigástrico"),
+    ("toses crónicas", "J44.9", "tos crónica"),
+    ("intolerancia a las grasas", "K80.9", "intolerancia grasas"),
+])
+def test_plural_and_inflected_symptoms(index, text, code, symptom):
+    assert symptom in hits(index, text)[code][1]
+
+
+def test_no_match_inside_other_words(index):
+    # "tos" no casa dentro de "vómitos" ni de "puntos" (la búsqueda por subcadenas sí)
+    found = hits(index, "vómitos y puntos dolorosos")
+    assert "J44.9" not in found
+    assert found["K29.3"] == ([], ["vómitos"])
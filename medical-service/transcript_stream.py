@@ -0,0 +1,104 @@
+"""
+Transcripciones en streaming para clasificar durante el dictado.
+
+Un dictado llega como hipótesis parciales del enunciado en curso (que el
+reconocedor va corrigiendo) y enunciados finales que ya no cambian.
+TranscriptSession mantiene la nota como enunciados finales más la hipótesis
+actual sobre una NoteSession: cada parcial solo reescanea desde el primer
+carácter que cambia respecto a la anterior.
+
+Las transcripciones llegan ya como texto (servicio de voz u otro reconocedor
+aguas arriba) o como audio para un transcriptor local. StubTranscriber es el
+transcriptor local de pruebas y demo: no reconoce audio, trata cada frame
+como texto UTF-8 dictado.
+"""
+
+import codecs
+import re
+from typing import List, NamedTuple
+
+from matcher import KnowledgeIndex
+from sessions import NoteSession
+
+# Fin de enunciado para el transcriptor de pruebas
+_UTTERANCE_RE = re.compile(r"[^.?!\n]*[.?!\n]")
+
+
+class TranscriptEvent(NamedTuple):
+    final: bool
+    text: str
+
+
+def _common_prefix(a: str, b: str) -> int:
+    """Longitud del prefijo común (búsqueda binaria con comparaciones de cadenas en C)"""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+class TranscriptSession:
+    """Nota de un dictado: enunciados finales más la hipótesis parcial en curso"""
+
+    def __init__(self, index: KnowledgeIndex, max_length: int):
+        self.note = NoteSession(index, "")
+        self.max_length = max_length
+        self.committed = 0  # Caracteres de note.text que ya no cambian
+
+    def _tail(self, event: TranscriptEvent) -> str:
+        text = event.text.strip()
+        return " " + text if self.committed and text else text
+
+    def update(self, event: TranscriptEvent) -> int:
+        """Aplica un parcial o un final; devuelve los tokens reescaneados.
+
+        ValueError si la nota superaría max_length (no se modifica).
+        """
+        note = self.note
+        tail = self._tail(event)
+        if self.committed + len(tail) > self.max_length:
+            raise ValueError(f"Transcripción demasiado larga (máximo {self.max_length} caracteres)")
+        start = self.committed + _common_prefix(note.text[self.committed:], tail)
+        rescanned = note.apply(start, len(note.text), tail[start - self.committed:])
+        if event.final:
+            self.committed = len(note.text)
+        return rescanned
+
+
+class StubTranscriber:
+    """Transcriptor local de pruebas: cada frame es texto UTF-8 dictado.
+
+    Emite el enunciado en curso como parcial y lo cierra como final al
+    llegar a ".", "?", "!" o un salto de línea.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._utterance = ""
+
+    def feed(self, chunk: bytes) -> List[TranscriptEvent]:
+        text = self._utterance + self._decoder.decode(chunk)
+        events = []
+        consumed = 0
+        for match in _UTTERANCE_RE.finditer(text):
+            if match.group().strip():
+                events.append(TranscriptEvent(True, match.group()))
+            consumed = match.end()
+        self._utterance = text[consumed:]
+        if self._utterance.strip():
+            events.append(TranscriptEvent(False, self._utterance))
+        return events
+
+    def flush(self) -> List[TranscriptEvent]:
+        """Cierra el enunciado pendiente al terminar el dictado"""
+        text = self._utterance + self._decoder.decode(b"", final=True)
+        self._utterance = ""
+        return [TranscriptEvent(True, text)] if text.strip() else []
+
+
+# Transcriptores locales disponibles (STREAM_TRANSCRIBER)
+TRANSCRIBERS = {"stub": StubTranscriber}
@@ -0,0 +1,13 @@
+"""
+Módulos comunes a los servicios (métricas, logging, admisión, pool de
+procesos, JSON rápido y recarga en caliente).
+
+Cada imagen copia este paquete junto a su app.py, por lo que se construye
+desde la raíz del repositorio:
+
+    docker build -t medical-service:latest -f medical-service/Dockerfile .
+
+En local basta con tener la raíz en el path:
+
+    cd medical-service && PYTHONPATH=.. python -m app
+"""
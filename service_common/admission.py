@@ -0,0 +1,260 @@
+"""
+Control de admisión: límite de tasa por tenant y cola con prioridades.
+
+Cada tenant (cabecera X-Tenant-ID, o la API key, o la IP del cliente) tiene
+un token bucket. Las peticiones admitidas compiten por un número fijo de
+slots de clasificación; cuando no hay slot libre esperan en una cola acotada
+con dos carriles: "interactive" (autorizaciones en tiempo real) se atiende
+siempre antes que "batch" (trabajos masivos). Con la cola llena, una petición
+interactiva desplaza a la batch más reciente.
+
+Las peticiones con X-Request-Deadline (presupuesto restante en milisegundos)
+se rechazan en cuanto se estima que no pueden terminar a tiempo: al llegar,
+con la espera estimada según la cola y el tiempo de servicio medio, y al
+salir de la cola.
+"""
+
+import asyncio
+import hashlib
+import heapq
+import itertools
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+LANES = (INTERACTIVE, BATCH)
+# Menor valor, mayor prioridad
+LANE_PRIORITY = {INTERACTIVE: 0, BATCH: 1}
+
+
+class AdmissionRejected(Exception):
+    """Petición no admitida; reason: rate_limited, queue_full o deadline"""
+
+    def __init__(self, reason: str, retry_after: float = 1.0):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def parse_lane(value: Optional[str], default: str) -> str:
+    """Carril pedido en X-Priority; valores desconocidos usan el del endpoint"""
+    if value:
+        value = value.strip().lower()
+        if value in LANE_PRIORITY:
+            return value
+    return default
+
+
+def parse_deadline(value: Optional[str], now: float) -> Optional[float]:
+    """X-Request-Deadline (milisegundos restantes) como instante de time.monotonic()"""
+    if not value:
+        return None
+    try:
+        budget_ms = float(value)
+    except ValueError:
+        return None
+    if budget_ms != budget_ms:
+        return None
+    return now + max(0.0, budget_ms) / 1000
+
+
+def tenant_id(tenant: Optional[str], api_key: Optional[str], client_host: Optional[str]) -> str:
+    """Identificador del tenant; la API key no se guarda en claro"""
+    if tenant:
+        return f"tenant:{tenant}"
+    if api_key:
+        return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    return f"ip:{client_host or 'desconocido'}"
+
+
+class TokenBucket:
+    """Cubo de tokens: rate por segundo con ráfagas de hasta burst"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, cost: float, now: float) -> float:
+        """Consume cost tokens; devuelve 0 o los segundos hasta poder hacerlo"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+class TenantRateLimiter:
+    """Token bucket por tenant con un número acotado de tenants (LRU)"""
+
+    def __init__(self, rate: float, burst: float, max_tenants: int = 10000):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_tenants = max_tenants
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def check(self, tenant: str, cost: float = 1.0) -> None:
+        """AdmissionRejected("rate_limited") si el tenant ha agotado su cubo"""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        bucket = self._buckets.get(tenant)
+        if bucket is None:
+            bucket = self._buckets[tenant] = TokenBucket(self.rate, self.burst, now)
+            if len(self._buckets) > self.max_tenants:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(tenant)
+        # Un lote mayor que la ráfaga se admite con el cubo lleno
+        wait = bucket.take(min(cost, self.burst), now)
+        if wait > 0:
+            raise AdmissionRejected("rate_limited", wait)
+
+    def stats(self) -> Dict[str, float]:
+        return {"rate": self.rate, "burst": self.burst, "tenants": len(self._buckets)}
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "lane", "deadline", "future")
+
+    def __init__(self, priority: int, seq: int, lane: str, deadline: Optional[float], future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.lane = lane
+        self.deadline = deadline
+        self.future = future
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class AdmissionController:
+    """Slots de ejecución con cola de prioridad acotada y descarte por deadline"""
+
+    def __init__(self, slots: int, max_queue: int, smoothing: float = 0.2):
+        self.slots = max(1, slots)
+        self.max_queue = max_queue
+        self.smoothing = smoothing
+        self.active = 0
+        # Tiempo de servicio medio (EWMA); 0 hasta la primera medida
+        self.service_time = 0.0
+        self._queued = {lane: 0 for lane in LANES}
+        self._heap: List[_Waiter] = []
+        self._seq = itertools.count()
+
+    def queued(self, lane: Optional[str] = None) -> int:
+        return self._queued[lane] if lane is not None else sum(self._queued.values())
+
+    def estimated_finish(self, lane: str, now: float) -> float:
+        """Instante estimado de fin si la petición entrara ahora en el carril"""
+        if self.active < self.slots and not self.queued():
+            return now + self.service_time
+        priority = LANE_PRIORITY[lane]
+        ahead = sum(count for other, count in self._queued.items() if LANE_PRIORITY[other] <= priority)
+        return now + (ahead // self.slots + 2) * self.service_time
+
+    @asynccontextmanager
+    async def slot(self, lane: str, deadline: Optional[float] = None) -> AsyncIterator[None]:
+        """Reserva un slot durante el bloque; AdmissionRejected si no se admite"""
+        await self._acquire(lane, deadline)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            self.service_time = elapsed if not self.service_time else (
+                self.service_time + self.smoothing * (elapsed - self.service_time))
+            self.active -= 1
+            self._wake()
+
+    async def _acquire(self, lane: str, deadline: Optional[float]) -> None:
+        now = time.monotonic()
+        if deadline is not None and self.estimated_finish(lane, now) > deadline:
+            raise AdmissionRejected("deadline", self._retry_after())
+        if self.active < self.slots and not self.queued():
+            self.active += 1
+            return
+
+        priority = LANE_PRIORITY[lane]
+        if self.queued() >= self.max_queue:
+            victim = self._lowest_waiter()
+            if victim is None or victim.priority <= priority:
+                raise AdmissionRejected("queue_full", self._retry_after())
+            self._resolve(victim, AdmissionRejected("queue_full", self._retry_after()))
+
+        if len(self._heap) > 2 * self.max_queue + 64:
+            # Entradas ya resueltas (rechazadas o canceladas) que siguen en el heap
+            self._heap = [w for w in self._heap if not w.future.done()]
+            heapq.heapify(self._heap)
+
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(priority, next(self._seq), lane, deadline, loop.create_future())
+        heapq.heappush(self._heap, waiter)
+        self._queued[lane] += 1
+        timer = None
+        if deadline is not None:
+            # Sale de la cola en cuanto ya no le da tiempo a ejecutarse
+            timer = loop.call_at(loop.time() + max(0.0, deadline - self.service_time - now),
+                                 self._resolve, waiter, AdmissionRejected("deadline", self._retry_after()))
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.cancelled():
+                self._queued[lane] -= 1
+            elif waiter.future.exception() is None:
+                # El slot se concedió justo antes de la cancelación
+                self.active -= 1
+                self._wake()
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+    def _resolve(self, waiter: _Waiter, error: Optional[AdmissionRejected] = None) -> None:
+        """Saca al waiter de la cola concediéndole el slot o rechazándolo"""
+        if waiter.future.done():
+            return
+        self._queued[waiter.lane] -= 1
+        if error is None:
+            self.active += 1
+            waiter.future.set_result(None)
+        else:
+            waiter.future.set_exception(error)
+
+    def _wake(self) -> None:
+        while self.active < self.slots and self._heap:
+            waiter = heapq.heappop(self._heap)
+            if waiter.future.done():
+                continue
+            if waiter.deadline is not None and time.monotonic() + self.service_time > waiter.deadline:
+                self._resolve(waiter, AdmissionRejected("deadline", self._retry_after()))
+                continue
+            self._resolve(waiter)
+
+    def _lowest_waiter(self) -> Optional[_Waiter]:
+        """Waiter pendiente con menor prioridad y más reciente"""
+        pending = [w for w in self._heap if not w.future.done()]
+        return max(pending, key=lambda w: (w.priority, w.seq)) if pending else None
+
+    def _retry_after(self) -> float:
+        return max(1.0, (self.queued() // self.slots + 1) * self.service_time)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "slots": self.slots,
+            "active": self.active,
+            "max_queue": self.max_queue,
+            "service_time_ms": round(self.service_time * 1000, 3),
+            **{f"queued_{lane}": self._queued[lane] for lane in LANES}
+        }
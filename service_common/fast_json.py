@@ -0,0 +1,59 @@
+"""
+Camino rápido de petición y respuesta JSON.
+
+El cuerpo se valida directamente desde los bytes con pydantic-core
+(model_validate_json), sin json.loads ni la resolución de dependencias de
+FastAPI. Las respuestas se devuelven ya serializadas con orjson (json
+compacto si no está instalado), de modo que FastAPI no vuelve a validar el
+response_model ni pasa por jsonable_encoder.
+"""
+
+import json
+from typing import Any, Dict, Type, TypeVar
+
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response
+from pydantic import BaseModel, ValidationError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """Respuesta JSON serializada una sola vez, sin validación del response_model"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+async def parse_body(request: Request, model: Type[ModelT]) -> ModelT:
+    """Valida el cuerpo de la petición contra el modelo; errores como el 422 de FastAPI"""
+    try:
+        return model.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+        )
+
+
+def request_body_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """openapi_extra con el esquema del cuerpo, que FastAPI ya no infiere de la firma"""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": model.model_json_schema()}}
+        }
+    }
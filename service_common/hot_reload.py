@@ -0,0 +1,104 @@
+"""
+Recarga en caliente de conjuntos de reglas compilados.
+
+RuleSetWatcher vigila un fichero (o el montaje de un ConfigMap, que se
+actualiza cambiando el enlace simbólico ..data) y, cuando cambia, compila el
+nuevo índice en un hilo en segundo plano y lo publica con on_swap. La
+publicación es una simple reasignación de referencia: las peticiones en curso
+terminan con el índice que ya habían leído.
+
+El fichero debe sustituirse de forma atómica (rename o ConfigMap), nunca
+reescribirse in situ, porque un artefacto puede estar proyectado con mmap.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _signature(path: str) -> Optional[Tuple[str, int, int, int]]:
+    """Identidad del fichero resuelto: ruta real, inodo, tamaño y mtime"""
+    try:
+        real_path = os.path.realpath(path)
+        st = os.stat(real_path)
+    except OSError:
+        return None
+    return real_path, st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class RuleSetWatcher:
+    """Sondea un fichero de reglas y publica un índice nuevo cuando cambia.
+
+    build(ruta) devuelve el índice compilado (con atributo version);
+    on_swap(índice) lo publica. Si el contenido compila a la misma versión
+    que la activa no se publica nada.
+    """
+
+    def __init__(self, path: str, build: Callable[[str], Any], on_swap: Callable[[Any], None],
+                 current_version: str, interval_seconds: float = 5.0):
+        self.path = path
+        self.build = build
+        self.on_swap = on_swap
+        self.version = current_version
+        self.interval_seconds = interval_seconds
+        self.reloads = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.loaded_at = time.time()
+        self._signature = _signature(path)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="rules-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval_seconds + 1)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            self.check()
+
+    def check(self) -> bool:
+        """Comprueba el fichero una vez; True si se publicó una versión nueva"""
+        signature = _signature(self.path)
+        if signature is None or signature == self._signature:
+            return False
+        self._signature = signature
+
+        start = time.perf_counter()
+        try:
+            index = self.build(signature[0])
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            logger.error(f"Error al compilar las reglas de {self.path}, se mantiene la versión {self.version}: {e}")
+            return False
+
+        if index.version == self.version:
+            return False
+        previous, self.version = self.version, index.version
+        self.on_swap(index)
+        self.reloads += 1
+        self.last_error = None
+        self.loaded_at = time.time()
+        logger.info(f"Reglas recargadas - Versión: {previous} -> {index.version}, "
+                    f"Compilación: {(time.perf_counter() - start) * 1000:.1f}ms")
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_error": self.last_error
+        }
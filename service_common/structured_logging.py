@@ -0,0 +1,145 @@
+"""
+Logging no bloqueante para los endpoints del servicio.
+
+Los registros se encolan en una cola acotada y un hilo de fondo
+(QueueListener) los formatea y escribe, de modo que los handlers async nunca
+esperan a stderr. Cada endpoint usa su propio logger con nivel y tasa de
+muestreo configurables por variables de entorno:
+
+- LOG_LEVEL: nivel raíz (INFO por defecto).
+- LOG_FORMAT: "text" (formato clásico) o "json" (una línea JSON por registro).
+- LOG_ASYNC: "true" (cola + hilo de fondo, por defecto) o "false" (síncrono).
+- LOG_QUEUE_SIZE: capacidad de la cola; si se llena, los registros se descartan.
+- LOG_LEVEL_<ENDPOINT> / LOG_SAMPLE_RATE_<ENDPOINT>: nivel y fracción de
+  registros INFO/DEBUG conservados por endpoint (LOG_SAMPLE_RATE global).
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+from typing import Optional
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["DroppingQueueHandler"] = None
+
+
+class JSONFormatter(logging.Formatter):
+    """Una línea JSON por registro; los campos extra van en record.fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            payload.update(fields)
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Formato clásico del servicio con los campos extra como clave=valor"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            message += " - " + ", ".join(f"{key}={value}" for key, value in fields.items())
+        return message
+
+
+class SamplingFilter(logging.Filter):
+    """Conserva una fracción de los registros INFO/DEBUG; WARNING o superior siempre pasa"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que nunca bloquea: si la cola está llena descarta el registro.
+
+    El mensaje se formatea en el hilo del listener, no en el de la petición.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging() -> None:
+    """Configura el logging raíz según las variables de entorno (idempotente)"""
+    global _listener, _queue_handler
+
+    root = logging.getLogger()
+    if _queue_handler is not None or getattr(root, "_structured_logging", False):
+        return
+
+    formatter = JSONFormatter() if os.getenv("LOG_FORMAT", "text").lower() == "json" else TextFormatter(TEXT_FORMAT)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+
+    root.handlers.clear()
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    if os.getenv("LOG_ASYNC", "true").lower() == "true":
+        _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000"))))
+        _listener = logging.handlers.QueueListener(_queue_handler.queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        root.addHandler(_queue_handler)
+        atexit.register(shutdown_logging)
+    else:
+        root.addHandler(stream_handler)
+    root._structured_logging = True
+
+
+def shutdown_logging() -> None:
+    """Vacía la cola y detiene el hilo de escritura"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped_records() -> int:
+    """Registros descartados por cola llena"""
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+def endpoint_logger(name: str) -> logging.Logger:
+    """Logger de un endpoint con nivel y muestreo propios (LOG_LEVEL_<NAME>, LOG_SAMPLE_RATE_<NAME>)"""
+    logger = logging.getLogger(f"app.{name}")
+    suffix = name.upper()
+
+    level = os.getenv(f"LOG_LEVEL_{suffix}")
+    if level:
+        logger.setLevel(level.upper())
+
+    rate = float(os.getenv(f"LOG_SAMPLE_RATE_{suffix}", os.getenv("LOG_SAMPLE_RATE", "1.0")))
+    if rate < 1.0 and not any(isinstance(f, SamplingFilter) for f in logger.filters):
+        logger.addFilter(SamplingFilter(rate))
+    return logger
@@ -0,0 +1,104 @@
+"""
+Pool de procesos para el trabajo de clasificación (CPU-bound).
+
+Los handlers async envían la clasificación a procesos pre-forkeados en lugar
+de ejecutarla en el event loop, de modo que una nota lenta no bloquea al
+resto de peticiones y el pod aprovecha todos sus núcleos. El número de
+tareas pendientes está acotado: al llenarse, submit() lanza PoolSaturated y
+el endpoint responde 503 con Retry-After.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PoolSaturated(Exception):
+    """La cola del pool está llena o el pool se está drenando"""
+
+
+def cpu_quota() -> int:
+    """Núcleos disponibles según la cuota de CPU del contenedor (cgroup v2/v1)"""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return max(1, int(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0:
+            return max(1, quota // period)
+    except (OSError, ValueError):
+        pass
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def default_workers(server_workers: int = 1) -> int:
+    """Procesos del pool: la cuota de CPU repartida entre los workers de uvicorn"""
+    return max(1, cpu_quota() // max(1, server_workers))
+
+
+def _warmup() -> int:
+    return os.getpid()
+
+
+class ClassifierPool:
+    """ProcessPoolExecutor con cola acotada y drenado ordenado"""
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.draining = False
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    async def start(self) -> None:
+        """Crea los procesos y espera a que arranquen todos antes de recibir tráfico.
+
+        Los fork se hacen en el hilo que llama (el del event loop), nunca desde
+        hilos auxiliares que puedan tener cerrojos tomados en ese momento.
+        """
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        futures = [asyncio.wrap_future(self._executor.submit(_warmup)) for _ in range(self.workers)]
+        pids = set(await asyncio.gather(*futures))
+        logger.info(f"Pool de clasificación iniciado - Procesos: {len(pids)}, Cola máxima: {self.max_pending}")
+
+    async def submit(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Ejecuta func(*args) en el pool; PoolSaturated si no hay capacidad"""
+        if self.draining or self._executor is None or self.pending >= self.max_pending:
+            raise PoolSaturated()
+
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    async def drain(self, timeout: float) -> None:
+        """Deja de aceptar trabajo, espera a las tareas en curso y cierra los procesos"""
+        self.draining = True
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self.pending:
+            logger.warning(f"Drenado incompleto - Tareas pendientes: {self.pending}")
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        logger.info("Pool de clasificación detenido")
@@ -86,19 +86,18 @@ if ($LASTEXITCODE -eq 0 -and $existingPods) {
     
     # Construir imágenes Docker
     Write-Host "🔨 Construyendo imágenes Docker..." -ForegroundColor Blue
+    # fraud, medical y gateway se construyen desde la raíz para incluir service_common
     
-    Set-Location fraud-service
-    docker build -t fraud-service:latest .
-    Set-Location ..
+    docker build -t fraud-service:latest -f fraud-service/Dockerfile .
     
-    Set-Location medical-service
-    docker build -t medical-service:latest .
-    Set-Location ..
+    docker build -t medical-service:latest -f medical-service/Dockerfile .
     
     Set-Location speech-to-text-service
     docker build -t speech-service:latest .
     Set-Location ..
     
+    docker build -t gateway-service:latest -f gateway-service/Dockerfile .
+    
     Set-Location frontend-app
     docker build -t frontend-app:latest .
     Set-Location ..
@@ -112,6 +111,7 @@ if ($LASTEXITCODE -eq 0 -and $existingPods) {
     kubectl wait --for=condition=ready pod -l app=fraud-service --timeout=300s
     kubectl wait --for=condition=ready pod -l app=medical-service --timeout=300s
     kubectl wait --for=condition=ready pod -l app=speech-service --timeout=300s
+    kubectl wait --for=condition=ready pod -l app=gateway-service --timeout=300s
 }
 
 # Detener procesos kubectl existentes antes de configurar port forwarding
@@ -130,6 +130,9 @@ Start-Job -ScriptBlock { kubectl port-forward service/medical-service 8002:80 }
 Write-Host "  🎤 Speech Service - Whisper Large-v3 (puerto 8003)..." -ForegroundColor Cyan
 Start-Job -ScriptBlock { kubectl port-forward service/speech-service 8003:80 } | Out-Null
 
+Write-Host "  🔀 API Gateway (puerto 8000)..." -ForegroundColor Cyan
+Start-Job -ScriptBlock { kubectl port-forward service/gateway-service 8000:80 } | Out-Null
+
 Write-Host "  🌐 Frontend Service - Con Speech-to-Text integrado (puerto 8080)..." -ForegroundColor Cyan
 Start-Job -ScriptBlock { kubectl port-forward service/frontend-service 8080:80 } | Out-Null
 
@@ -200,6 +203,7 @@ if ($allServicesReady) {
     Write-Host ""
     Write-Host "🌐 Servicios disponibles:" -ForegroundColor Cyan
     Write-Host "  🎯 Frontend (Speech-to-Text integrado): http://localhost:8080" -ForegroundColor White
+    Write-Host "  🔀 API Gateway:                         http://localhost:8000" -ForegroundColor White
     Write-Host "  🛡️ Fraud Service (Enhanced Transformer): http://localhost:8001" -ForegroundColor White
     Write-Host "  🏥 Medical Service (Clinical ModernBERT): http://localhost:8002" -ForegroundColor White
     Write-Host "  🎤 Speech Service (Whisper Large-v3):    http://localhost:8003" -ForegroundColor White